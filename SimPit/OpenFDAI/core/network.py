@@ -2,11 +2,15 @@ import socket
 import threading
 import time
 
+# Attitude keys: polled in a batch, or pushed by the server on change
+FOCUS_KEYS = ("FOCUS:Pitch", "FOCUS:Heading", "FOCUS:Bank")
+
 class OrbiterClient:
-    def __init__(self, host='192.168.2.229', port=37777):
+    def __init__(self, host='192.168.2.229', port=37777, subscribe=True):
         # Configuration
         self.host = host
         self.port = port
+        self.subscribe = subscribe  # Ask for pushes (SUB:); poll if the server refuses
         
         # Shared Telemetry (Thread-Safe enough for visualization)
         self.pitch = 0.0
@@ -15,6 +19,7 @@ class OrbiterClient:
         
         # Flags
         self.connected = False
+        self.subscribed = False
         self.running = True
         self.sock = None
         
@@ -31,12 +36,67 @@ class OrbiterClient:
             self.sock.connect((self.host, self.port))
             print(f"[NET] Connected to Orbiter at {self.host}:{self.port}")
             self.connected = True
+            self.subscribed = self.subscribe and self._subscribe()
             return True
         except Exception as e:
             print(f"[NET] Connection failed: {e}")
             self.connected = False
             return False
 
+    def _subscribe(self):
+        """
+        Asks the server to push the attitude keys as key=value lines when they
+        change. True if it answers OK:SUB; on ERR:SUB or no answer we poll.
+        """
+        self.sock.sendall(("SUB:" + ",".join(FOCUS_KEYS) + "\r\n").encode('ascii'))
+        self._rx = ""
+        try:
+            while True:
+                while '\n' not in self._rx:
+                    chunk = self.sock.recv(4096).decode('ascii')
+                    if not chunk: return False
+                    self._rx += chunk
+                line, self._rx = self._rx.split('\n', 1)
+                line = line.strip()
+                if line.startswith("OK:SUB"):
+                    print("[NET] Subscribed, Orbiter pushes attitude changes")
+                    return True
+                if line.startswith("ERR"):
+                    break
+                # Anything else (the server's OK: greeting) is skipped
+        except socket.timeout:
+            pass
+        print("[NET] Subscription refused, polling")
+        return False
+
+    def _apply(self, line):
+        """Parses one key=value line (radians) into the attitude fields."""
+        if '=' in line:
+            parts = line.split('=')
+            if len(parts) == 2:
+                key = parts[0].strip()
+                try:
+                    val_radians = float(parts[1].strip())
+                    val_degrees = val_radians * 57.2958 # Rad -> Deg
+                    
+                    if "Pitch" in key:   self.pitch = val_degrees
+                    elif "Heading" in key: self.yaw = val_degrees
+                    elif "Bank" in key:    self.roll = val_degrees
+                except ValueError:
+                    pass
+
+    def _receive_pushes(self):
+        """Subscribed: applies pushed lines as they come (no requests sent)."""
+        try:
+            chunk = self.sock.recv(4096).decode('ascii')
+        except socket.timeout:
+            return # Attitude unchanged
+        if not chunk: raise ConnectionError("server closed the connection")
+        self._rx += chunk
+        *lines, self._rx = self._rx.split('\n')
+        for line in lines:
+            self._apply(line)
+
     def _worker(self):
         """Robust Background loop to fetch data."""
         while self.running:
@@ -46,8 +106,12 @@ class OrbiterClient:
                 continue
 
             try:
+                if self.subscribed:
+                    self._receive_pushes()
+                    continue
+
                 # 1. Send Request (Batch)
-                msg = b'FOCUS:Pitch\r\nFOCUS:Heading\r\nFOCUS:Bank\r\n'
+                msg = ''.join(key + '\r\n' for key in FOCUS_KEYS).encode('ascii')
                 self.sock.sendall(msg)
                 
                 # 2. Receive Data (Drain the buffer)
@@ -72,19 +136,7 @@ class OrbiterClient:
                 if full_response:
                     lines = full_response.strip().split('\n')
                     for line in lines:
-                        if '=' in line:
-                            parts = line.split('=')
-                            if len(parts) == 2:
-                                key = parts[0].strip()
-                                try:
-                                    val_radians = float(parts[1].strip())
-                                    val_degrees = val_radians * 57.2958 # Rad -> Deg
-                                    
-                                    if "Pitch" in key:   self.pitch = val_degrees
-                                    elif "Heading" in key: self.yaw = val_degrees
-                                    elif "Bank" in key:    self.roll = val_degrees
-                                except ValueError:
-                                    pass
+                        self._apply(line)
 
                 # 4. Pace the loop (10Hz is safer for Wi-Fi)
                 time.sleep(0.1) 
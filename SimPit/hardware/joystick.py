@@ -1,7 +1,7 @@
 import threading
 import time
 import sys
-from typing import Callable, Dict, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
 try:
     from inputs import get_gamepad, UnpluggedError
@@ -39,22 +39,40 @@ DEFAULT_BUTTON_MAP = {
 }
 
 class JoystickController:
+    """
+    Reads the gamepad on its own thread. Buttons always go straight to
+    callback_func. Axes do too, unless axis_rate is given: then each axis
+    keeps only its latest value in a fixed slot, and axis_callback gets the
+    axes that changed as one list, axis_rate times a second.
+    """
     def __init__(self, 
                  callback_func: Callable[[str, float], None], 
                  axis_map: Dict = DEFAULT_AXIS_MAP, 
                  btn_map: Dict = DEFAULT_BUTTON_MAP,
                  deadzone: float = 0.05, 
-                 sensitivity: float = 0.01):
+                 sensitivity: float = 0.01,
+                 axis_callback: Optional[Callable[[List[Tuple[str, float]]], None]] = None,
+                 axis_rate: Optional[float] = None):
         
         self.callback = callback_func
         self.axis_map = axis_map
         self.btn_map = btn_map
         self.deadzone = deadzone
         self.sensitivity = sensitivity
+        self.axis_callback = axis_callback
+        self.axis_rate = axis_rate if axis_callback else None
         
         self._running = False
         self._thread: Optional[threading.Thread] = None
+        self._flush_thread: Optional[threading.Thread] = None
         self._last_values: Dict[str, float] = {}
+        self.events = 0  # Raw gamepad events for mapped axes/buttons, before any filtering
+
+        # Coalescing slots: one per logical axis, None = unchanged since the last flush
+        self._axis_names: List[str] = list(dict.fromkeys(name for name, _, _, _ in axis_map.values()))
+        self._axis_slot: Dict[str, int] = {name: i for i, name in enumerate(self._axis_names)}
+        self._pending: List[Optional[float]] = [None] * len(self._axis_names)
+        self._pending_lock = threading.Lock()
 
     def _normalize(self, raw_val: int, min_v: int, max_v: int, invert: bool) -> float:
         # Clamp value to known range
@@ -73,6 +91,8 @@ class JoystickController:
             try:
                 events = get_gamepad()
                 for event in events:
+                    if event.code in self.axis_map or event.code in self.btn_map:
+                        self.events += 1
                     
                     # --- AXIS HANDLER ---
                     if event.ev_type == 'Absolute' and event.code in self.axis_map:
@@ -84,7 +104,11 @@ class JoystickController:
                         last_val = self._last_values.get(log_name, -999.0)
                         if abs(val - last_val) > self.sensitivity:
                             self._last_values[log_name] = val
-                            self.callback(log_name, val)
+                            if self.axis_rate:
+                                with self._pending_lock:
+                                    self._pending[self._axis_slot[log_name]] = val
+                            else:
+                                self.callback(log_name, val)
 
                     # --- BUTTON HANDLER ---
                     elif event.ev_type == 'Key' and event.code in self.btn_map:
@@ -99,11 +123,34 @@ class JoystickController:
                 print(f"[JOY] Error: {e}")
                 time.sleep(1)
 
+    def _flush_loop(self):
+        """Hands the changed axes to axis_callback at a fixed axis_rate."""
+        period = 1.0 / self.axis_rate
+        next_flush = time.monotonic()
+        while self._running:
+            next_flush += period
+            delay = next_flush - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_flush = time.monotonic()  # Overran: don't try to catch up
+            with self._pending_lock:
+                changed = [(self._axis_names[i], val) for i, val in enumerate(self._pending) if val is not None]
+                self._pending = [None] * len(self._pending)
+            if changed:
+                try:
+                    self.axis_callback(changed)
+                except Exception as e:
+                    print(f"[JOY] Axis flush error: {e}")
+
     def start(self):
         if self._running: return
         self._running = True
         self._thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self._thread.start()
+        if self.axis_rate:
+            self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flush_thread.start()
 
     def stop(self):
         self._running = False
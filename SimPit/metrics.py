@@ -0,0 +1,170 @@
+# metrics.py
+# Bridge health: fixed-bucket histograms, counters and a small HTTP endpoint.
+#
+# Histograms keep counts per bucket (not samples), so they cost the same
+# after a week as after a minute and can be updated from any thread.
+# serve_http() answers GET /metrics with a JSON snapshot and GET / with the
+# same figures as text, e.g. `curl localhost:8377`.
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+# Upper bucket bounds in milliseconds; anything slower lands in the last bucket.
+BUCKETS_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+ERROR_LOG_PERIOD = 5.0  # Seconds between printed repeats of the same loop's errors
+
+
+class Histogram:
+    def __init__(self, name: str, buckets=BUCKETS_MS):
+        self.name = name
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        i = 0
+        while i < len(self.buckets) and ms > self.buckets[i]:
+            i += 1
+        with self.lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total += ms
+            if ms > self.max: self.max = ms
+
+    def percentile(self, p: float) -> float:
+        """Upper bound (ms) of the bucket holding the p-th percentile."""
+        with self.lock:
+            if not self.count: return 0.0
+            rank = p / 100 * self.count
+            seen = 0
+            for i, n in enumerate(self.counts):
+                seen += n
+                if seen >= rank and n:
+                    return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+            return self.max
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            counts = list(self.counts)
+            count, total, worst = self.count, self.total, self.max
+        return {
+            "count": count, "avg_ms": total / count if count else 0.0, "max_ms": worst,
+            "p50_ms": self.percentile(50), "p90_ms": self.percentile(90), "p99_ms": self.percentile(99),
+            "buckets_ms": {**{f"le_{b:g}": n for b, n in zip(self.buckets, counts)}, "inf": counts[-1]},
+        }
+
+
+class TimedLock:
+    """A Lock that records how long callers waited for it and held it."""
+
+    def __init__(self, wait: Histogram, hold: Histogram):
+        self.lock = threading.Lock()
+        self.wait = wait
+        self.hold = hold
+        self._acquired = 0.0
+
+    def __enter__(self):
+        start = time.perf_counter()
+        self.lock.acquire()
+        self._acquired = time.perf_counter()
+        self.wait.observe(self._acquired - start)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        held = time.perf_counter() - self._acquired
+        self.lock.release()
+        self.hold.observe(held)
+
+
+class Metrics:
+    """Named histograms and counters, plus the last error of each loop."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+        self.errors: Dict[str, dict] = {}   # loop -> {"count", "last", "logged"}
+        self.gauges: List[Callable[[], dict]] = []  # Extra figures computed on demand
+        self.lock = threading.Lock()
+
+    def histogram(self, name: str) -> Histogram:
+        with self.lock:
+            if name not in self.histograms: self.histograms[name] = Histogram(name)
+            return self.histograms[name]
+
+    def incr(self, name: str, n: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def error(self, where: str, exc: BaseException):
+        """Counts an exception a loop survived; prints it, at most every ERROR_LOG_PERIOD."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.errors.setdefault(where, {"count": 0, "last": "", "logged": -ERROR_LOG_PERIOD})
+            entry["count"] += 1
+            entry["last"] = repr(exc)
+            if now - entry["logged"] < ERROR_LOG_PERIOD: return
+            entry["logged"] = now
+            count = entry["count"]
+        print(f"[ERR] {where}: {exc!r} ({count} so far)")
+
+    def snapshot(self) -> dict:
+        snap = {"uptime_s": time.time() - self.started}
+        for gauge in self.gauges: snap.update(gauge())
+        with self.lock:
+            histograms = list(self.histograms.values())
+            snap["counters"] = dict(self.counters)
+            snap["errors"] = {k: {"count": v["count"], "last": v["last"]} for k, v in self.errors.items()}
+        snap["histograms"] = {h.name: h.snapshot() for h in histograms}
+        return snap
+
+    def text(self) -> str:
+        snap = self.snapshot()
+        lines = [f"uptime {snap['uptime_s']:.0f} s"]
+        for name, h in snap["histograms"].items():
+            lines.append(f"{name:<16} n={h['count']:<8} avg {h['avg_ms']:7.2f}  p50 {h['p50_ms']:.2f}  "
+                         f"p90 {h['p90_ms']:.2f}  p99 {h['p99_ms']:.2f}  max {h['max_ms']:.2f} ms")
+        for key, value in snap.items():
+            if key not in ("uptime_s", "histograms", "counters", "errors"):
+                lines.append(f"{key}: {value}")
+        lines += [f"{name}: {value}" for name, value in snap["counters"].items()]
+        lines += [f"errors in {where}: {e['count']} (last {e['last']})" for where, e in snap["errors"].items()]
+        return "\n".join(lines) + "\n"
+
+
+def serve_http(metrics: Metrics, host: str, port: int) -> Optional[ThreadingHTTPServer]:
+    """Serves the metrics on a daemon thread. Returns None if the port is taken."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics"):
+                body, ctype = json.dumps(metrics.snapshot()).encode(), "application/json"
+            elif self.path == "/":
+                body, ctype = metrics.text().encode(), "text/plain; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Keep the bridge console for the bridge
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        print(f"[NET] Metrics endpoint not started on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"[NET] Metrics on http://{host}:{port}/metrics")
+    return server
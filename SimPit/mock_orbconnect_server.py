@@ -1,15 +1,27 @@
 import socket
 import threading
 import time
+import math
 import curses
+import json
 import sys
+import urllib.request
 
 HOST = '0.0.0.0'
 PORT = 37777
+# The bridge's metrics endpoint (orbiter_bridge.py METRICS_PORT); shown in
+# the footer while it answers. None = don't ask.
+BRIDGE_METRICS_URL = "http://127.0.0.1:8377/metrics"
 
 STATE = {
-    "status": "Stopped", "client": "None", "inputs": {}, "sim_outputs": {}, "logs": [],
+    "status": "Stopped", "client": "None", "connections": 0, "inputs": {}, "sim_outputs": {}, "logs": [],
     "last_msg": "Waiting...", "msg_count": 0,
+    # SUB:<key>,<key>... registers keys; the server answers OK:SUB <n> and
+    # then pushes "<key>=<value>" lines, once for every key and again on
+    # each change. With allow_sub off it answers ERR:SUB, like a server
+    # without subscriptions, and clients fall back to polling.
+    "allow_sub": True, "subscriptions": 0, "pushes": 0,
+    "bridge": None,  # Last metrics snapshot from the bridge, if it is reachable
     
     # --- DSKY ---
     "reg_noun": "37", "reg_verb": "16", "reg_prog": "99",
@@ -45,14 +57,53 @@ def log_message(msg):
     STATE["logs"].append(f"[{time.strftime('%H:%M:%S')}] {msg}")
     if len(STATE["logs"]) > 6: STATE["logs"].pop(0)
 
+def output_value(msg):
+    """Current value of a GET:<key> (or FOCUS:<key>) the way orb:connect would answer it."""
+    response = "0"
+    clean = msg.replace("GET:NASSP:", "").replace("GET:", "")
+
+    if msg.startswith("FOCUS:"):
+        # Slowly tumbling attitude for OpenFDAI, in radians
+        t = time.time()
+        if "Pitch" in msg: response = f"{math.sin(t / 4) * 1.5:.4f}"
+        elif "Heading" in msg: response = f"{(t / 10) % (2 * math.pi):.4f}"
+        elif "Bank" in msg: response = f"{math.cos(t / 8) * math.pi:.4f}"
+    elif clean in STATE["blinkin"]: 
+        response = "1" if STATE["blinkin"][clean] else "0"
+    elif "Lit" in msg and "DSKY:" in msg:
+        dk = clean.replace("DSKY:", "")
+        if dk in STATE["lights"]: response = "1" if STATE["lights"][dk] else "0"
+    elif "Noun" in msg: response = STATE["reg_noun"] if STATE["show_noun"] else "  "
+    elif "Verb" in msg: response = STATE["reg_verb"] if STATE["show_verb"] else "  "
+    elif "Prog" in msg: response = STATE["reg_prog"] if STATE["show_prog"] else "  "
+    elif "R1" in msg: response = STATE["reg_r1"] if STATE["show_r1"] else "      "
+    elif "R2" in msg: response = STATE["reg_r2"] if STATE["show_r2"] else "      "
+    elif "R3" in msg: response = STATE["reg_r3"] if STATE["show_r3"] else "      "
+    return response
+
+def push_changes(conn, subs):
+    """Sends key=value for every subscribed key whose value changed since it was last pushed."""
+    lines = []
+    for key, last in subs.items():
+        value = output_value(key if key.startswith("FOCUS:") else "GET:" + key)
+        if value != last:
+            subs[key] = value
+            lines.append(f"{key}={value}\n")
+    if lines:
+        STATE["pushes"] += len(lines)
+        conn.sendall(''.join(lines).encode('ascii'))
+
 def handle_client(conn, addr):
-    STATE["status"] = "Connected"; STATE["client"] = f"{addr[0]}:{addr[1]}"
+    STATE["connections"] += 1
+    STATE["status"] = f"Connected ({STATE['connections']})"; STATE["client"] = f"{addr[0]}:{addr[1]}"
     conn.settimeout(0.05)
+    subs = {}  # Subscribed key -> value last pushed
     try:
         conn.sendall(b"OK:ORBITER_2024_NASSP\n")
         buffer = ""
         while True:
             try:
+                if subs: push_changes(conn, subs)
                 chunk = conn.recv(4096)
                 if not chunk: break
                 buffer += chunk.decode('ascii', errors='ignore')
@@ -76,27 +127,50 @@ def handle_client(conn, addr):
                         except: pass
                     
                     elif msg.startswith("GET:"):
-                        response = "0"
-                        clean = msg.replace("GET:NASSP:", "").replace("GET:", "")
-                        
-                        if clean in STATE["blinkin"]: 
-                            response = "1" if STATE["blinkin"][clean] else "0"
-                        elif "Lit" in msg and "DSKY:" in msg:
-                            dk = clean.replace("DSKY:", "")
-                            if dk in STATE["lights"]: response = "1" if STATE["lights"][dk] else "0"
-                        elif "Noun" in msg: response = STATE["reg_noun"] if STATE["show_noun"] else "  "
-                        elif "Verb" in msg: response = STATE["reg_verb"] if STATE["show_verb"] else "  "
-                        elif "Prog" in msg: response = STATE["reg_prog"] if STATE["show_prog"] else "  "
-                        elif "R1" in msg: response = STATE["reg_r1"] if STATE["show_r1"] else "      "
-                        elif "R2" in msg: response = STATE["reg_r2"] if STATE["show_r2"] else "      "
-                        elif "R3" in msg: response = STATE["reg_r3"] if STATE["show_r3"] else "      "
-                        
+                        response = output_value(msg)
                         STATE["sim_outputs"][msg] = response
                         conn.sendall((response + "\n").encode('ascii'))
+
+                    elif msg.startswith("FOCUS:"):
+                        conn.sendall(f"{msg}={output_value(msg)}\n".encode('ascii'))
+
+                    elif msg.startswith("SUB:"):
+                        if not STATE["allow_sub"]:
+                            conn.sendall(b"ERR:SUB not supported\n")
+                            continue
+                        if not subs: STATE["subscriptions"] += 1
+                        for key in filter(None, msg[4:].split(',')): subs[key] = None
+                        conn.sendall(f"OK:SUB {len(subs)}\n".encode('ascii'))
+                        push_changes(conn, subs)  # Initial values
+                        log_message(f"{addr[0]} subscribed to {len(subs)} keys")
             except socket.timeout: continue
             except ConnectionResetError: break
     except Exception as e: log_message(f"Err: {e}")
-    finally: STATE["status"] = "Listening..."; conn.close()
+    finally:
+        if subs: STATE["subscriptions"] -= 1
+        STATE["connections"] -= 1
+        STATE["status"] = f"Connected ({STATE['connections']})" if STATE["connections"] else "Listening..."
+        conn.close()
+
+def metrics_thread():
+    while True:
+        try:
+            with urllib.request.urlopen(BRIDGE_METRICS_URL, timeout=0.5) as r:
+                STATE["bridge"] = json.loads(r.read())
+        except (OSError, ValueError):
+            STATE["bridge"] = None
+        time.sleep(1)
+
+def bridge_summary(snap):
+    h = snap["histograms"]
+    p = lambda name, pct: h[name][f"p{pct}_ms"] if name in h else 0
+    c = snap["counters"]
+    errors = sum(e["count"] for e in snap["errors"].values())
+    return (f"BRIDGE: GET rtt p50 {p('get_rtt', 50):.1f}/p99 {p('get_rtt', 99):.1f} ms  "
+            f"cycle out {p('output_cycle', 99):.1f} in {p('input_cycle', 99):.1f} ms  "
+            f"hw_lock wait {p('hw_lock_wait', 99):.1f} hold {p('hw_lock_hold', 99):.1f} ms  "
+            f"joy {snap['joystick']['in']}/{snap['joystick']['sent']}  "
+            f"conn {c.get('telemetry_connects', 0)} drop {c.get('disconnects', 0)}  err {errors}")
 
 def server_thread():
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -105,7 +179,8 @@ def server_thread():
         s.bind((HOST, PORT)); s.listen(5)
         while True:
             conn, addr = s.accept()
-            handle_client(conn, addr)
+            # One thread per client: the bridge may hold a command and a telemetry connection
+            threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
     except: pass
 
 def draw_dashboard(stdscr):
@@ -120,6 +195,7 @@ def draw_dashboard(stdscr):
     stdscr.nodelay(True); curses.curs_set(0)
     
     t = threading.Thread(target=server_thread, daemon=True); t.start()
+    if BRIDGE_METRICS_URL: threading.Thread(target=metrics_thread, daemon=True).start()
     
     while True:
         try:
@@ -161,6 +237,8 @@ def draw_dashboard(stdscr):
             elif key == ord('c'): STATE["blinkin"]["WatchdogLit"] = not STATE["blinkin"]["WatchdogLit"]
             elif key == ord('b'): STATE["blinkin"]["GlycolLit"] = not STATE["blinkin"]["GlycolLit"]
             
+            elif key == ord('g'): STATE["allow_sub"] = not STATE["allow_sub"]
+            
             elif key == ord('`'): sys.exit(0)
         except: pass
 
@@ -178,6 +256,8 @@ def draw_dashboard(stdscr):
         status_color = curses.color_pair(2) if "Connected" in STATE["status"] else curses.color_pair(1)
         stdscr.addstr(0, 0, f"SRV: {STATE['status']}", status_color | curses.A_BOLD)
         stdscr.addstr(0, 25, f"CLIENT: {STATE['client']}", curses.color_pair(3))
+        try: stdscr.addstr(0, 55, f"SUB(g): {'on' if STATE['allow_sub'] else 'off'} {STATE['subscriptions']} clients, {STATE['pushes']} pushed", curses.color_pair(3))
+        except: pass
 
         # --- DSKY SECTION ---
         try:
@@ -298,6 +378,9 @@ def draw_dashboard(stdscr):
              except: pass
 
         # --- FOOTER ---
+        if STATE["bridge"]:
+            try: stdscr.addstr(h-3, 0, bridge_summary(STATE["bridge"])[:w-1], curses.color_pair(3))
+            except: pass
         try:
             stdscr.hline(h-2, 0, '-', w)
             ctr = STATE["msg_count"]
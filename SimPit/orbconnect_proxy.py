@@ -0,0 +1,275 @@
+# orbconnect_proxy.py
+# Caching orb:connect proxy.
+#
+# orbiter_bridge.py, OpenFDAI and any other panel can share one Orbiter
+# connection. The proxy holds the single upstream connection to
+# orb:connect and speaks the same line protocol to any number of clients:
+#   * GET:/FOCUS: queries are answered from a cache while the cached reply
+#     is younger than the key's TTL (see TTL_RULES),
+#   * identical queries from several clients while one is already in
+#     flight upstream share that one request,
+#   * SET: lines are passed straight through; they have no reply,
+#   * SUB: is refused (ERR:SUB), so subscribing clients fall back to
+#     polling, which the cache absorbs,
+#   * a query that cannot be answered (upstream down, or lost when it
+#     dropped) gets UNAVAILABLE, so every query still gets exactly one
+#     reply and clients matching replies to requests stay in step.
+# Upstream load therefore depends on the keys and their TTLs, not on the
+# number of panels. Everything runs on one asyncio loop.
+#
+# Usage: python3 orbconnect_proxy.py [--port 37778] [--upstream-host 192.168.2.229] [--upstream-port 37777]
+#        then point the panels at the proxy port (ORBITER_PORT in orbiter_bridge.py).
+import argparse
+import asyncio
+import time
+from collections import deque
+
+LISTEN_HOST = '0.0.0.0'
+LISTEN_PORT = 37778
+UPSTREAM_HOST = '127.0.0.1'
+UPSTREAM_PORT = 37777
+
+# Cache lifetime of a reply, seconds: the longest matching key prefix wins.
+TTL_RULES = {
+    "GET:NASSP:DSKY:": 0.1,   # Registers and DSKY lamps
+    "FOCUS:": 0.05,           # Attitude for OpenFDAI
+}
+DEFAULT_TTL = 0.25            # Everything else (Blinkin lamps, sensors)
+
+UPSTREAM_TIMEOUT = 1.0   # Unanswered queries after this: reconnect upstream
+MAX_BACKLOG = 64 * 1024  # Unread bytes before a client counts as stuck
+STATS_PERIOD = 10.0
+QUERY_PREFIXES = ("GET:", "FOCUS:")
+UNAVAILABLE = "ERR:upstream unavailable"
+
+
+def key_ttl(key, rules=TTL_RULES, default=DEFAULT_TTL):
+    best = None
+    for prefix in rules:
+        if key.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return rules[best] if best is not None else default
+
+
+class ProxyClient:
+    """One downstream panel connection."""
+
+    def __init__(self, proxy, reader, writer):
+        self.proxy = proxy
+        self.reader = reader
+        self.writer = writer
+        self.name = "%s:%s" % writer.get_extra_info('peername')[:2]
+        self.replies = asyncio.Queue()  # Futures, in the order the queries came
+
+    def send(self, data):
+        """Queues data for the client; drops it if it stopped reading."""
+        if self.writer.is_closing():
+            return
+        if self.writer.transport.get_write_buffer_size() > MAX_BACKLOG:
+            print(f"[Proxy] {self.name} is not reading, dropping it")
+            self.writer.close()
+            return
+        self.writer.write(data)
+
+    async def run(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return
+            msg = line.decode('ascii', errors='ignore').strip()
+            if not msg:
+                continue
+            if msg.startswith("SET:"):
+                self.proxy.forward(msg)
+            elif msg.startswith(QUERY_PREFIXES):
+                self.replies.put_nowait(self.proxy.query(msg))
+            elif msg.startswith("SUB:"):
+                self.replies.put_nowait(self.proxy.answer("ERR:SUB not supported by proxy"))
+            else:
+                self.replies.put_nowait(self.proxy.answer(f"ERR:unknown command {msg[:40]}"))
+
+    async def reply_loop(self):
+        """Writes replies in query order, one per query."""
+        while True:
+            reply = await (await self.replies.get())
+            self.send((reply + "\n").encode('ascii'))
+
+
+class OrbConnectProxy:
+    def __init__(self, upstream_host, upstream_port, ttl_rules=TTL_RULES, default_ttl=DEFAULT_TTL):
+        self.upstream = (upstream_host, upstream_port)
+        self.ttl_rules = ttl_rules
+        self.default_ttl = default_ttl
+        self.clients = set()
+        self.cache = {}        # query -> (reply, time)
+        self.ttls = {}         # query -> TTL (rules resolved once per key)
+        self.inflight = {}     # query -> future shared by every client asking
+        self.fifo = deque()    # Queries sent upstream, oldest first (replies come in order)
+        self.greeting = "OK:ORBCONNECT_PROXY"
+        self.writer = None     # Upstream, None while disconnected
+        self.out = bytearray()
+        self._flush_scheduled = False
+        self.stats = dict.fromkeys(("queries", "hits", "coalesced", "upstream", "sets"), 0)
+
+    # --- Downstream ---
+    async def serve_client(self, reader, writer):
+        client = ProxyClient(self, reader, writer)
+        self.clients.add(client)
+        print(f"[Proxy] {client.name} joined ({len(self.clients)} clients)")
+        client.send((self.greeting + "\n").encode('ascii'))
+        replier = asyncio.create_task(client.reply_loop())
+        try:
+            await client.run()
+        except ConnectionError:
+            pass  # Reset by the client
+        finally:
+            replier.cancel()
+            self.clients.discard(client)
+            writer.close()
+            print(f"[Proxy] {client.name} left ({len(self.clients)} clients)")
+
+    def answer(self, reply):
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(reply)
+        return future
+
+    def query(self, msg):
+        """Future for the reply to msg: cached, shared with one in flight, or a new request."""
+        self.stats["queries"] += 1
+        now = time.monotonic()
+        ttl = self.ttls.get(msg)
+        if ttl is None:
+            ttl = self.ttls[msg] = key_ttl(msg, self.ttl_rules, self.default_ttl)
+        cached = self.cache.get(msg)
+        if cached and now - cached[1] < ttl:
+            self.stats["hits"] += 1
+            return self.answer(cached[0])
+        future = self.inflight.get(msg)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return future
+        if self.writer is None:
+            return self.answer(UNAVAILABLE)  # Upstream down
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[msg] = future
+        self.fifo.append((msg, now))
+        self.stats["upstream"] += 1
+        self._queue(msg)
+        return future
+
+    def forward(self, msg):
+        if self.writer is None:
+            return  # Dropped while disconnected, like a failed send
+        self.stats["sets"] += 1
+        self._queue(msg)
+
+    # --- Upstream ---
+    def _queue(self, msg):
+        """Queues one line; everything queued in a loop pass shares one write."""
+        self.out += (msg + "\n").encode('ascii')
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+
+    def _flush(self):
+        self._flush_scheduled = False
+        if self.writer is None or self.writer.is_closing():
+            self.out.clear()
+            return
+        self.writer.write(bytes(self.out))
+        self.out.clear()
+
+    def _reply(self, line):
+        if line.startswith("OK:") or not self.fifo:
+            # Greeting (or an acknowledgement): not the answer to a query
+            if line.startswith("OK:") and not self.fifo:
+                self.greeting = line
+            return
+        msg, _ = self.fifo.popleft()
+        self.cache[msg] = (line, time.monotonic())
+        future = self.inflight.pop(msg, None)
+        if future is not None and not future.done():
+            future.set_result(line)
+
+    def _fail_inflight(self):
+        for future in self.inflight.values():
+            if not future.done():
+                future.set_result(UNAVAILABLE)
+        self.inflight.clear()
+        self.fifo.clear()
+
+    async def run_upstream(self):
+        """Holds the orb:connect connection, reconnecting whenever it drops."""
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(*self.upstream)
+            except OSError:
+                print("[Proxy] Could not connect to orb:connect %s:%s, retrying..." % self.upstream)
+                await asyncio.sleep(2)
+                continue
+
+            print("[Proxy] Connected to orb:connect %s:%s" % self.upstream)
+            self.writer = writer
+            try:
+                while True:
+                    if self.fifo:
+                        wait = self.fifo[0][1] + UPSTREAM_TIMEOUT - time.monotonic()
+                        line = await asyncio.wait_for(reader.readline(), max(0.0, wait))
+                    else:
+                        line = await reader.readline()
+                    if not line:
+                        break
+                    self._reply(line.decode('ascii', errors='replace').strip())
+            except asyncio.TimeoutError:
+                print(f"[Proxy] orb:connect stopped answering ({len(self.fifo)} queries), reconnecting")
+            except ConnectionError:
+                pass
+            finally:
+                self.writer = None
+                self.out.clear()
+                self._fail_inflight()
+                writer.close()
+            print("[Proxy] orb:connect disconnected")
+            await asyncio.sleep(2)
+
+    async def report(self, period):
+        last = dict(self.stats)
+        while True:
+            await asyncio.sleep(period)
+            delta = {k: v - last[k] for k, v in self.stats.items()}
+            last = dict(self.stats)
+            if delta["queries"] or delta["sets"]:
+                print(f"[Proxy] {len(self.clients)} clients: {delta['queries'] / period:.0f} queries/s, "
+                      f"{delta['hits']} cached, {delta['coalesced']} coalesced, "
+                      f"{delta['upstream'] / period:.0f} upstream GETs/s, {delta['sets']} SETs")
+
+    async def run(self, host, port, stats_period=STATS_PERIOD):
+        server = await asyncio.start_server(self.serve_client, host, port)
+        print(f"[Proxy] Serving orb:connect clients on {host}:{port}")
+        tasks = [server.serve_forever(), self.run_upstream()]
+        if stats_period:
+            tasks.append(self.report(stats_period))
+        async with server:
+            await asyncio.gather(*tasks)
+
+
+def main():
+    cli = argparse.ArgumentParser(description="Caching orb:connect proxy for several panels.")
+    cli.add_argument("--host", default=LISTEN_HOST, help="Address to serve panels on.")
+    cli.add_argument("--port", type=int, default=LISTEN_PORT, help="Port to serve panels on.")
+    cli.add_argument("--upstream-host", default=UPSTREAM_HOST, help="orb:connect host.")
+    cli.add_argument("--upstream-port", type=int, default=UPSTREAM_PORT, help="orb:connect port.")
+    cli.add_argument("--ttl", type=float, default=DEFAULT_TTL,
+                     help="Cache lifetime of keys not in TTL_RULES, seconds.")
+    cli.add_argument("--stats", type=float, default=STATS_PERIOD,
+                     help="Seconds between traffic reports (0 = none).")
+    args = cli.parse_args()
+
+    proxy = OrbConnectProxy(args.upstream_host, args.upstream_port, default_ttl=args.ttl)
+    try:
+        asyncio.run(proxy.run(args.host, args.port, args.stats))
+    except KeyboardInterrupt:
+        print("\n[Proxy] Exiting...")
+
+if __name__ == "__main__":
+    main()
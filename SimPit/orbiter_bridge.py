@@ -1,9 +1,18 @@
+import os
 import socket
+import select
 import time
 import threading
 import sys
+from collections import deque
 from typing import Dict, Tuple, List, Optional
 
+# The timer wheel is shared with the yaAGC driver and lives in its directory.
+# Appended, not prepended: yaAGC has its own hardware package, and ours must win.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "yaAGC"))
+from timerwheel import TimerWheel
+from metrics import Metrics, TimedLock, serve_http
+
 # --- HARDWARE IMPORTS ---
 try:
     from UnifiedSimPitDriver import UnifiedSimPitDriver
@@ -27,10 +36,34 @@ except ImportError:
 
 ORBITER_HOST = '127.0.0.1' # Localhost if running Mock Server on same Pi
 ORBITER_PORT = 37777
+# True: SETs go out on a second, write-only connection fed by a queue, so
+# stick and key input never waits behind a GET poll on the telemetry socket.
+SPLIT_CHANNELS = False
+# True: ask orb:connect to push output changes (SUB:) instead of polling
+# them. A server that refuses the subscription is polled as before.
+SUBSCRIBE = False
 GPIO_CHIP_NAME = "gpiochip4"
 
+# --- TIMING ---
+OUTPUT_PERIOD = 0.1  # DSKY/lamp refresh cadence (seconds)
+REPLY_TIMEOUT = 0.1  # How long a GET waits for its reply (socket timeout)
+STALE_REPLY = 1.0    # A GET still unanswered after this is written off (resync)
+SUB_TIMEOUT = 0.5    # How long to wait for the server to accept a SUB:
+
+# Joystick axes are coalesced (latest value wins) and sent at this rate, Hz.
+# Buttons are always sent at once. None = send every axis event.
+JOYSTICK_AXIS_RATE: Optional[float] = 50.0
+
 # --- DEBUG FLAGS ---
 DEBUG_JOYSTICK = False  # <--- Set to True to see joystick prints in console
+DEBUG_QUEUE = False     # Print outbound queue and poll stats every QUEUE_REPORT_PERIOD
+QUEUE_REPORT_PERIOD = 5.0
+
+# --- METRICS ---
+# Histograms and counters (see metrics.py) served as JSON on
+# http://METRICS_HOST:METRICS_PORT/metrics, and as text on /. None = off.
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT: Optional[int] = 8377
 
 # Pins
 BB_CLK = 21; BB_LATCH = 20; BB_DATA_OUT = 16
@@ -90,12 +123,217 @@ THREE_POS_STATE_LOGIC = { (0, 0): 1, (1, 0): 0, (0, 1): 2, (1, 1): 1 }
 MOMENTARY_SWITCHES: Dict[int, str] = {
     8: "AbortButton", 9: "AbortStageButton"
 }
+MOMENTARY_MASK = sum(1 << bit for bit in MOMENTARY_SWITCHES)
 
 DSKY_DIGIT_MAP = {
     "R1": (2, 0, 6), "PROG": (2, 6, 2), "R2": (1, 0, 6), 
     "VERB": (1, 6, 2), "R3": (0, 0, 6), "NOUN": (0, 6, 2)
 }
 
+DSKY_FIELD_KEYS = {
+    "PROG": "GET:NASSP:DSKY:Prog", "VERB": "GET:NASSP:DSKY:Verb", "NOUN": "GET:NASSP:DSKY:Noun",
+    "R1": "GET:NASSP:DSKY:R1", "R2": "GET:NASSP:DSKY:R2", "R3": "GET:NASSP:DSKY:R3"
+}
+
+DSKY_LAMP_KEYS: List[str] = [key for pair in DSKY_LED_PAIRS.values() for key in pair if key]
+
+# Every GET the outputs need; each refresh sends the due ones as a single batch
+OUTPUT_GETS: List[str] = list(DSKY_FIELD_KEYS.values()) + list(BLINKIN_INDICATOR_MAP) + DSKY_LAMP_KEYS
+
+# --- POLL SCHEDULE ---
+# Base poll rate of each GET, Hz (keys not listed use POLL_DEFAULT_RATE).
+# A key whose value changes is polled at POLL_FAST_RATE until it has been
+# stable for POLL_BOOST_HOLD seconds. Input promotes the keys it is likely
+# to affect to the fast rate for POLL_PROMOTE_HOLD seconds (the DSKY after
+# a key press, the Blinkin lamps after a switch).
+POLL_FAST_RATE = 1.0 / OUTPUT_PERIOD
+POLL_DEFAULT_RATE = 1.0
+POLL_BOOST_HOLD = 2.0
+POLL_PROMOTE_HOLD = 3.0
+POLL_RATES: Dict[str, float] = {
+    **dict.fromkeys(DSKY_FIELD_KEYS.values(), 2.0),
+    **dict.fromkeys(DSKY_LAMP_KEYS, 1.0),
+    **dict.fromkeys(BLINKIN_INDICATOR_MAP, 1.0),
+    # Caution lamps that change a few times a session
+    "GET:NASSP:GlycolLit": 0.2, "GET:NASSP:HeaterLit": 0.2, "GET:NASSP:WatchdogLit": 0.2,
+}
+
+# Keys promoted to the fast poll rate by input (see PollSchedule.promote)
+DSKY_PROMOTE_KEYS: List[str] = list(DSKY_FIELD_KEYS.values()) + DSKY_LAMP_KEYS
+BLINKIN_PROMOTE_KEYS: List[str] = list(BLINKIN_INDICATOR_MAP)
+
+# ==============================================================================
+# --- OUTBOUND QUEUE ---
+# ==============================================================================
+
+# Outbound command classes, highest priority first
+CRITICAL, DISCRETE, AXIS, POLL = range(4)
+CLASS_NAMES = ("critical", "discrete", "axis", "poll")
+CRITICAL_PREFIXES = ("SET:AbortButton=", "SET:AbortStageButton=", "SET:DskySwitch")
+
+
+def command_class(cmd: str) -> int:
+    if cmd.startswith("GET:"): return POLL
+    if cmd.startswith(CRITICAL_PREFIXES): return CRITICAL
+    return DISCRETE
+
+
+def reply_key(cmd: str) -> str:
+    """The key a server that answers key=value puts on the reply to cmd (as in pushes)."""
+    return cmd[len("GET:"):] if cmd.startswith("GET:") else cmd
+
+
+class OutboundQueue:
+    """
+    Everything the bridge sends, for the single writer thread. take()
+    returns all pending commands highest class first, so an abort or DSKY
+    key never waits behind axis updates or a GET batch. An axis update
+    replaces the one still pending for the same axis (latest value wins).
+    Per class it keeps the current/max depth and enqueue-to-write latency.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.fifos = {cls: deque() for cls in (CRITICAL, DISCRETE, POLL)}  # (cmd, enqueued)
+        self.axes: Dict[str, list] = {}   # axis -> [cmd, enqueued], insertion ordered
+        self.max_depth = [0] * len(CLASS_NAMES)
+        self.sent = [0] * len(CLASS_NAMES)
+        self.merged = 0
+        self.latency_sum = [0.0] * len(CLASS_NAMES)
+        self.latency_max = [0.0] * len(CLASS_NAMES)
+
+    def put(self, cmd: str, cls: Optional[int] = None):
+        cls = command_class(cmd) if cls is None else cls
+        with self.cond:
+            fifo = self.fifos[cls]
+            fifo.append((cmd, time.monotonic()))
+            self.max_depth[cls] = max(self.max_depth[cls], len(fifo))
+            self.cond.notify()
+
+    def put_axis(self, axis: str, cmd: str):
+        with self.cond:
+            pending = self.axes.get(axis)
+            if pending:
+                pending[0] = cmd  # Stale value merged away; keep the older timestamp
+                self.merged += 1
+            else:
+                self.axes[axis] = [cmd, time.monotonic()]
+                self.max_depth[AXIS] = max(self.max_depth[AXIS], len(self.axes))
+            self.cond.notify()
+
+    def take(self, timeout: float) -> List[Tuple[int, str]]:
+        """Waits up to timeout for work; returns [(class, cmd)] in send order."""
+        with self.cond:
+            if not self.depth():
+                self.cond.wait(timeout)
+            now = time.monotonic()
+            batch = []
+            for cls in (CRITICAL, DISCRETE, AXIS, POLL):
+                if cls == AXIS:
+                    items = [tuple(item) for item in self.axes.values()]
+                    self.axes.clear()
+                else:
+                    items = list(self.fifos[cls])
+                    self.fifos[cls].clear()
+                for cmd, enqueued in items:
+                    waited = now - enqueued
+                    self.sent[cls] += 1
+                    self.latency_sum[cls] += waited
+                    self.latency_max[cls] = max(self.latency_max[cls], waited)
+                    batch.append((cls, cmd))
+            return batch
+
+    def clear(self):
+        with self.cond:
+            for fifo in self.fifos.values(): fifo.clear()
+            self.axes.clear()
+
+    def depth(self) -> int:
+        return sum(len(fifo) for fifo in self.fifos.values()) + len(self.axes)
+
+    def stats(self) -> Dict[str, dict]:
+        with self.cond:
+            depths = {CRITICAL: len(self.fifos[CRITICAL]), DISCRETE: len(self.fifos[DISCRETE]),
+                      AXIS: len(self.axes), POLL: len(self.fifos[POLL])}
+            return {
+                name: {
+                    "depth": depths[cls], "max_depth": self.max_depth[cls], "sent": self.sent[cls],
+                    "avg_ms": 1000 * self.latency_sum[cls] / self.sent[cls] if self.sent[cls] else 0.0,
+                    "max_ms": 1000 * self.latency_max[cls],
+                }
+                for cls, name in enumerate(CLASS_NAMES)
+            }
+
+    def report(self) -> str:
+        parts = [f"{name} {st['depth']}/{st['max_depth']} avg {st['avg_ms']:.1f} max {st['max_ms']:.1f} ms"
+                 for name, st in self.stats().items()]
+        return "[NET] queue " + ", ".join(parts) + f", {self.merged} axis updates merged"
+
+# ==============================================================================
+# --- POLL SCHEDULE ---
+# ==============================================================================
+
+class PollSchedule:
+    """
+    When each GET is next due. A key is polled at its base rate while it is
+    stable and at the fast rate for a while after its value changes or it
+    is promoted. due() is called from the output thread and promote() from
+    the input thread, so both take the lock.
+    """
+
+    def __init__(self, keys: List[str], rates: Dict[str, float]):
+        self.lock = threading.Lock()
+        self.base = {key: rates.get(key, POLL_DEFAULT_RATE) for key in keys}
+        self.next_due = dict.fromkeys(keys, 0.0)
+        self.fast_until = dict.fromkeys(keys, 0.0)
+        self.values: Dict[str, str] = {}  # Last reply of each key
+        self.polls = 0
+        self.changes = 0
+
+    def period(self, key: str, now: float) -> float:
+        rate = self.base[key]
+        if now < self.fast_until[key]: rate = max(rate, POLL_FAST_RATE)
+        return 1.0 / rate
+
+    def due(self, now: float) -> List[str]:
+        """The keys to poll now; each is scheduled again one period on."""
+        with self.lock:
+            keys = [key for key, t in self.next_due.items() if t <= now]
+            for key in keys: self.next_due[key] = now + self.period(key, now)
+            self.polls += len(keys)
+            return keys
+
+    def update(self, key: str, value: Optional[str], now: float):
+        """Records a reply; a changed value switches the key to the fast rate."""
+        if value is None: return  # No reply: the key is simply polled again when due
+        with self.lock:
+            old = self.values.get(key)
+            self.values[key] = value
+            if old is not None and old != value:
+                self.changes += 1
+                self._boost(key, now, POLL_BOOST_HOLD)
+
+    def promote(self, keys: List[str], hold: float = POLL_PROMOTE_HOLD):
+        """Polls keys at the fast rate for the next hold seconds, starting now."""
+        now = time.monotonic()
+        with self.lock:
+            for key in keys: self._boost(key, now, hold)
+
+    def _boost(self, key: str, now: float, hold: float):
+        self.fast_until[key] = max(self.fast_until[key], now + hold)
+        self.next_due[key] = min(self.next_due[key], now + 1.0 / POLL_FAST_RATE)
+
+    def reset(self):
+        """Everything due at once (new connection)."""
+        with self.lock:
+            for key in self.next_due: self.next_due[key] = 0.0
+
+    def report(self) -> str:
+        now = time.monotonic()
+        with self.lock:
+            fast = sum(1 for t in self.fast_until.values() if t > now)
+            return f"[NET] polls {self.polls} sent, {self.changes} changes, {fast}/{len(self.base)} keys fast"
+
 # ==============================================================================
 # --- ORBITER BRIDGE ---
 # ==============================================================================
@@ -104,90 +342,371 @@ class OrbiterBridge:
     def __init__(self, driver: UnifiedSimPitDriver):
         self.driver = driver
         self.running = False
-        self.net_lock = threading.Lock(); self.hw_lock = threading.Lock()  
-        self.orbiter_socket: Optional[socket.socket] = None
+        self.metrics = Metrics()
+        self.get_rtt = self.metrics.histogram("get_rtt")            # GET sent -> its reply read
+        self.output_cycle = self.metrics.histogram("output_cycle")  # One refresh_outputs pass
+        self.input_cycle = self.metrics.histogram("input_cycle")    # One input_loop scan
+        self.net_lock = threading.Lock()
+        self.hw_lock = TimedLock(self.metrics.histogram("hw_lock_wait"), self.metrics.histogram("hw_lock_hold"))
+        self.orbiter_socket: Optional[socket.socket] = None  # GETs (and SETs unless split)
+        self.command_socket: Optional[socket.socket] = None  # SETs, with SPLIT_CHANNELS
+        self.outbound = OutboundQueue()  # Drained by writer_loop, the only writer
+        self.rx_buffer = bytearray()  # Received bytes not yet split into reply lines
+        # GETs sent but not yet answered, oldest first: (seq, sent time, command).
+        # Replies come back in request order, so each line answers the head.
+        self.outstanding: deque = deque()
+        self.next_seq = 0
+        self.late_replies = 0   # Replies that arrived after their GET gave up
+        self.stray_lines = 0    # Lines that arrived with no GET outstanding
+        self.resyncs = 0
+        self.poll_schedule = PollSchedule(OUTPUT_GETS, POLL_RATES)
+        self.subscribed: set = set()  # Keys (without GET:) the server pushes; empty = polling
+        self.pushes = 0
         
         self.last_tm_key_tuple = (0, 0, 0, 0)
         self.last_toggle_states = {}
         self.last_blinkin_bits = 0 
 
+        # Shadows of what the outputs show, so a refresh only writes changes
+        self.field_shadow: Dict[str, str] = {}             # DSKY field -> value shown
+        self.digit_shadow: Dict[Tuple[int, int], int] = {} # (board, addr) -> font byte
+        self.lamp_shadow: Dict[int, int] = {}               # DSKY lamp addr -> byte
+        self.blinkin_shadow: Optional[int] = None           # Blinkin LED bits (None = unknown)
+
         # --- JOYSTICK INIT ---
         # Initialize the joystick controller with our callback
-        self.joy = JoystickController(callback_func=self.handle_joystick_input)
+        self.joy = JoystickController(callback_func=self.handle_joystick_input,
+                                      axis_callback=self.handle_joystick_axes,
+                                      axis_rate=JOYSTICK_AXIS_RATE)
+        self.metrics.gauges.append(self._gauges)
         
         with self.hw_lock: self.driver.clearDisplay()
 
     def connect_network(self) -> bool:
-        print(f"Connecting to {ORBITER_HOST}:{ORBITER_PORT}...")
+        if not self.orbiter_socket:
+            print(f"Connecting to {ORBITER_HOST}:{ORBITER_PORT}...")
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            try:
+                sock.connect((ORBITER_HOST, ORBITER_PORT))
+                sock.settimeout(REPLY_TIMEOUT)
+                # Set up the connection before the other threads can see it:
+                # they only use self.orbiter_socket once it is published.
+                with self.net_lock:
+                    self.rx_buffer.clear()
+                    self.outstanding.clear()
+                    self.outbound.clear()  # GETs queued for the old connection
+                    self.poll_schedule.reset()
+                    self.subscribed.clear()
+                    self._read_greeting(sock)
+                    if SUBSCRIBE: self._subscribe(sock)
+                    self.orbiter_socket = sock
+                print("Connected.")
+                self.metrics.incr("telemetry_connects")
+            except socket.error:
+                sock.close()
+                self.metrics.incr("connect_failures")
+                return False
+        if SPLIT_CHANNELS and not self.command_socket:
+            try:
+                self.command_socket = socket.create_connection((ORBITER_HOST, ORBITER_PORT))
+                print("Command channel connected.")
+                self.metrics.incr("command_connects")
+            except socket.error:
+                self.metrics.incr("connect_failures")
+                return False
+        return True
+
+    def network_up(self) -> bool:
+        return bool(self.orbiter_socket and (self.command_socket or not SPLIT_CHANNELS))
+
+    def writer_loop(self):
+        """
+        The one thread that writes to orb:connect. Each pass takes everything
+        queued, highest priority first, and sends it with one sendall per
+        socket: GETs on the telemetry socket, SETs on the command socket
+        with SPLIT_CHANNELS (otherwise on the same one).
+        """
+        while self.running:
+            batch = self.outbound.take(timeout=0.5)
+            if not batch: continue
+            sets = [cmd for cls, cmd in batch if cls != POLL]
+            gets = [cmd for cls, cmd in batch if cls == POLL]
+            if SPLIT_CHANNELS:
+                self._write(self.command_socket, sets, "Command channel")
+                self._write(self.orbiter_socket, gets, "Telemetry channel")
+            else:
+                self._write(self.orbiter_socket, sets + gets, "Connection")
+
+    def _write(self, sock: Optional[socket.socket], cmds: List[str], name: str):
+        if not cmds or not sock: return  # Dropped while disconnected, like a failed send
         try:
-            self.orbiter_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.orbiter_socket.connect((ORBITER_HOST, ORBITER_PORT))
-            self.orbiter_socket.settimeout(0.1)
-            print("Connected.")
-            return True
+            sock.sendall(''.join(cmd + '\n' for cmd in cmds).encode('ascii'))
         except socket.error:
-            self.orbiter_socket = None
-            return False
+            print(f"{name} lost.")
+            self.metrics.incr("disconnects")
+            if sock is self.command_socket: self.command_socket = None
+            if sock is self.orbiter_socket: self.orbiter_socket = None
+            sock.close()
 
     def send_command(self, cmd: str) -> Optional[str]:
+        # We do NOT wait for a response for SET commands to speed up Joystick traffic
+        if cmd.startswith("SET:"):
+            if not self.network_up(): return None
+            self.outbound.put(cmd)
+            return "OK"
+
+        # Only wait for response on GET commands
+        return self.send_batch([cmd])[0]
+
+    def send_batch(self, cmds: List[str]) -> List[Optional[str]]:
+        """
+        Pipelines GET commands: all of them go out in one write, then the
+        replies are read back in order, so a batch costs one round trip
+        instead of one per GET. Replies that did not arrive, or are ERR:, are None.
+        """
+        replies: List[Optional[str]] = []
         with self.net_lock:
-            if not self.orbiter_socket: return None
+            # The writer may drop self.orbiter_socket at any time; this batch
+            # only ever uses the socket it started with (closed = socket.error).
+            sock = self.orbiter_socket
+            if not sock: return [None] * len(cmds)
+            try:
+                sent = time.perf_counter()
+                for seq in self._send_gets(sock, cmds):
+                    line = self._read_reply(sock, seq)
+                    if line is None: break
+                    # ERR: (e.g. the proxy's upstream is down) answers the GET without a value
+                    replies.append(None if line.startswith("ERR:") else line)
+                    self.get_rtt.observe(time.perf_counter() - sent)
+            except (socket.timeout, socket.error):
+                pass
+            if len(replies) < len(cmds) and self.outstanding:
+                # A reply went missing (or the stream was out of step): the
+                # next batch must not start counting lines from here.
+                try:
+                    self._resync(sock)
+                except socket.error:
+                    pass
+        return replies + [None] * (len(cmds) - len(replies))
+
+    # --- Reply stream (all of these are called with net_lock held, on the
+    # --- telemetry socket the caller read from self.orbiter_socket once) ---
+    def _send_gets(self, sock: socket.socket, cmds: List[str]) -> range:
+        """Queues GETs for the writer and as outstanding replies. Returns their seqs."""
+        if self.outstanding and time.monotonic() - self.outstanding[0][1] > STALE_REPLY:
+            self._resync(sock)
+        elif not self.outstanding:
+            # Anything already received answers nothing we sent: apply any
+            # pushes, drop the rest, so it is not taken for these replies.
+            self._read_pushes(sock)
+        # The writer sends POLL entries in queue order, which is the order
+        # they are registered here, so replies still answer the FIFO head.
+        for cmd in cmds: self.outbound.put(cmd, POLL)
+        now = time.monotonic()
+        first = self.next_seq
+        for seq, cmd in zip(range(first, first + len(cmds)), cmds):
+            self.outstanding.append((seq, now, cmd))
+        self.next_seq += len(cmds)
+        return range(first, self.next_seq)
+
+    def _read_reply(self, sock: socket.socket, seq: int) -> Optional[str]:
+        """
+        Reads lines until the reply to GET seq. Lines that answer older GETs
+        whose callers already timed out are dropped, so a late reply is never
+        taken for the next GET's. A server that answers key=value has the
+        key checked against the GET it is taken for, and only the value is
+        returned; the key of a later GET means the stream is out of step
+        (None, the caller resyncs). Raises socket.timeout if no reply comes.
+        """
+        while True:
+            line = self._read_line(sock)
+            if line is None: return None
+            if self._take_push(line): continue
+            if line.startswith("OK:") or not self.outstanding:
+                # Greeting, or a reply to nothing we are waiting for
+                if not line.startswith("OK:"): self.stray_lines += 1
+                continue
+            head, _, cmd = self.outstanding[0]
+            key, sep, value = line.partition('=')
+            if sep and key in (reply_key(c) for _, _, c in self.outstanding):
+                # Keyed reply (key=value): it must be for the head GET
+                if key != reply_key(cmd): return None
+                line = value
+            self.outstanding.popleft()
+            if head == seq:
+                return line
+            self.late_replies += 1
+
+    def _read_greeting(self, sock: socket.socket):
+        """orb:connect may greet a new client with an OK: line; don't take it for a reply."""
+        try:
+            line = self._read_line(sock)
+            if line is not None and not line.startswith("OK:"):
+                self.rx_buffer[:0] = (line + '\n').encode('ascii')
+        except socket.timeout:
+            pass
+
+    def _subscribe(self, sock: socket.socket):
+        """
+        Registers every output key with SUB:. The server answers OK:SUB and
+        from then on pushes key=value lines when a value changes. Anything
+        else (or no answer) means it does not do subscriptions: poll. Before
+        polling starts the connection is read until it goes quiet, so a slow
+        or unexpected answer is not taken for the first GET's reply.
+        """
+        # Sent directly: sock is not published yet, so the writer can't be using it
+        sock.sendall(("SUB:" + ",".join(key[len("GET:"):] for key in OUTPUT_GETS) + "\n").encode('ascii'))
+        deadline = time.monotonic() + SUB_TIMEOUT
+        while time.monotonic() < deadline:
+            try:
+                line = self._read_line(sock)
+            except socket.timeout:
+                continue  # The server is slow to answer
+            if line is None or self._take_push(line): break
+        if not self.subscribed:
             try:
-                self.orbiter_socket.sendall((cmd + '\n').encode('ascii'))
-                # We do NOT wait for a response for SET commands to speed up Joystick traffic
-                if cmd.startswith("SET:"): 
-                    return "OK"
-                
-                # Only wait for response on GET commands
-                response = b''
                 while True:
-                    chunk = self.orbiter_socket.recv(1024)
-                    if not chunk: break
-                    response += chunk
-                    if b'\n' in chunk: break
-                return response.decode('ascii').strip('\n\r')
-            except (socket.timeout, socket.error): 
-                return None
-
-    # --- JOYSTICK CALLBACK ---
-    def handle_joystick_input(self, axis_name: str, value: float):
+                    line = self._read_line(sock)
+                    if line is None: break
+                    # A late OK:SUB still switches to push mode
+                    if not self._take_push(line): self.stray_lines += 1
+            except socket.timeout:
+                pass  # Quiet: nothing more is coming for SUB:
+        if not self.subscribed:
+            print("[NET] Subscription refused or unanswered, polling")
+
+    def _take_push(self, line: str) -> bool:
         """
-        Called by the Joystick Thread whenever an axis or button changes.
+        Handles a line that is not a GET reply: a pushed key=value, or the
+        answer to SUB: (which may come late). False for anything else.
         """
-        cmd = ""
-        
+        if line.startswith("OK:SUB"):
+            self.subscribed = {key[len("GET:"):] for key in OUTPUT_GETS}
+            print(f"[NET] Subscribed to {len(self.subscribed)} outputs, orb:connect pushes changes")
+            return True
+        if line.startswith("ERR:SUB"): return True
+        if not self.subscribed: return False
+        key, sep, value = line.partition('=')
+        if not sep or key not in self.subscribed: return False
+        self.poll_schedule.update("GET:" + key, value, time.monotonic())
+        self.pushes += 1
+        return True
+
+    def _read_pushes(self, sock: socket.socket) -> bool:
+        """Applies every pushed line received so far, without waiting. False on EOF."""
+        while True:
+            while b'\n' in self.rx_buffer:
+                line = self._read_line(sock)
+                if self._take_push(line) or line.startswith("OK:"): continue
+                if self.outstanding:
+                    self.outstanding.popleft()  # Reply to a GET that gave up
+                    self.late_replies += 1
+                else:
+                    self.stray_lines += 1
+            if not select.select([sock], [], [], 0)[0]: return True
+            chunk = sock.recv(4096)
+            if not chunk: return False
+            self.rx_buffer += chunk
+
+    def _resync(self, sock: socket.socket):
+        """
+        The head GET never got its reply, so line counts can no longer be
+        trusted. Discard everything until the connection goes quiet and
+        start counting afresh.
+        """
+        self.resyncs += 1
+        print(f"[NET] Reply stream out of sync ({len(self.outstanding)} unanswered GETs), resynchronising")
+        self.outstanding.clear()
+        self._drain(sock)
+
+    def _drain(self, sock: socket.socket):
+        """Discards everything received until the connection goes quiet."""
+        self.rx_buffer.clear()
+        try:
+            while sock.recv(4096):
+                pass
+        except socket.timeout:
+            pass
+
+    def _read_line(self, sock: socket.socket) -> Optional[str]:
+        """Next reply line; any bytes after it stay buffered."""
+        while True:
+            end = self.rx_buffer.find(b'\n')
+            if end >= 0:
+                line = bytes(self.rx_buffer[:end])
+                del self.rx_buffer[:end + 1]
+                return line.decode('ascii', errors='replace').strip('\r')
+            chunk = sock.recv(4096)
+            if not chunk: return None
+            self.rx_buffer += chunk
+
+    def send_axis(self, axis_name: str, cmd: str):
+        """Queues an axis SET; it replaces one for the same axis not yet sent."""
+        if self.network_up(): self.outbound.put_axis(axis_name, cmd)
+
+    # --- JOYSTICK CALLBACKS ---
+    def joystick_command(self, axis_name: str, value: float) -> str:
         # 1. Handle Throttle Logic (-1.0 to 1.0  ->  0.0 to 1.0)
         if axis_name == "MAIN_THROTTLE":
             throttle_val = (value + 1.0) / 2.0
-            cmd = f"SET:MAIN_THROTTLE={throttle_val:.3f}"
+            return f"SET:MAIN_THROTTLE={throttle_val:.3f}"
             
         # 2. Handle Buttons (SET:JOY_BTN_1=1)
         elif "JOY_" in axis_name:
-            cmd = f"SET:{axis_name}={int(value)}"
+            return f"SET:{axis_name}={int(value)}"
             
         # 3. Handle RCS (Standard -1.0 to 1.0)
         else:
-            cmd = f"SET:{axis_name}={value:.3f}"
+            return f"SET:{axis_name}={value:.3f}"
+
+    def handle_joystick_input(self, axis_name: str, value: float):
+        """
+        Called by the Joystick Thread whenever a button changes (and for
+        every axis event if JOYSTICK_AXIS_RATE is None).
+        """
+        cmd = self.joystick_command(axis_name, value)
+        self.metrics.incr("joystick_delivered")
+        if "JOY_" in axis_name: self.metrics.incr("joystick_buttons")
 
         # DEBUG OUTPUT
         if DEBUG_JOYSTICK:
             print(f"[JOY] Sending: {cmd}")
 
-        self.send_command(cmd)
+        if "JOY_" in axis_name: self.send_command(cmd)
+        else: self.send_axis(axis_name, cmd)
+
+    def handle_joystick_axes(self, axes: List[Tuple[str, float]]):
+        """Called JOYSTICK_AXIS_RATE times a second with the axes that moved."""
+        self.metrics.incr("joystick_delivered", len(axes))
+        for name, value in axes:
+            cmd = self.joystick_command(name, value)
+            if DEBUG_JOYSTICK:
+                print(f"[JOY] Sending: {cmd}")
+            self.send_axis(name, cmd)
 
-    def update_dsky_digits(self, field_name: str, value_str: str):
-        if field_name not in DSKY_DIGIT_MAP or value_str is None: return
+    def update_dsky_digits(self, field_name: str, value_str: str) -> List[Tuple[int, int, int]]:
+        """
+        Returns the (board, addr, font byte) writes needed to show value_str
+        in a field. The shadows are only updated once the writes are done.
+        """
+        if field_name not in DSKY_DIGIT_MAP or value_str is None: return []
+        if self.field_shadow.get(field_name) == value_str: return []
         board_idx, start_digit, max_len = DSKY_DIGIT_MAP[field_name]
         cleaned_val = value_str.replace('=', '').replace('R1', '').replace('R2', '').replace('R3', '')
+        writes = []
         for i in range(max_len):
             char = cleaned_val[i] if i < len(cleaned_val) else ' '
             addr = (start_digit + i) * 2
-            if addr <= 14: self.driver.sendData(addr, TM1638_FONT.get(char, 0), TMindex=board_idx)
+            font = TM1638_FONT.get(char, 0)
+            if addr <= 14 and self.digit_shadow.get((board_idx, addr)) != font:
+                writes.append((board_idx, addr, font))
+        return writes
 
     def input_loop(self):
         while self.running:
             if not self.orbiter_socket:
                 time.sleep(1); continue
+            start = time.perf_counter()
             try:
                 with self.hw_lock:
                     current_blinkin = self.driver.read_switches()
@@ -195,6 +714,7 @@ class OrbiterBridge:
 
                 # TM1638 Keys
                 if raw_keys != self.last_tm_key_tuple:
+                    self.poll_schedule.promote(DSKY_PROMOTE_KEYS)
                     if raw_keys in TM_KEY_DECODE: self.send_command(f"SET:{TM_KEY_DECODE[raw_keys]}=1")
                     elif self.last_tm_key_tuple in TM_KEY_DECODE: self.send_command(f"SET:{TM_KEY_DECODE[self.last_tm_key_tuple]}=0")
                     self.last_tm_key_tuple = raw_keys
@@ -206,10 +726,12 @@ class OrbiterBridge:
                     curr = THREE_POS_STATE_LOGIC.get((b_down, b_up), 1)
                     if curr != self.last_toggle_states.get(uid, -1):
                         self.send_command(f"SET:{name}={curr}")
+                        self.poll_schedule.promote(BLINKIN_PROMOTE_KEYS)
                         self.last_toggle_states[uid] = curr
 
                 # Blinkin Buttons
                 changed_bits = current_blinkin ^ self.last_blinkin_bits
+                if changed_bits & MOMENTARY_MASK: self.poll_schedule.promote(BLINKIN_PROMOTE_KEYS)
                 for bit_idx, name in MOMENTARY_SWITCHES.items():
                     mask = (1 << bit_idx)
                     if changed_bits & mask:
@@ -218,48 +740,107 @@ class OrbiterBridge:
                         self.send_command(f"SET:{name}={val}")
 
                 self.last_blinkin_bits = current_blinkin
-                time.sleep(0.02)
-            except Exception: pass
+            except Exception as e:
+                self.metrics.error("input_loop", e)
+            self.input_cycle.observe(time.perf_counter() - start)
+            time.sleep(0.02)
 
     def output_loop(self):
+        # Refreshes run on a fixed cadence from this thread's timer wheel,
+        # instead of sleeping a fixed time after each (variable length) pass.
+        wheel = TimerWheel()
+        wheel.call_every(OUTPUT_PERIOD, self.refresh_outputs)
         while self.running:
-            if not self.orbiter_socket:
-                time.sleep(1); continue
-            try:
-                # Batch DSKY Data
-                dsky_data = {
-                    "PROG": self.send_command("GET:NASSP:DSKY:Prog"),
-                    "VERB": self.send_command("GET:NASSP:DSKY:Verb"),
-                    "NOUN": self.send_command("GET:NASSP:DSKY:Noun"),
-                    "R1":   self.send_command("GET:NASSP:DSKY:R1"),
-                    "R2":   self.send_command("GET:NASSP:DSKY:R2"),
-                    "R3":   self.send_command("GET:NASSP:DSKY:R3")
-                }
-                
-                # Batch LEDs
-                blinkin_states = {}
-                for key, bit_idx in BLINKIN_INDICATOR_MAP.items():
-                    blinkin_states[key] = (bit_idx, self.send_command(key) == "1")
-
-                dsky_led_values = {}
-                for addr, (key_a, key_b) in DSKY_LED_PAIRS.items():
-                    val = 0
-                    if key_a and self.send_command(key_a) == "1": val += 1 
-                    if key_b and self.send_command(key_b) == "1": val += 2 
-                    dsky_led_values[addr] = val
+            time.sleep(wheel.timeout(OUTPUT_PERIOD))
+            wheel.run_due()
 
+    def refresh_outputs(self):
+        if not self.orbiter_socket: return
+        start = time.perf_counter()
+        try:
+            if self.subscribed:
+                # Push mode: apply the changes the server has sent
+                pushes = self.pushes
+                with self.net_lock:
+                    sock = self.orbiter_socket
+                    if not sock: return  # Dropped by the writer
+                    if not self._read_pushes(sock):
+                        print("Telemetry channel lost.")
+                        self.metrics.incr("disconnects")
+                        if self.orbiter_socket is sock: self.orbiter_socket = None
+                        sock.close()
+                        return
+                if self.pushes == pushes: return
+            else:
+                # One pipelined round trip for the GETs due this refresh
+                now = time.monotonic()
+                due = self.poll_schedule.due(now)
+                if not due: return
+                for key, value in zip(due, self.send_batch(due)):
+                    self.poll_schedule.update(key, value, now)
+            # Keys not polled (or not answered) keep their last reply
+            replies = {key: self.poll_schedule.values.get(key) for key in OUTPUT_GETS}
+            # Work out what changed first, so hw_lock (and with it input_loop's
+            # key scan) is only held for the writes that are actually needed.
+            digit_writes = []
+            fields = {}  # Fields whose value changed, for field_shadow
+            for field, key in DSKY_FIELD_KEYS.items():
+                if replies[key] is not None and self.field_shadow.get(field) != replies[key]:
+                    fields[field] = replies[key]
+                    digit_writes += self.update_dsky_digits(field, replies[key])
+
+            lamp_writes = []
+            for addr, (key_a, key_b) in DSKY_LED_PAIRS.items():
+                val = 0
+                if key_a and replies[key_a] == "1": val += 1 
+                if key_b and replies[key_b] == "1": val += 2 
+                if self.lamp_shadow.get(addr) != val:
+                    lamp_writes.append((addr, val))
+
+            blinkin_bits = 0
+            for key, bit_idx in BLINKIN_INDICATOR_MAP.items():
+                if replies[key] == "1": blinkin_bits |= 1 << bit_idx
+            blinkin_changed = blinkin_bits != self.blinkin_shadow
+
+            # Each shadow entry is set only after its write succeeded, so a
+            # write that raises is retried on the next refresh.
+            if digit_writes or lamp_writes or blinkin_changed:
                 with self.hw_lock:
-                    for field, val in dsky_data.items():
-                        if val is not None: self.update_dsky_digits(field, val)
+                    for board_idx, addr, font in digit_writes:
+                        self.driver.sendData(addr, font, TMindex=board_idx)
+                        self.digit_shadow[(board_idx, addr)] = font
                     
-                    for addr, val in dsky_led_values.items():
+                    for addr, val in lamp_writes:
                         self.driver.sendData(addr, val, TMindex=DSKY_INDICATOR_BOARD)
-
-                    for key, (bit_idx, is_lit) in blinkin_states.items():
-                        self.driver.set_led(bit_idx, is_lit)
-                    self.driver.update_leds()
-                time.sleep(0.1)
-            except Exception as e: pass
+                        self.lamp_shadow[addr] = val
+
+                    if blinkin_changed:
+                        for key, bit_idx in BLINKIN_INDICATOR_MAP.items():
+                            self.driver.set_led(bit_idx, bool(blinkin_bits >> bit_idx & 1))
+                        self.driver.update_leds()
+                        self.blinkin_shadow = blinkin_bits
+            self.field_shadow.update(fields)
+        except Exception as e:
+            self.metrics.error("output_loop", e)
+        finally:
+            self.output_cycle.observe(time.perf_counter() - start)
+
+    def _gauges(self) -> dict:
+        """Figures kept elsewhere, for the metrics snapshot."""
+        queue = self.outbound.stats()
+        return {
+            "connected": self.network_up(), "subscribed": bool(self.subscribed),
+            "joystick": {
+                # in: raw gamepad events; delivered: after the deadzone, sensitivity
+                # and axis_rate coalescing; sent: taken by the writer after axis merging
+                "in": self.joy.events, "delivered": self.metrics.counters.get("joystick_delivered", 0),
+                "sent": self.metrics.counters.get("joystick_buttons", 0) + queue["axis"]["sent"],
+                "axes_merged": self.outbound.merged,
+            },
+            "replies": {"late": self.late_replies, "stray": self.stray_lines, "resyncs": self.resyncs, "pushes": self.pushes,
+                        "polls": self.poll_schedule.polls},
+            "queue": queue,
+        }
 
 if __name__ == "__main__":
     try:
@@ -276,14 +857,25 @@ if __name__ == "__main__":
             t_out = threading.Thread(target=bridge.output_loop, daemon=True)
             t_out.start()
             
+            # 2b. Start Writer Thread (everything sent to orb:connect)
+            t_wr = threading.Thread(target=bridge.writer_loop, daemon=True)
+            t_wr.start()
+
+            if METRICS_PORT: serve_http(bridge.metrics, METRICS_HOST, METRICS_PORT)
+
             # 3. Start Joystick Thread
             print("Starting Joystick...")
             bridge.joy.start()
 
+            last_report = time.monotonic()
             while True:
-                if not bridge.orbiter_socket: 
+                if not bridge.network_up(): 
                     bridge.connect_network()
                 time.sleep(1)
+                if DEBUG_QUEUE and time.monotonic() - last_report >= QUEUE_REPORT_PERIOD:
+                    print(bridge.outbound.report())
+                    print(bridge.poll_schedule.report())
+                    last_report = time.monotonic()
                 
     except KeyboardInterrupt:
         sys.exit(0)
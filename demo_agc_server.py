@@ -4,7 +4,15 @@ File-Based Mock AGC Server with Physics Engine
 Reads commands from 'landing.txt' and simulates flight data.
 
 UPDATED: Fixed R1/R2 display to show full 5-digit precision.
+UPDATED: The script is compiled up front into a timeline of packet batches
+         (one coalesced write per tick, repeated packets dropped), which can
+         be played back time-warped and from any point:
+
+    demo_agc_server.py [--script landing.txt] [--warp 60] [--seek 300]
 """
+import argparse
+import bisect
+import select
 import socket
 import time
 import datetime
@@ -44,7 +52,9 @@ def create_lamp_packet(lamp_name, state):
     return b''
 
 # --- Physics/Display Helpers ---
-def update_r1_r2(conn, alt, vel):
+TICK = 0.1 # Simulation updates 10 times a second (Smooth!)
+
+def r1_r2_packets(alt, vel):
     """
     Formats Altitude into R1 and Velocity into R2 with 5-digit precision.
     """
@@ -52,100 +62,188 @@ def update_r1_r2(conn, alt, vel):
     # 5 Digits. Uses Reg 8, 7, 6.
     # Format: 50000 -> "50000"
     s_alt = f"{int(alt):05}"[-5:] 
-    conn.sendall(create_display_packet(8, s_alt[0], s_alt[1]))
-    conn.sendall(create_display_packet(7, s_alt[2], s_alt[3]))
-    conn.sendall(create_display_packet(6, s_alt[4], " ")) 
-
     # --- R2 (Velocity) ---
     # 5 Digits. Uses Reg 5, 4, and the High Nibble of Reg 3.
     # Format: 05500 -> "05500"
     s_vel = f"{int(abs(vel)):05}"[-5:]
-    conn.sendall(create_display_packet(5, s_vel[0], s_vel[1]))
-    conn.sendall(create_display_packet(4, s_vel[2], s_vel[3]))
-    
-    # Register 3 is shared: [R2_Digit_5] [R3_Digit_1]
-    # For this sim, we assume R3 Digit 1 is '0' or Space.
-    conn.sendall(create_display_packet(3, s_vel[4], " "))
-
-def run_simulation(conn, duration, start_alt, end_alt, start_vel, end_vel):
-    """Interpolates Altitude and Velocity over Duration."""
-    start_time = time.time()
-    duration = float(duration)
-    
+    return [
+        create_display_packet(8, s_alt[0], s_alt[1]),
+        create_display_packet(7, s_alt[2], s_alt[3]),
+        create_display_packet(6, s_alt[4], " "),
+        create_display_packet(5, s_vel[0], s_vel[1]),
+        create_display_packet(4, s_vel[2], s_vel[3]),
+        # Register 3 is shared: [R2_Digit_5] [R3_Digit_1]
+        # For this sim, we assume R3 Digit 1 is '0' or Space.
+        create_display_packet(3, s_vel[4], " "),
+    ]
+
+def packet_key(pkt):
+    """What a packet overwrites on the DSKY: the channel, plus the row for channel 010."""
+    channel = ((pkt[0] & 0x0F) << 3) | ((pkt[1] >> 3) & 0x07)
+    if channel == 0o10:
+        return (channel, ((pkt[1] & 0x07) << 1) | ((pkt[2] >> 5) & 0x01))
+    return (channel, None)
+
+# --- Timeline Compiler ---
+class Batch:
+    """Everything sent at one instant: packets by what they overwrite, plus log lines."""
+    def __init__(self, t):
+        self.t = t
+        self.packets = {}
+        self.messages = []
+
+    def data(self):
+        return b''.join(self.packets.values())
+
+class Timeline:
+    """
+    A mission script compiled to batches with absolute timestamps (seconds
+    from the start). Packets that repeat what the DSKY already shows are
+    dropped at compile time.
+    """
+    def __init__(self):
+        self.batches = []
+        self.shown = {}      # packet_key -> last packet in the timeline
+        self.dropped = 0
+
+    def batch(self, t):
+        if not self.batches or self.batches[-1].t != t:
+            self.batches.append(Batch(t))
+        return self.batches[-1]
+
+    def add(self, t, packets):
+        b = self.batch(t)
+        for pkt in packets:
+            key = packet_key(pkt)
+            if self.shown.get(key) == pkt:
+                self.dropped += 1
+                continue
+            self.shown[key] = pkt
+            b.packets[key] = pkt
+
+    def log(self, t, msg):
+        self.batch(t).messages.append(msg)
+
+    @property
+    def duration(self):
+        return self.batches[-1].t if self.batches else 0.0
+
+    def seek(self, t):
+        """
+        Returns (index of the first batch at or after t, the state the DSKY
+        shows just before it as one batch of packets).
+        """
+        index = bisect.bisect_left([b.t for b in self.batches], t)
+        state = Batch(t)
+        for b in self.batches[:index]:
+            state.packets.update(b.packets)
+        return index, state
+
+def simulate(timeline, t, duration, start_alt, end_alt, start_vel, end_vel):
+    """Interpolates Altitude and Velocity over Duration; returns the end time."""
     # --- FIX: Convert string inputs to floats immediately ---
+    duration = float(duration)
     start_alt = float(start_alt)
     end_alt = float(end_alt)
     start_vel = float(start_vel)
     end_vel = float(end_vel)
     # --------------------------------------------------------
-    
-    # Send initial state immediately
-    update_r1_r2(conn, start_alt, start_vel)
-    
-    while True:
-        now = time.time()
-        elapsed = now - start_time
-        
-        if elapsed >= duration:
-            break # Done
-            
-        progress = elapsed / duration
-        
-        # Calculate current physics (Now using the pre-converted floats)
+    steps = int(duration / TICK)
+    for i in range(steps):
+        progress = i * TICK / duration
         cur_alt = start_alt + (end_alt - start_alt) * progress
         cur_vel = start_vel + (end_vel - start_vel) * progress
-        
-        # Update Display
-        update_r1_r2(conn, cur_alt, cur_vel)
-        
-        # Check for Input (Keep connection alive)
-        try:
-            while True:
-                data = conn.recv(1024)
-                if not data: raise socket.error("Client disconnected")
-                log(f"<< KEY INPUT: {data.hex()}")
-        except socket.error as e:
-            if e.errno not in [11, 115]: raise
-        
-        time.sleep(0.1) # Update 10 times a second (Smooth!)
+        timeline.add(round(t + i * TICK, 6), r1_r2_packets(cur_alt, cur_vel))
+    return t + duration
 
 # --- File Parser ---
-def run_script(conn, filename):
-    log(f"Running script: {filename}")
+def compile_script(filename):
+    timeline = Timeline()
+    t = 0.0
     with open(filename, 'r') as f:
-        for line in f:
+        for lineno, line in enumerate(f, 1):
             line = line.strip()
             if not line or line.startswith("#"): continue
             
             parts = [p.strip() for p in line.split(',')]
             cmd = parts[0].upper()
 
-            if cmd == "LOG":
-                log(parts[1])
-            
-            elif cmd == "WAIT":
-                # Re-using the simulation logic for WAIT to keep display alive
-                run_simulation(conn, parts[1], 0, 0, 0, 0) 
-            
-            elif cmd == "SIMULATE":
-                # SIMULATE, Duration, StartAlt, EndAlt, StartVel, EndVel
-                run_simulation(conn, parts[1], parts[2], parts[3], parts[4], parts[5])
-
-            elif cmd == "DISP":
-                pkt = create_display_packet(parts[1], parts[2], parts[3])
-                conn.sendall(pkt)
-                time.sleep(0.02)
-            
-            elif cmd == "LAMP":
-                pkt = create_lamp_packet(parts[1], parts[2])
-                if pkt: conn.sendall(pkt)
+            try:
+                if cmd == "LOG":
+                    timeline.log(t, parts[1])
+                
+                elif cmd == "WAIT":
+                    # Re-using the simulation logic for WAIT to keep display alive
+                    t = simulate(timeline, t, parts[1], 0, 0, 0, 0) 
+                
+                elif cmd == "SIMULATE":
+                    # SIMULATE, Duration, StartAlt, EndAlt, StartVel, EndVel
+                    t = simulate(timeline, t, parts[1], parts[2], parts[3], parts[4], parts[5])
+
+                elif cmd == "DISP":
+                    timeline.add(t, [create_display_packet(parts[1], parts[2], parts[3])])
+                    t = round(t + 0.02, 6)
+                
+                elif cmd == "LAMP":
+                    pkt = create_lamp_packet(parts[1], parts[2])
+                    if pkt: timeline.add(t, [pkt])
+            except (IndexError, ValueError) as e:
+                raise ValueError(f"{filename}:{lineno}: {line!r}: {e}")
+    return timeline
+
+# --- Player ---
+def play(conn, timeline, warp, seek):
+    """
+    Plays the timeline from seek seconds at warp x real time. Batches that
+    fall due together (at high warp) are merged into one write. Key input
+    from the DSKY is logged while waiting.
+    """
+    index, pending = timeline.seek(seek)
+    start = time.time()
+    batches = timeline.batches
+    while index < len(batches) or pending.packets:
+        # Merge every batch that is already due
+        while index < len(batches):
+            b = batches[index]
+            if start + (b.t - seek) / warp > time.time():
+                break
+            pending.packets.update(b.packets)
+            for msg in b.messages:
+                log(msg)
+            index += 1
+        if pending.packets:
+            conn.sendall(pending.data())
+            pending.packets.clear()
+        if index >= len(batches):
+            break
+
+        # Sleep until the next batch, waking up for key input
+        delay = start + (batches[index].t - seek) / warp - time.time()
+        if delay > 0 and select.select([conn], [], [], delay)[0]:
+            data = conn.recv(1024)
+            if not data: raise socket.error("Client disconnected")
+            log(f"<< KEY INPUT: {data.hex()}")
 
 # --- Main Server ---
-log(f"Server starting on {HOST}:{PORT}...")
+cli = argparse.ArgumentParser(description="File-based mock AGC server.")
+cli.add_argument("--script", default="landing.txt", help="Mission script (default landing.txt).")
+cli.add_argument("--warp", type=float, default=1.0, help="Time warp factor, e.g. 60 plays a minute per second.")
+cli.add_argument("--seek", type=float, default=0.0, help="Start this many seconds into the script.")
+cli.add_argument("--port", type=int, default=PORT, help=f"Port to serve on (default {PORT}).")
+args = cli.parse_args()
+if args.warp <= 0:
+    cli.error("--warp must be positive")
+
+timeline = compile_script(args.script)
+packets = sum(len(b.packets) for b in timeline.batches)
+log(f"Compiled {args.script}: {len(timeline.batches)} batches, {packets} packets "
+    f"({timeline.dropped} repeats dropped), {timeline.duration:.1f} s")
+
+log(f"Server starting on {HOST}:{args.port}...")
 try:
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        s.bind((HOST, PORT))
+        s.bind((HOST, args.port))
         s.listen()
         
         while True:
@@ -154,23 +252,18 @@ try:
                 conn, addr = s.accept()
                 with conn:
                     log(f"Connected: {addr}")
-                    conn.setblocking(False)
+                    log(f"Running script: {args.script} (warp {args.warp:g}x, from {args.seek:g} s)")
                     
-                    run_script(conn, "landing.txt")
+                    play(conn, timeline, args.warp, args.seek)
                     
                     log("Script complete. Listening for keys...")
                     while True:
-                        try:
-                           data = conn.recv(1024)
-                           if not data: break
-                           log(f"<< KEY INPUT: {data.hex()}")
-                        except: pass
-                        time.sleep(0.1)
+                        data = conn.recv(1024)
+                        if not data: break
+                        log(f"<< KEY INPUT: {data.hex()}")
 
             except socket.error as e:
                 log(f"Disconnect/Error: {e}")
-            except Exception as e:
-                log(f"Script Error: {e}")
 
 except KeyboardInterrupt:
     log("Shutting down.")
\ No newline at end of file
@@ -1,4 +1,13 @@
 #!/usr/bin/python3
+# Mock AGC server.
+#
+#   mock_agc_server.py                    Interactive: one client, one packet every 2 s
+#   mock_agc_server.py --rate 5000        Load generator: 5000 packets/s to every client
+#                      [--noise 0.5] [--clients N] [--echo]
+#   mock_agc_server.py --rate 0 --echo    Echo server for dsky_sim.py latency tests
+import argparse
+import random
+import selectors
 import socket
 import time
 import datetime
@@ -35,79 +44,267 @@ clear_packets = [
     create_packet(115, 0),
 ]
 
-log(f"Mock AGC Server (Interactive) starting on {HOST}:{PORT}...")
+# --- Load Generator Mix ---
+# yaAGC sends far more than the DSKY needs.  The DSKY channels get a
+# plausible spread of values; the rest is noise the client should discard.
+DIGIT_CODES = (0, 21, 3, 25, 27, 15, 30, 28, 19, 29, 31)
+DSKY_MIX = ((0o10, 20), (0o11, 2), (0o13, 1), (0o163, 2))
+NOISE_MIX = ((0o12, 4), (0o14, 4), (0o30, 2), (0o31, 2), (0o32, 2), (0o33, 2), (0o34, 3), (0o35, 3))
+POOL_SIZE = 8192
+MAX_BACKLOG = 4 << 20   # Bytes queued to one client before it is dropped
 
-with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    s.bind((HOST, PORT))
-    s.listen()
-    log("Waiting for DSKY to connect...")
-    
-    conn, addr = s.accept()
-    with conn:
-        log(f"DSKY connected from {addr}")
-        conn.setblocking(False) 
+def random_value(rng, channel):
+    if channel == 0o10:
+        row = rng.randint(1, 12)
+        if row == 12:
+            return (12 << 11) | rng.getrandbits(10)
+        # Row 9 words with bit 10 clear are left to key echoes (LoadClient.echo),
+        # so dsky_sim.py never takes load traffic for one.
+        flag = 1 if row == 9 else rng.getrandbits(1)
+        return (row << 11) | (flag << 10) | (rng.choice(DIGIT_CODES) << 5) | rng.choice(DIGIT_CODES)
+    return rng.getrandbits(15)
 
-        packet_index = 0
-        clearing_index = 0
-        last_packet_time = time.time()
-        packet_delay = 2.0 # Slow pace so you can see what's happening
+def build_pool(noise, seed=1):
+    """POOL_SIZE random packets, a fraction noise of them on non-DSKY channels."""
+    rng = random.Random(seed)
+    dsky = [c for c, w in DSKY_MIX for _ in range(w)]
+    other = [c for c, w in NOISE_MIX for _ in range(w)]
+    pool = bytearray()
+    for _ in range(POOL_SIZE):
+        channel = rng.choice(other if rng.random() < noise else dsky)
+        pool += create_packet(channel, random_value(rng, channel))
+    return bytes(pool)
 
+class LoadClient:
+    def __init__(self, conn, addr):
+        self.conn = conn
+        self.addr = addr
+        self.backlog = bytearray()
+        self.sent = 0       # Bytes
+        self.reported = 0   # self.sent at the last report
+        self.received = 0   # Bytes of key data
+        self.inbuf = bytearray()
+        self.echoes = 0
+
+    def echo(self, data):
+        """
+        Answers every keypad (channel 015) data packet with a channel 010
+        change to the Noun digits, like the AGC echoing a key.
+        """
+        self.inbuf += data
+        whole = len(self.inbuf) - len(self.inbuf) % 4
+        for i in range(0, whole, 4):
+            b0, b1 = self.inbuf[i], self.inbuf[i + 1]
+            if b0 & 0x20:
+                continue # Mask packet
+            if (((b0 & 0x0F) << 3) | ((b1 >> 3) & 0x07)) == 0o15:
+                n = self.echoes
+                self.echoes += 1
+                self.backlog += create_packet(0o10, (9 << 11) | (DIGIT_CODES[1 + n % 10] << 5) | DIGIT_CODES[1 + (n // 10) % 10])
+        del self.inbuf[:whole]
+
+def run_load(rate, noise, min_clients, echo=False, report_every=1.0, tick=0.01):
+    """
+    Streams packets from a pre-built pool to every connected client at
+    rate packets/s, in one non-blocking write per client per tick.  Clients
+    that can't keep up build a backlog, reported once a second.  With echo,
+    key presses are answered straight away (see LoadClient.echo).
+    """
+    pool = build_pool(noise)
+    sel = selectors.DefaultSelector()
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    srv.bind((HOST, PORT))
+    srv.listen()
+    srv.setblocking(False)
+    sel.register(srv, selectors.EVENT_READ)
+    clients = {}
+    log(f"Mock AGC Server (Load {rate} pkt/s, {noise:.0%} noise) starting on {HOST}:{PORT}...")
+    log(f"Waiting for {min_clients} client(s)...")
+
+    def drop(client, why):
+        log(f"{client.addr} {why}")
+        sel.unregister(client.conn)
+        client.conn.close()
+        del clients[client.conn]
+
+    def flush(client):
         try:
-            while True:
-                # 1. RECV DATA (INPUT MODE)
+            n = client.conn.send(client.backlog)
+        except BlockingIOError:
+            n = 0
+        del client.backlog[:n]
+        client.sent += n
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.backlog else 0)
+        sel.modify(client.conn, events, client)
+
+    pos = 0
+    owed = 0.0          # Packets due but not yet generated
+    generated = 0
+    last = time.monotonic()
+    next_report = last + report_every
+    streaming = False
+    try:
+        while True:
+            for key, events in sel.select(tick):
+                if key.fileobj is srv:
+                    conn, addr = srv.accept()
+                    conn.setblocking(False)
+                    client = LoadClient(conn, addr)
+                    clients[conn] = client
+                    sel.register(conn, selectors.EVENT_READ, client)
+                    log(f"DSKY connected from {addr} ({len(clients)} clients)")
+                    continue
+                client = key.data
                 try:
-                    while True: # Read all available data
-                        data = conn.recv(1024) 
+                    if events & selectors.EVENT_READ:
+                        data = client.conn.recv(4096)
                         if not data:
-                            raise socket.error("Client disconnected") 
-                        
-                        # --- THIS IS THE NEW PART ---
-                        # Print the raw hex of what the DSKY sent us.
-                        # Ideally, if you press a key, data will show up here.
-                        log(f" << RECEIVED KEY DATA: {data.hex()}")
-                        # ----------------------------
-
-                except socket.error as e:
-                    if e.errno == 11 or e.errno == 115: 
-                        pass # No data, this is normal
-                    else:
-                        raise # Real error
-
-                # 2. SEND DATA (OUTPUT MODE)
-                # We'll just cycle the lights slowly so you know it's alive
-                now = time.time()
-                if (now - last_packet_time) > packet_delay:
-                    
-                    if packet_index < len(test_packets):
-                        packet = test_packets[packet_index]
-                        log(f" >> Sending packet {packet_index+1}")
-                        conn.sendall(packet)
-                        packet_index += 1
-                        last_packet_time = now
-                    
-                    elif clearing_index < len(clear_packets):
-                        if clearing_index == 0:
-                            log(" >> Clearing lamps...")
-                        packet = clear_packets[clearing_index]
-                        conn.sendall(packet)
-                        clearing_index += 1
-                        last_packet_time = now
-                    
-                    else:
-                        # Restart the light show
-                        packet_index = 0
-                        clearing_index = 0
-                        log(" >> Restarting light cycle...")
-
-                time.sleep(0.01) 
-        
-        except socket.error as e:
-            if e.errno == 32: # Broken pipe
-                log("Pi-DSKY disconnected early.")
-            elif "Client disconnected" in str(e):
-                log("Pi-DSKY disconnected.")
-            else:
-                log(f"Socket error: {e}")
-
-log("Mock AGC Server shutting down.")
\ No newline at end of file
+                            drop(client, "disconnected")
+                            continue
+                        client.received += len(data)
+                        if echo:
+                            client.echo(data)
+                            flush(client)
+                    if events & selectors.EVENT_WRITE:
+                        flush(client)
+                except ConnectionError:
+                    drop(client, "disconnected")
+
+            now = time.monotonic()
+            if not streaming:
+                streaming = len(clients) >= min_clients
+                last = now
+                next_report = now + report_every
+                continue
+
+            # Generate what is due since the last tick as one chunk
+            owed += (now - last) * rate
+            last = now
+            count = int(owed)
+            owed -= count
+            if count:
+                nbytes = count * 4
+                chunk = bytearray()
+                while len(chunk) < nbytes:
+                    take = min(nbytes - len(chunk), len(pool) - pos)
+                    chunk += pool[pos:pos + take]
+                    pos = (pos + take) % len(pool)
+                generated += count
+                for client in list(clients.values()):
+                    client.backlog += chunk
+                    if len(client.backlog) > MAX_BACKLOG:
+                        drop(client, f"dropped, backlog over {MAX_BACKLOG} bytes")
+                        continue
+                    try:
+                        flush(client)
+                    except ConnectionError:
+                        drop(client, "disconnected")
+
+            if now >= next_report:
+                elapsed = report_every + (now - next_report)
+                stats = []
+                for c in clients.values():
+                    stats.append(f"{c.addr[1]}: {(c.sent - c.reported) / 4 / elapsed:,.0f} pkt/s, backlog {len(c.backlog)} B")
+                    c.reported = c.sent
+                log(f"target {rate} pkt/s to {len(clients)} clients | " + (" | ".join(stats) or "-"))
+                next_report = now + report_every
+    finally:
+        sel.close()
+        srv.close()
+        log(f"Generated {generated} packets")
+
+def run_interactive():
+    log(f"Mock AGC Server (Interactive) starting on {HOST}:{PORT}...")
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind((HOST, PORT))
+        s.listen()
+        log("Waiting for DSKY to connect...")
+
+        conn, addr = s.accept()
+        with conn:
+            log(f"DSKY connected from {addr}")
+            conn.setblocking(False) 
+
+            packet_index = 0
+            clearing_index = 0
+            last_packet_time = time.time()
+            packet_delay = 2.0 # Slow pace so you can see what's happening
+
+            try:
+                while True:
+                    # 1. RECV DATA (INPUT MODE)
+                    try:
+                        while True: # Read all available data
+                            data = conn.recv(1024) 
+                            if not data:
+                                raise socket.error("Client disconnected") 
+
+                            # --- THIS IS THE NEW PART ---
+                            # Print the raw hex of what the DSKY sent us.
+                            # Ideally, if you press a key, data will show up here.
+                            log(f" << RECEIVED KEY DATA: {data.hex()}")
+                            # ----------------------------
+
+                    except socket.error as e:
+                        if e.errno == 11 or e.errno == 115: 
+                            pass # No data, this is normal
+                        else:
+                            raise # Real error
+
+                    # 2. SEND DATA (OUTPUT MODE)
+                    # We'll just cycle the lights slowly so you know it's alive
+                    now = time.time()
+                    if (now - last_packet_time) > packet_delay:
+
+                        if packet_index < len(test_packets):
+                            packet = test_packets[packet_index]
+                            log(f" >> Sending packet {packet_index+1}")
+                            conn.sendall(packet)
+                            packet_index += 1
+                            last_packet_time = now
+
+                        elif clearing_index < len(clear_packets):
+                            if clearing_index == 0:
+                                log(" >> Clearing lamps...")
+                            packet = clear_packets[clearing_index]
+                            conn.sendall(packet)
+                            clearing_index += 1
+                            last_packet_time = now
+
+                        else:
+                            # Restart the light show
+                            packet_index = 0
+                            clearing_index = 0
+                            log(" >> Restarting light cycle...")
+
+                    time.sleep(0.01) 
+
+            except socket.error as e:
+                if e.errno == 32: # Broken pipe
+                    log("Pi-DSKY disconnected early.")
+                elif "Client disconnected" in str(e):
+                    log("Pi-DSKY disconnected.")
+                else:
+                    log(f"Socket error: {e}")
+
+    log("Mock AGC Server shutting down.")
+
+cli = argparse.ArgumentParser(description="Mock AGC server.")
+cli.add_argument("--port", type=int, default=PORT, help=f"Port to serve on (default {PORT}).")
+cli.add_argument("--rate", type=int, help="Load generator mode: packets per second sent to each client.")
+cli.add_argument("--noise", type=float, default=0.5, help="Load mode: fraction of packets on non-DSKY channels (default 0.5).")
+cli.add_argument("--clients", type=int, default=1, help="Load mode: clients to wait for before streaming (default 1).")
+cli.add_argument("--echo", action="store_true", help="Load mode: answer each key with a display change.")
+args = cli.parse_args()
+PORT = args.port
+
+if args.rate is not None:
+    try:
+        run_load(args.rate, args.noise, args.clients, args.echo)
+    except KeyboardInterrupt:
+        log("Mock AGC Server shutting down.")
+else:
+    run_interactive()
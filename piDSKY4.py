@@ -44,13 +44,22 @@ import os
 import signal
 import sys
 import argparse
-import threading
 import termios
 import fcntl
+import atexit
 import socket
+import selectors
 import datetime # <-- ADDED
 from RPi5_TM1638 import TMBoards
 
+# Shared yaAGC protocol helpers live in the yaAGC driver directory.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "yaAGC"))
+from protocol import PacketFramer, Uplink, DSKY_CHANNELS, ALL_CHANNELS
+from config import DSKY_KEYS
+from display import build_display_table, describe as describeDisplayWord, ChannelCache, Flasher, SIGN_INDEX, SIGN_FONT
+from timerwheel import TimerWheel
+from agclog import LogWriter
+
 # --- NEW TIMESTAMP LOGGER ---
 def log(msg):
     """Prints a message with a timestamp (unless quiet mode is on)."""
@@ -71,9 +80,11 @@ cli.add_argument("--host", help="Host address of yaAGC, defaulting to localhost.
 cli.add_argument("--port", help="Port for yaAGC, defaulting to 19798.", type=int)
 cli.add_argument("--slow", help="For use on really slow host systems.")
 cli.add_argument("--quiet", action="store_true", help="Suppress operational logging.")
+cli.add_argument("--record", metavar="FILE", help="Append all channel traffic and key presses to an AGC log (see yaAGC/agclog.py).")
 args = cli.parse_args()
 
-# Responsiveness settings.
+# Responsiveness settings.  PULSE is the keypad scan period; yaAGC data is
+# handled as soon as it arrives regardless.
 if args.slow:
     PULSE = 0.25
     lampDeadtime = 0.25
@@ -96,21 +107,24 @@ else:
 # not of value outside of that, unless you happen to be implementing DSKY functionality
 # in a similar way.
 
-# Given a 3-tuple (channel,value,mask), creates packet data and sends it to yaAGC.
+# Given a 3-tuple (channel,value,mask), queues packet data for yaAGC.  The
+# mask+data frames for every DSKY key are built once up front, everything
+# queued in one loop iteration goes out in a single write (uplink.send()),
+# and the mask packet is skipped if yaAGC already has that channel's mask.
+uplink = Uplink(DSKY_KEYS.values())
+
+# With --record, every packet received and every key sent is appended to
+# a compact binary log that yaAGC/agclog.py can replay.
+recorder = None
+if args.record:
+    recorder = LogWriter(args.record)
+    uplink.recorder = recorder
+def closeRecorder():
+    if recorder:
+        recorder.close()
+
 def packetize(tuple):
-    outputBuffer = bytearray(4)
-    # First, create and output the mask command.
-    outputBuffer[0] = 0x20 | ((tuple[0] >> 3) & 0x0F)
-    outputBuffer[1] = 0x40 | ((tuple[0] << 3) & 0x38) | ((tuple[2] >> 12) & 0x07)
-    outputBuffer[2] = 0x80 | ((tuple[2] >> 6) & 0x3F)
-    outputBuffer[3] = 0xC0 | (tuple[2] & 0x3F)
-    s.send(outputBuffer)
-    # Now, the actual data for the channel.
-    outputBuffer[0] = 0x00 | ((tuple[0] >> 3) & 0x0F)
-    outputBuffer[1] = 0x40 | ((tuple[0] << 3) & 0x38) | ((tuple[1] >> 12) & 0x07)
-    outputBuffer[2] = 0x80 | ((tuple[1] >> 6) & 0x3F)
-    outputBuffer[3] = 0xC0 | (tuple[1] & 0x3F)
-    s.send(outputBuffer)
+    uplink.queue(tuple[0], tuple[1], tuple[2])
 
 # This particular function parses various keystrokes, like '0' or 'V' and creates
 # packets as if they were DSKY keypresses.  It should be called occasionally as
@@ -137,167 +151,108 @@ def parseDskyKey(ch):
     elif ch != "":
         resetCount = 0
     returnValue = []
-    if ch == '0':
-        returnValue.append( (0o15, 0o20, 0o37) )
-    elif ch == '1':
-        returnValue.append( (0o15, 0o1, 0o37) )
-    elif ch == '2':
-            returnValue.append( (0o15, 0o2, 0o37) )
-    elif ch == '3':
-            returnValue.append( (0o15, 0o3, 0o37) )
-    elif ch == '4':
-            returnValue.append( (0o15, 0o4, 0o37) )
-    elif ch == '5':
-            returnValue.append( (0o15, 0o5, 0o37) )
-    elif ch == '6':
-            returnValue.append( (0o15, 0o6, 0o37) )
-    elif ch == '7':
-            returnValue.append( (0o15, 0o7, 0o37) )
-    elif ch == '8':
-            returnValue.append( (0o15, 0o10, 0o37) )
-    elif ch == '9':
-            returnValue.append( (0o15, 0o11, 0o37) )
-    elif ch == '+':
-            returnValue.append( (0o15, 0o32, 0o37) )
-    elif ch == '-':
-            returnValue.append( (0o15, 0o33, 0o37) )
-    elif ch == 'V':
-            returnValue.append( (0o15, 0o21, 0o37) )
-    elif ch == 'N':
-            returnValue.append( (0o15, 0o37, 0o37) )
-    elif ch == 'R':
-            returnValue.append( (0o15, 0o22, 0o37) )
-    elif ch == 'C':
-            returnValue.append( (0o15, 0o36, 0o37) )
-    elif ch == 'P':
-            returnValue.append( (0o32, 0o00000, 0o20000) )
-    elif ch == 'p' or ch == 'PR':
-            returnValue.append( (0o32, 0o20000, 0o20000) )
-    elif ch == 'K':
-            returnValue.append( (0o15, 0o31, 0o37) )
-    elif ch == '\n':
-        returnValue.append( (0o15, 0o34, 0o37) )
+    if ch in DSKY_KEYS:
+        returnValue.append(DSKY_KEYS[ch])
     return returnValue  
 
-# This function turns keyboard echo on or off.
-def echoOn(control):
-    fd = sys.stdin.fileno()
-    new = termios.tcgetattr(fd)
-    if control:
-        log("Keyboard echo on")
-        new[3] |= termios.ECHO
-    else:
+# The console keyboard.  The terminal is put into non-canonical, no-echo,
+# non-blocking mode once at startup (instead of on every poll), stdin is
+# watched by the event loop's selector like the yaAGC socket, and the
+# original settings are restored on exit.  Ctrl-C still works.  If stdin
+# is not a terminal (e.g. running as a service) there is simply no console
+# keyboard.
+class TerminalInput:
+    def __init__(self, stream):
+        self.fd = stream.fileno()
+        self.interactive = os.isatty(self.fd)
+        self.oldterm = None
+        self.oldflags = None
+        if not self.interactive:
+            return
+        self.oldterm = termios.tcgetattr(self.fd)
+        newattr = termios.tcgetattr(self.fd)
+        newattr[3] = newattr[3] & ~termios.ICANON & ~termios.ECHO
+        newattr[6][termios.VMIN] = 0
+        newattr[6][termios.VTIME] = 0
+        termios.tcsetattr(self.fd, termios.TCSANOW, newattr)
+        self.oldflags = fcntl.fcntl(self.fd, fcntl.F_GETFL)
+        fcntl.fcntl(self.fd, fcntl.F_SETFL, self.oldflags | os.O_NONBLOCK)
+        atexit.register(self.restore)
         log("Keyboard echo off")
-        new[3] &= ~termios.ECHO
-    termios.tcsetattr(fd, termios.TCSANOW, new)
-echoOn(False)
-
-# This function is a non-blocking read of a single character from the
-# keyboard.  Returns either the key value (such as '0' or 'V'), or else
-# the value "" if no key was pressed.  Note:  fakes a "key" 
-# 'PR' 0.75 seconds after a key 'p' or 'P'.  This is in lieu of PRO
-# press and release events.  Is is possible to get keypress and release
-# events or other equivalent data from the Python "keyboard" module, but
-# I didn't know about it at first, and am too lazy to go back and add
-# that support.
-pressedPRO = False
-pressedKEY = [0,0,0,0]
-timePRO = 0
-
-def get_char_keyboard_nonblock():
-    global pressedPRO, timePRO, pressedKEY
-    fd = sys.stdin.fileno()
-    oldterm = termios.tcgetattr(fd)
-    newattr = termios.tcgetattr(fd)
-    newattr[3] = newattr[3] & ~termios.ICANON & ~termios.ECHO
-    termios.tcsetattr(fd, termios.TCSANOW, newattr)
-    oldflags = fcntl.fcntl(fd, fcntl.F_GETFL)
-    fcntl.fcntl(fd, fcntl.F_SETFL, oldflags | os.O_NONBLOCK)
-    c = ""
-    try:
-            c = sys.stdin.read(1)
-    except IOError: pass
-    termios.tcsetattr(fd, termios.TCSAFLUSH, oldterm)
-    fcntl.fcntl(fd, fcntl.F_SETFL, oldflags)
-
-    # TM1638 Dictionary
-    keyDict = {}
-    keyDict[1] = [4,0,0,0]
-    keyDict[2] = [64,0,0,0]
-    keyDict[3] = [0,4,0,0]
-    keyDict[4] = [0,64,0,0]
-    keyDict[5] = [0,0,4,0]
-    keyDict[6] = [0,0,64,0]
-    keyDict[7] = [0,0,0,4]
-    keyDict[8] = [0,0,0,64]
-    keyDict[9] = [2,0,0,0]
-    keyDict[10] = [32,0,0,0]
-    keyDict[11] = [0,2,0,0]
-    keyDict[12] = [0,32,0,0]
-    keyDict[13] = [0,0,2,0]
-    keyDict[14] = [0,0,32,0]
-    keyDict[15] = [0,0,0,2]
-    keyDict[16] = [0,0,0,32]
-    keyDict[17] = [1,0,0,0]
-    keyDict[18] = [16,0,0,0]
-    keyDict[19] = [0,1,0,0]
-
-    charxlate = {}
-    charxlate[1] = "\n"
-    charxlate[2] = "R"
-    charxlate[3] = "C"
-    charxlate[4] = "P"
-    charxlate[5] = "K"
-    charxlate[6] = "9"
-    charxlate[7] = "6"
-    charxlate[8] = "3"
-    charxlate[9] = "8"
-    charxlate[10] = "5"
-    charxlate[11] = "2"
-    charxlate[12] = "7"
-    charxlate[13] = "4"
-    charxlate[14] = "1"
-    charxlate[15] = "+"
-    charxlate[16] = "-"
-    charxlate[17] = "0"
-    charxlate[18] = "V"
-    charxlate[19] = "N"
 
+    def fileno(self):
+        return self.fd
+
+    def read(self):
+        # Returns every character typed since the last call ("" if none).
+        # At end of input (the terminal went away) the keyboard stops
+        # being interactive, so the event loop stops watching it.
+        try:
+            data = os.read(self.fd, 1024)
+        except (BlockingIOError, InterruptedError):
+            return ""
+        if not data:
+            log("Console keyboard closed")
+            self.interactive = False
+        return data.decode("ascii", "ignore")
+
+    def restore(self):
+        # Safe to call more than once.
+        if self.oldterm is not None:
+            termios.tcsetattr(self.fd, termios.TCSAFLUSH, self.oldterm)
+            fcntl.fcntl(self.fd, fcntl.F_SETFL, self.oldflags)
+            self.oldterm = None
+            log("Keyboard echo on")
+terminal = TerminalInput(sys.stdin)
+
+# Note:  a 'p' or 'P' arms a one-shot timer that sends PRO release 0.75
+# seconds later.  This is in lieu of PRO press and release events.  Is is
+# possible to get keypress and release events or other equivalent data from
+# the Python "keyboard" module, but I didn't know about it at first, and am
+# too lazy to go back and add that support.
+proTimer = None
+PRO_RELEASE_DELAY = 0.75
+
+def pressPRO():
+    global proTimer
+    if proTimer:
+        proTimer.cancel()
+    proTimer = wheel.call_later(PRO_RELEASE_DELAY, releasePRO)
+
+def releasePRO():
+    global proTimer
+    proTimer = None
+    log("PRO auto-release")
+    for tuple in parseDskyKey('PR'):
+        packetize(tuple)
+
+# TM1638 keypad: raw key bytes from board 0 -> key character.
+TM_KEYS = {
+    (4,0,0,0): "\n", (64,0,0,0): "R", (0,4,0,0): "C",  (0,64,0,0): "P",
+    (0,0,4,0): "K",  (0,0,64,0): "9", (0,0,0,4): "6",  (0,0,0,64): "3",
+    (2,0,0,0): "8",  (32,0,0,0): "5", (0,2,0,0): "2",  (0,32,0,0): "7",
+    (0,0,2,0): "4",  (0,0,32,0): "1", (0,0,0,2): "+",  (0,0,0,32): "-",
+    (1,0,0,0): "0",  (16,0,0,0): "V", (0,1,0,0): "N",
+}
+KEYS_RELEASED = [0, 0, 0, 0]
+
+# This function scans the TM1638 keypad.  Returns the key value (such as
+# '0' or 'V') on a new press, or else the value "" if nothing changed.
+pressedKEY = KEYS_RELEASED
+def get_char_keypad():
+    global pressedKEY
     # Get from key TM1638 using the stable method
     keyval = TM.read_keys_raw(0)
-
-    # --- NEW KEY LOGIC WITH DEBUGGING ---
     if keyval == pressedKEY:
         # No change in state, do nothing.
-        c = ""
-    elif keyval == [0, 0, 0, 0]:
-        # A key was released. Reset pressedKEY and return "no key".
-        pressedKEY = [0, 0, 0, 0]
-        c = ""
-    else:
-        # A new state is entered.
-        
-        # Check if the key was released (keyval = [0,0,0,0] is the released state)
-        if keyval == [0, 0, 0, 0]:
-             # We just released a key. Send the KEY REL signal.
-             c = 'K' # 'K' is the character for KEY REL
-             pressedKEY = [0, 0, 0, 0]
-             log("Key Release Detected: Sending K")
-        else:
-             # A key is pressed. Send the key.
-             pressedKEY = keyval # Update the state
-             for x in range(1, 20):
-                 if (keyval == keyDict[x]):
-                     c = charxlate[x]
-                     log(f"Key Press Detected: {c} {keyval}")
-                     break
-
-    if c == 'p' or c == 'P':
-        pressedPRO = True
-        timePRO = time.time()
-    if c == "" and pressedPRO and time.time() > timePRO + 0.75:
-        pressedPRO = False
-        c = 'PR'
+        return ""
+    pressedKEY = keyval # Update the state
+    if keyval == KEYS_RELEASED:
+        # A key was released.  DSKY keys are edge triggered: nothing to send.
+        return ""
+    c = TM_KEYS.get(tuple(keyval), "")
+    if c:
+        log(f"Key Press Detected: {c} {keyval}")
     return c
 
 
@@ -330,57 +285,13 @@ def updateLampStatuses(key, value):
 	if key in lampStatuses:
 		lampStatuses[key]["isLit"] = value
 
-# Converts a 5-bit code in channel 010 to " ", "0", ..., "9".
-def codeToString(code):
-    if code == 0:
-        return " "
-    elif code == 21:
-        return "0"
-    elif code == 3:
-        return "1"
-    elif code == 25:
-        return "2"
-    elif code == 27:
-        return "3"
-    elif code == 15:
-        return "4"
-    elif code == 30:
-        return "5"
-    elif code == 28:
-        return "6"
-    elif code == 19:
-        return "7"
-    elif code == 29:
-        return "8"
-    elif code == 31:
-        return "9"
-    return "?"
-
-vText = "  "
-nText = "  "
-vnFlashing = False
-vnTimer = ""
-vnCurrentlyON = True
-def vnFlashingHandler():
-    global vnFlashing, vnTimer, vnCurrentlyOn
-    if vnFlashing:
-        vnCurrentlyOn = not vnCurrentlyOn
-        if vnCurrentlyOn:
-            TM.segments[14] = nText
-            TM.segments[22] = vText
-        else:
-            TM.segments[14] = "  "
-            TM.segmetns[22] = "  "
-    vnTimer = threatding.Timer(0.75, vnFlashingHandler)
-    vnTimer.start()
-
-def vnFlashingStop():
-    global vnFlashing, vnTimer, vnCurrentlyOn
-    if vnFlashing:
-        #vnTimer.cancel()
-        TM.segments[14] = nText
-        TM.segments[22] = vText
-        vnFlashing = False
+# Every timed job (keypad scan, flash phase, PRO release) is a timer on this
+# wheel, and they all fire from the event loop's thread; nothing else touches
+# the TM1638 bus.
+wheel = TimerWheel()
+FLASH_PERIOD = 0.75
+# Lamps that flash (rather than stay lit) while their status is on.
+flashingLamps = ("OPR ERR",)
 
 ###################################################################################
 # Hardware abstraction / User-defined functions.  Also, any other platform-specific
@@ -389,98 +300,87 @@ def vnFlashingStop():
 # This function is automatically called periodically by the event loop to check for 
 # conditions that will result in sending messages to yaAGC that are interpreted
 # as changes to bits on its input channels.  For test purposes, it simply polls the
-# keyboard, and interprets various keystrokes as DSKY keys if present.  The return
+# keypad, and interprets key presses as DSKY keys if present.  The return
 # value is supposed to be a list of 3-tuples of the form
 #   [ (channel0,value0,mask0), (channel1,value1,mask1), ...]
 # and may be en empty list.  
 def inputsForAGC():
-    ch = get_char_keyboard_nonblock()
+    return keyToAGC(get_char_keypad())
+
+# Called by the event loop whenever the console keyboard has input; every
+# character typed is handled like a keypad press.
+def inputsFromTerminal():
+    returnValue = []
+    for ch in terminal.read():
+        inputs = keyToAGC(ch)
+        if inputs == "":
+            return "" # User quit
+        returnValue += inputs
+    return returnValue
+
+def keyToAGC(ch):
     ch = ch.upper()
     if ch == '_':
         ch = '-'
     elif ch == '=':
         ch = '+'
-    else:
-        returnValue = parseDskyKey(ch)
+    returnValue = parseDskyKey(ch)
+    if ch == 'P':
+        pressPRO()
     if len(returnValue) > 0:
             log("Sending to yaAGC: " + oct(returnValue[0][1]) + "(mask " + oct(returnValue[0][2]) + ") -> channel " + oct(returnValue[0][0]))
     return returnValue
 
+# Each TM1638 LED register on board 0 drives two lamps: bit 0 and bit 1.
+LAMP_REGISTERS = (
+    (0x01, "TEMP", "UPLINK ACTY"),
+    (0x03, "GIMBAL LOCK", "NO ATT"),
+    (0x05, "PROG", "DSKY STANDBY"),
+    (0x07, "RESTART", "KEY REL"),
+    (0x09, "TRACKER", "OPR ERR"),
+    (0x0b, "ALT", "PRIO DSP"),
+    (0x0d, "VEL", "NO DAP"),
+)
+# Last value written to each lamp register; None forces a write.
+lampShadow = dict.fromkeys([r[0] for r in LAMP_REGISTERS])
+
 def updateLamps():
     # If there were actual hardware, this is where you could use
-    # lampStatus[] to control the lamps.
-    TM.sendCommand(0x44,0)
-    if (lampStatuses["TEMP"]["isLit"] == True):
-        if (lampStatuses["UPLINK ACTY"]["isLit"] == True):
-            TM.sendData(1,3,0)
-        else:
-            TM.sendData(1,1,0)
-    else:
-        if (lampStatuses["UPLINK ACTY"]["isLit"] == True):
-           TM.sendData(1,2,0)
-        else:
-           TM.sendData(1,0,0)
-    if (lampStatuses["GIMBAL LOCK"]["isLit"] == True):
-        if (lampStatuses["NO ATT"]["isLit"] == True):
-            TM.sendData(3,3,0)
-        else:
-            TM.sendData(3,1,0)
-    else:
-        if (lampStatuses["NO ATT"]["isLit"] == True):
-           TM.sendData(3,2,0)
-        else:
-           TM.sendData(3,0,0)
-    if (lampStatuses["PROG"]["isLit"] == True):
-        if (lampStatuses["DSKY STANDBY"]["isLit"] == True):
-            TM.sendData(5,3,0)
-        else:
-            TM.sendData(5,1,0)
-    else:
-        if (lampStatuses["DSKY STANDBY"]["isLit"] == True):
-           TM.sendData(5,2,0)
-        else:
-           TM.sendData(5,0,0)
-    if (lampStatuses["RESTART"]["isLit"] == True):
-        if (lampStatuses["KEY REL"]["isLit"] == True):
-            TM.sendData(7,3,0)
-        else:
-            TM.sendData(7,1,0)
-    else:
-        if (lampStatuses["KEY REL"]["isLit"] == True):
-           TM.sendData(7,2,0)
-        else:
-           TM.sendData(7,0,0)
-    if (lampStatuses["TRACKER"]["isLit"] == True):
-        if (lampStatuses["OPR ERR"]["isLit"] == True):
-            TM.sendData(9,3,0)
-        else:
-            TM.sendData(9,1,0)
-    else:
-        if (lampStatuses["OPR ERR"]["isLit"] == True):
-           TM.sendData(9,2,0)
-        else:
-           TM.sendData(9,0,0)
-    if (lampStatuses["ALT"]["isLit"] == True):
-        if (lampStatuses["PRIO DSP"]["isLit"] == True):
-            TM.sendData(0x0b,3,0)
-        else:
-            TM.sendData(0x0b,1,0)
-    else:
-        if (lampStatuses["PRIO DSP"]["isLit"] == True):
-           TM.sendData(0x0b,2,0)
-        else:
-           TM.sendData(0x0b,0,0)
-    if (lampStatuses["VEL"]["isLit"] == True):
-        if (lampStatuses["NO DAP"]["isLit"] == True):
-            TM.sendData(0x0d,3,0)
-        else:
-            TM.sendData(0x0d,1,0)
-    else:
-        if (lampStatuses["NO DAP"]["isLit"] == True):
-           TM.sendData(0x0d,2,0)
-        else:
-           TM.sendData(0x0d,0,0)
+    # lampStatus[] to control the lamps.  Only registers whose lamps
+    # changed since the last call are written.
+    # Flashing lamps are only lit in the bright half of the flash phase.
+    for addr, lamp1, lamp2 in LAMP_REGISTERS:
+        val = 0
+        if lampStatuses[lamp1]["isLit"] and (flasher.lit or lamp1 not in flashingLamps):
+            val |= 1
+        if lampStatuses[lamp2]["isLit"] and (flasher.lit or lamp2 not in flashingLamps):
+            val |= 2
+        if lampShadow[addr] != val:
+            lampShadow[addr] = val
+            TM.sendData(addr, val, 0)
     return
+
+# Channel 010 words decode through a table built once at startup, which maps
+# every possible 15-bit value straight to its (segment index, font byte) writes.
+DISPLAY_TABLE = build_display_table()
+
+# Last font byte written to each 7-segment digit, so repeats cost nothing.
+segmentShadow = bytearray(24)
+def writeSegment(index, fontByte):
+    if segmentShadow[index] != fontByte:
+        segmentShadow[index] = fontByte
+        TM.sendData((index % 8) * 2, fontByte, index // 8)
+
+# Digit writes go through the flasher, which blanks Verb/Noun in the dark
+# half of the flash phase while V/N flash is on.  One periodic timer
+# advances the phase for the V/N digits and the flashing lamps together.
+flasher = Flasher(writeSegment)
+def flashTick():
+    flasher.toggle()
+    for lamp in flashingLamps:
+        if lampStatuses[lamp]["isLit"]:
+            updateLamps()
+            break
 updateLamps()
 
 # This function is called by the event loop only when yaAGC has written
@@ -488,118 +388,29 @@ updateLamps()
 # with this output data, which is not processed additionally in any way by the 
 # generic portion of the program. As a test, I simply display the outputs for 
 # those channels relevant to the DSKY.
-last10 = 1234567
-last11 = 1234567
-last13 = 1234567
-last163 = 1234567
-plusMinusState1 = 0
-plusMinusState2 = 0
-plusMinusState3 = 0
+channelCache = ChannelCache()
+plusMinusStates = [0, 0, 0] # R1, R2, R3: bit 1 = plus, bit 2 = minus
 def outputFromAGC(channel, value):
-    # These lastNN values are just used to cut down on the number of messages printed,
-    # when the same value is output over and over again to the same channel, because
-    # that makes debugging harder.  
-    global last10, last11, last13, last163, plusMinusState1, plusMinusState2, plusMinusState3, vnFlashing
+    # The channel cache remembers the last value per channel 010 row and per
+    # lamp channel, so words that repeat what is already displayed (the
+    # common case, since yaAGC keeps cycling through the rows) cost nothing.
     if (channel == 0o13):
         value &= 0o3000
-    if (channel == 0o10 and value != last10) or (channel == 0o11 and value != last11) or (channel == 0o13 and value != last13) or (channel == 0o163 and value != last163):
+    if channelCache.update(channel, value):
         if channel == 0o10:
-            last10 = value
             aaaa = (value >> 11) & 0x0F
-            b = (value >> 10) & 0x01
-            ccccc = (value >> 5) & 0x1F
-            ddddd = value & 0x1F
             if aaaa != 12:
-                sc = codeToString(ccccc)
-                sd = codeToString(ddddd)
-            if aaaa == 11:
-                log(sc + " -> M1   " + sd + " -> M2")
-                TM.segments[22] = sc
-                TM.segments[23] = sd
-            elif aaaa == 10:
-                log(sc + " -> V1   " + sd + " -> V2")
-                vText = sc + sd
-                TM.segments[14] = sc
-                TM.segments[15] = sd
-            elif aaaa == 9:
-                log(sc + " -> N1   " + sd + " -> N2")
-                nText = sc + sd
-                TM.segments[6] = sc
-                TM.segments[7] = sd
-            elif aaaa == 8:
-                log("          " + sd + " -> 11")
-                TM.segments[17] = sd
-            elif aaaa == 7:
-                plusMinus = "  "
-                if b != 0:
-                    plusMinus = "1+"
-                    plusMinusState1 |= 1
-                    TM.segments[16] = " "
-                else:
-                    plusMinusState1 &= ~1
-                log(sc + " -> 12   " + sd + " -> 13   " + plusMinus)
-                TM.segments[18] = sc
-                TM.segments[19] = sd # <--!! BUG FIX: Was 'sc'
-            elif aaaa == 6:
-                plusMinus = "  "
-                if b != 0:
-                    plusMinus = "1-"
-                    plusMinusState1 |= 2
-                    TM.segnents[16] = "-"
-                else:
-                    plusMinusState1 &= ~2
-                log(sc + " -> 14   " + sd + " -> 15   " + plusMinus)
-                TM.segments[20] = sc
-                TM.segments[21] = sd
-            elif aaaa == 5:
-                plusMinus = "  "
-                if b != 0:
-                    plusMinus = "2+"
-                    plusMinusState2 |= 1
-                    TM.segments[8] = " "
-                else:
-                    plusMinusState2 &= ~1
-                log(sc + " -> 21   " + sd + " -> 22   " + plusMinus)
-                TM.segments[9] = sc
-                TM.segments[10] = sd
-            elif aaaa == 4:
-                plusMinus = "  "
-                if b != 0:
-                    plusMinus = "2-"
-                    plusMinusState2 |= 2
-                    TM.segments[8] = "-"
-                else:
-                    plusMinusState2 &= ~2
-                log(sc + " -> 23   " + sd + " -> 24   " + plusMinus)
-                TM.segments[11] = sc
-                TM.segments[12] = sd
-            elif aaaa == 3:
-                log(sc + " -> 25   " + sd + " -> 31")
-                TM.segments[13] = sc
-                TM.segments[1] = sd
-            elif aaaa == 2:
-                plusMinus = "  "
-                if b != 0:
-                    plusMinus = "3+"
-                    plusMinusState3 |= 1
-                    TM.segments[0] = " "
-                else:
-                    plusMinusState3 &= ~1
-                log(sc + " -> 32   " + sd + " -> 33   " + plusMinus)
-                TM.segments[2] = sc
-                TM.segments[3] = sd
-            elif aaaa == 1:
-                plusMinus = "  "
-                if b != 0:
-                    plusMinus = "3-"
-                    plusMinusState3 |= 2
-                    TM.segments[0] = "-"
-                else:
-                    plusMinusState3 &= ~2
-                log(sc + " -> 34   " + sd + " -> 35   " + plusMinus)
-                TM.segments[4] = sc
-                TM.segments[5] = sd
-            elif aaaa == 12:
+                # One table lookup gives every segment write for this word.
+                if not args.quiet:
+                    log(describeDisplayWord(value))
+                writes, sign = DISPLAY_TABLE[value]
+                for index, fontByte in writes:
+                    flasher.write_segment(index, fontByte)
+                if sign:
+                    register, setBits, clearBits = sign
+                    plusMinusStates[register] = (plusMinusStates[register] & ~clearBits) | setBits
+                    flasher.write_segment(SIGN_INDEX[register], SIGN_FONT[plusMinusStates[register]])
+            else:
                 vel = "VEL OFF         "
                 if (value & 0x04) != 0:
                     vel = "VEL ON          "
@@ -639,7 +450,6 @@ def outputFromAGC(channel, value):
                 log(vel + "   " + noAtt + "   " + alt + "   " + gimbalLock + "   " + tracker + "   " + prog)
                 updateLamps()
         elif channel == 0o11:
-            last11 = value
             compActy = "COMP ACTY OFF   "
             TM.sendCommand(0x44,0)
             if (value & 0x02) != 0:
@@ -656,28 +466,18 @@ def outputFromAGC(channel, value):
             else:
                 updateLampStatuses("UPLINK ACTY", False)
             flashing = "V/N NO FLASH    "
-            # !! UNCOMMENTED V/N FLASHING LOGIC !!
             if (value & 0x20) != 0:
-               if not vnFlashing:
-                   vnFlashing = True
-                   vnCurrentlyOn = True
-                   vnTimer = threading.Timer(0.75, vnFlashingHandler)
-                   vnTimer.start()
                flashing = "V/N Flash     "
-            else:
-               if vnFlashing != False:
-                   vnFlashingStop()
+            flasher.set_flashing((value & 0x20) != 0)
             log(compActy + "   " + uplinkActy + "   " + "   " + flashing)
             updateLamps()
         elif channel == 0o13:
-            last13 = value
             test = "DSKY TEST       "
             if (value & 0x200) == 0:
                 test = "DSKY NO TEST    "
             log(test)
             updateLamps()
         elif channel == 0o163:
-            last163 = value
             if (value & 0x08) != 0:
                 temp = "TEMP ON         "
                 updateLampStatuses("TEMP", True)
@@ -698,8 +498,8 @@ def outputFromAGC(channel, value):
                 updateLampStatuses("KEY REL", False)
             if (value & 0o100) != 0:
                 oprErr = "OPR ERR FLASH   "
-                # This logic is just "ON" - flashing is handled by the server
-                updateLampStatuses("OPR ERR", True) 
+                # Flashed by flashTick() via flashingLamps
+                updateLampStatuses("OPR ERR", True)
             else:
                 oprErr = "OPR ERR OFF     "
                 updateLampStatuses("OPR ERR", False)
@@ -710,6 +510,7 @@ def outputFromAGC(channel, value):
                 restart = "RESTART OFF     "
                 updateLampStatuses("RESTART", False)
             log(temp + "   " + standby + "   " + keyRel + "   " + oprErr + "   " + restart)
+            updateLamps()
         else:
             log("Received from yaAGC: " + oct(value) + " -> channel " + oct(channel))
     return
@@ -734,6 +535,7 @@ def connectToAGC():
             
             # NOW that we are connected, set it to non-blocking
             s.setblocking(0) 
+            uplink.reset() # New connection: yaAGC knows none of our masks
             
             log(f"Connected to yaAGC ({TCP_IP}:{TCP_PORT})")
             return True # Return success
@@ -750,120 +552,128 @@ def connectToAGC():
             s.close()
 
 ###################################################################################
-# Event loop.  Just check periodically for output from yaAGC (in which case the
-# user-defined callback function outputFromAGC is executed) or data in the 
-# user-defined function inputsForAGC (in which case a message is sent to yaAGC).
+# Event loop.  Sleeps in select() until either yaAGC has sent something (in which
+# case all of it is drained and the user-defined callback function outputFromAGC
+# is executed for every packet), the console keyboard has input, or the next timer
+# on the wheel is due: the keypad scan every PULSE seconds, the flash phase and
+# the fake PRO release.  The keypad scan polls the user-defined function
+# inputsForAGC, and everything queued in one pass is sent to yaAGC in one write.
 # But this section has no target-specific code, and shouldn't need to be modified
 # unless there are bugs.
-def eventLoop():
-    # Buffer for a packet received from yaAGC.
-    packetSize = 4
-    inputBuffer = bytearray(packetSize)
-    leftToRead = packetSize
-    view = memoryview(inputBuffer)
-    
-    didSomething = False
-    
-    # --- Grace Period Timer ---
-    # We will not check for keys for the first 1.5 seconds
-    # to allow the TM1638 to stabilize after display writes.
-    start_time = time.time()
-    grace_period_ended = False
-    # --- END ---
-    
-    # We are already connected, so we go straight to the event loop.
+quitRequested = False
+def queueInputs(externalData):
+    global quitRequested
+    if externalData == "":
+        quitRequested = True # User quit
+        return
+    for i in range(0, len(externalData)):
+        packetize(externalData[i])
+
+def scanKeypad():
+    queueInputs(inputsForAGC())
+
+# Timers started by eventLoop() for one connection.  A pending PRO release
+# is not among them: it must still reach yaAGC after a reconnect.
+loopTimers = []
+
+def startKeypadScan():
+    log("Keypad grace period ended. Polling enabled.")
+    loopTimers.append(wheel.call_every(PULSE, scanKeypad))
+
+def drainSocket(framer):
+    # Reads everything the socket has.  Returns None normally, or the
+    # eventLoop() return value if the connection is finished.
     while True:
-        if not didSomething:
-            time.sleep(PULSE)
-        didSomething = False
-        
-        # --- FIX: Set numNewBytes to -1 to start ---
-        numNewBytes = -1 # Use -1 to indicate "no read yet"
-        
-        # Check for packet data received from yaAGC and process it.
+        view = framer.free_view()
         try:
-            numNewBytes = s.recv_into(view, leftToRead)
+            numNewBytes = s.recv_into(view)
+        except BlockingIOError:
+            return None
         except socket.error as e:
-            # 11 = Resource temporarily unavailable, 115 = Operation now in progress
-            if e.errno == 11 or e.errno == 115: 
-                pass # <--- THIS IS THE FIX. (Was numNewBytes = 0)
-            else:
-                log(f"Socket error on recv: {e}")
-                return False # Critical error, disconnect
-        except Exception as e:
-            log(f"Unexpected error on recv: {e}")
-            return False
-
+            log(f"Socket error on recv: {e}")
+            return False # Critical error, disconnect
         if numNewBytes == 0:
             # An orderly shutdown from the server returns 0 bytes
-            # This is now ONLY triggered by a real disconnect.
             log("yaAGC server has disconnected.")
             return True # Signal to reconnect
-
-        if numNewBytes > 0:
-            view = view[numNewBytes:]
-            leftToRead -= numNewBytes
-            if leftToRead == 0:
-                # Prepare for next read attempt.
-                view = memoryview(inputBuffer)
-                leftToRead = packetSize
-                # Parse the packet just read, and call outputFromAGC().
-                # Start with a sanity check.
-                ok = 1
-                if (inputBuffer[0] & 0xF0) != 0x00:
-                    ok = 0
-                elif (inputBuffer[1] & 0xC0) != 0x40:
-                    ok = 0
-                elif (inputBuffer[2] & 0xC0) != 0x80:
-                    ok = 0
-                elif (inputBuffer[3] & 0xC0) != 0xC0:
-                    ok = 0
-                # Packet has the various signatures we expect.
-                if ok == 0:
-                    if inputBuffer[0] != 0xff or inputBuffer[1] != 0xff or inputBuffer[2] != 0xff or inputBuffer[2] != 0xff:
-                        if inputBuffer[0] != 0xff:
-                            log("Illegal packet: " + hex(inputBuffer[0]) + " " + hex(inputBuffer[1]) + " " + hex(inputBuffer[2]) + " " + hex(inputBuffer[3]))
-                        for i in range(1,packetSize):
-                            if (inputBuffer[i] & 0xF0) == 0:
-                                j = 0
-                                for k in range(i,4):
-                                    inputBuffer[j] = inputBuffer[k]
-                                    j += 1
-                                view = view[j:]
-                                leftToRead = packetSize - j
-                else:
-                    channel = (inputBuffer[0] & 0x0F) << 3
-                    channel |= (inputBuffer[1] & 0x38) >> 3
-                    value = (inputBuffer[1] & 0x07) << 12
-                    value |= (inputBuffer[2] & 0x3F) << 6
-                    value |= (inputBuffer[3] & 0x3F)
+        framer.commit(numNewBytes)
+        # Decode every whole packet at once; non-DSKY channels are
+        # dropped by the channel bitmap before their value is decoded
+        # (unless we are recording, which logs every channel).
+        if recorder is None:
+            for channel, value in framer.packets(DSKY_CHANNELS):
+                outputFromAGC(channel, value)
+        else:
+            for channel, value in framer.packets(ALL_CHANNELS):
+                recorder.record(channel, value)
+                if (DSKY_CHANNELS >> channel) & 1:
                     outputFromAGC(channel, value)
-                didSomething = True
-        
-        
-        # --- Check if grace period is over ---
-        if not grace_period_ended:
-            if (time.time() - start_time) > 1.5:
-                log("Keypad grace period ended. Polling enabled.")
-                grace_period_ended = True
-        # --- END ---
-
-        # Check for locally-generated data
-        if grace_period_ended: # Only poll for keys AFTER grace period
+        if numNewBytes < len(view):
+            return None
+
+def eventLoop():
+    # Persistent receive buffer; partial packets carry over between reads.
+    framer = PacketFramer()
+    resyncs = 0
+
+    selector = selectors.DefaultSelector()
+    selector.register(s, selectors.EVENT_READ)
+    writing = False # Key data the socket did not take yet: also wait for EVENT_WRITE
+    if terminal.interactive:
+        selector.register(terminal, selectors.EVENT_READ)
+
+    # Timers from a previous connection are stale.
+    for timer in loopTimers:
+        timer.cancel()
+    loopTimers[:] = [wheel.call_every(FLASH_PERIOD, flashTick)]
+    
+    # --- Grace Period Timer ---
+    # We will not check for keys for the first 1.5 seconds
+    # to allow the TM1638 to stabilize after display writes.
+    loopTimers.append(wheel.call_later(1.5, startKeypadScan))
+    # --- END ---
+    
+    # We are already connected, so we go straight to the event loop.
+    try:
+        while True:
+            for key, events in selector.select(wheel.timeout()):
+                if key.fileobj is terminal:
+                    queueInputs(inputsFromTerminal())
+                    if not terminal.interactive:
+                        selector.unregister(terminal)
+                    continue
+                if not events & selectors.EVENT_READ:
+                    continue # Writable: the flush below sends the rest
+                try:
+                    result = drainSocket(framer)
+                except Exception as e:
+                    log(f"Unexpected error on recv: {e}")
+                    return False
+                if result is not None:
+                    return result
+                if framer.resyncs != resyncs:
+                    log(f"Illegal packet data skipped ({framer.resyncs - resyncs} resyncs)")
+                    resyncs = framer.resyncs
+
+            # Run due timers, then send whatever they queued
             try:
-                externalData = inputsForAGC()
-                if externalData == "":
-                    echoOn(True)
+                wheel.run_due()
+                if quitRequested:
+                    terminal.restore()
                     return False # User quit
-                for i in range(0, len(externalData)):
-                    packetize(externalData[i])
-                    didSomething = True
+                # The socket is non-blocking: whatever it does not take now
+                # stays queued and goes out when it is writable again.
+                if uplink.send(s) != writing:
+                    writing = not writing
+                    selector.modify(s, selectors.EVENT_READ | (selectors.EVENT_WRITE if writing else 0))
             except socket.error as e:
                 log(f"Socket error on send: {e}")
                 return True # Disconnected, signal to reconnect
             except Exception as e:
                 log(f"Unexpected error on send: {e}")
                 return False # Critical error
+    finally:
+        selector.close()
 
 # !! NEW MASTER LOOP !!
 try:
@@ -880,6 +690,12 @@ try:
         log("Restarting connection loop...")
         s.close() # Ensure socket is closed
         TM.clearDisplay() # Clear DSKY on disconnect
+        segmentShadow[:] = bytes(len(segmentShadow))
+        lampShadow = dict.fromkeys(lampShadow)
+        plusMinusStates[:] = [0, 0, 0]
+        flasher.reset()
+        log(f"Channel cache hit rate: {channelCache.hit_rate:.1%} ({channelCache.hits} hits, {channelCache.misses} misses)")
+        channelCache.reset()
         updateLamps() # Will clear lamps
         time.sleep(3) # Pause before retrying
 
@@ -887,8 +703,11 @@ except KeyboardInterrupt:
     log("\nExiting by user request.")
     if 's' in globals():
         s.close()
-    echoOn(True)
+    terminal.restore()
+    closeRecorder()
     TM.clearDisplay()
     os._exit(0)
 
+terminal.restore() # os._exit() skips atexit handlers
+closeRecorder()
 os._exit(0)
\ No newline at end of file
@@ -0,0 +1,247 @@
+# agclog.py
+# Compact record/replay log of yaAGC channel traffic.
+#
+# A log is an 8-byte header followed by fixed 8-byte records:
+#
+#   uint32 dt_us    microseconds since the previous record
+#   uint16 channel  bit 15 = uplink (DSKY -> AGC), bit 14 = mask packet
+#   uint16 value
+#
+# all little endian. Records are only ever appended, and fixed-size records
+# mean the reader can mmap the file and index or seek without parsing it.
+#
+# Usage:
+#   python3 agclog.py info session.agclog
+#   python3 agclog.py replay session.agclog [--speed 10] [--start 60] [--port 19798]
+# and record with piDSKY4.py --record FILE or main.py --record FILE.
+import argparse
+import bisect
+import itertools
+import mmap
+import os
+import select
+import socket
+import struct
+import sys
+import time
+from array import array
+
+import config
+from protocol import encode_packet
+
+MAGIC = b'AGCLOG\x01\x00'
+RECORD = struct.Struct('<IHH')
+RECORD_SIZE = RECORD.size   # 8
+
+UPLINK = 0x8000
+MASK = 0x4000
+GAP = 0x3FFF                # Channel of a time-only record (long pauses)
+CHANNEL_BITS = 0x3FFF
+
+MAX_DT = 0xFFFFFFFF         # ~71 minutes
+FLUSH_NS = 1_000_000_000    # Writer flushes at least once a second
+
+
+class LogWriter:
+    """Appends records to a log file."""
+
+    def __init__(self, path):
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.last = time.monotonic_ns()
+        self.flushed = self.last
+        self.count = 0
+
+    def record(self, channel, value, uplink=False, mask=False):
+        now = time.monotonic_ns()
+        dt = (now - self.last) // 1000
+        self.last = now
+        while dt > MAX_DT:
+            self.file.write(RECORD.pack(MAX_DT, GAP, 0))
+            dt -= MAX_DT
+        if uplink:
+            channel |= UPLINK
+        if mask:
+            channel |= MASK
+        self.file.write(RECORD.pack(dt, channel, value))
+        self.count += 1
+        # Keep what is on disk recent, in case the process is killed
+        if now - self.flushed > FLUSH_NS:
+            self.file.flush()
+            self.flushed = now
+
+    def close(self):
+        self.file.close()
+
+
+class LogReader:
+    """
+    mmap view of a log. Records are indexed directly; times() gives each
+    record's offset from the start (built on first use) so seeking by time
+    is a bisect.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < len(MAGIC):
+            raise ValueError(f"{path}: not an AGC log")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}: not an AGC log")
+        # A torn final record (recorder killed mid-write) is ignored.
+        self.count = (size - len(MAGIC)) // RECORD_SIZE
+        self._times = None
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        """Returns (dt_us, channel_field, value) for record index."""
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return RECORD.unpack_from(self.map, len(MAGIC) + index * RECORD_SIZE)
+
+    def records(self, start=0):
+        """Iterates (dt_us, channel_field, value) from record start."""
+        offset = len(MAGIC) + start * RECORD_SIZE
+        end = len(MAGIC) + self.count * RECORD_SIZE
+        return RECORD.iter_unpack(memoryview(self.map)[offset:end])
+
+    def times(self):
+        """Offset of every record from the start of the log, in microseconds."""
+        if self._times is None:
+            times = array('q')
+            t = 0
+            for dt, _, _ in self.records():
+                t += dt
+                times.append(t)
+            self._times = times
+        return self._times
+
+    def duration(self):
+        return self.times()[-1] / 1e6 if self.count else 0.0
+
+    def seek(self, seconds):
+        """Index of the first record at or after seconds into the log."""
+        return bisect.bisect_left(self.times(), int(seconds * 1e6))
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def info(reader):
+    downlink = {}
+    uplink = 0
+    for _, channel, _ in reader.records():
+        if channel & UPLINK:
+            uplink += 1
+        elif channel != GAP:
+            downlink[channel] = downlink.get(channel, 0) + 1
+    print(f"{len(reader)} records, {reader.duration():.3f} s")
+    print(f"uplink packets: {uplink}")
+    for channel in sorted(downlink):
+        print(f"channel {channel:03o}: {downlink[channel]}")
+
+
+def state_at(reader, index):
+    """
+    Packets that rebuild the DSKY as it was just before record index: the
+    latest word of every channel 010 row and of every other channel (masks
+    separately), in the order they were last sent.
+    """
+    state = {}
+    for _, channel, value in itertools.islice(reader.records(), index):
+        if channel & UPLINK or channel == GAP:
+            continue
+        chan = channel & CHANNEL_BITS
+        if chan == config.CHAN_DISPLAY and not channel & MASK:
+            key = (channel, value >> 11)   # Each relay row is its own state
+        else:
+            key = (channel, None)
+        state.pop(key, None)
+        state[key] = encode_packet(chan, value, bool(channel & MASK))
+    return b''.join(state.values())
+
+
+def replay(reader, port, speed, start):
+    """
+    Serves the log's downlink records to one DSKY client through the yaAGC
+    socket protocol, at speed x real time. Uplink records are skipped; the
+    client's own key presses are printed.
+    """
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    srv.bind(('localhost', port))
+    srv.listen(1)
+    print(f"[Replay] {len(reader)} records, {reader.duration():.1f} s at {speed}x on port {port}")
+    conn, addr = srv.accept()
+    print(f"[Replay] DSKY connected from {addr}")
+
+    index = reader.seek(start)
+    times = reader.times()
+    base = times[index] if index < len(reader) else 0
+    t0 = time.monotonic()
+    out = bytearray()
+    sent = 0
+    try:
+        if index:
+            # Starting part way in: show what the DSKY showed at that point
+            conn.sendall(state_at(reader, index))
+        for dt, channel, value in reader.records(index):
+            due = t0 + (times[index] - base) / 1e6 / speed
+            index += 1
+            if channel & UPLINK or channel == GAP:
+                continue
+            delay = due - time.monotonic()
+            if delay > 0.001:
+                # Everything that was due already goes out in one write
+                if out:
+                    conn.sendall(out)
+                    out.clear()
+                time.sleep(delay)
+                # The socket stays blocking (sendall must not fail on a slow
+                # client); only read when a key press is already waiting.
+                if select.select([conn], [], [], 0)[0]:
+                    data = conn.recv(1024)
+                    if not data:
+                        print("[Replay] DSKY disconnected")
+                        return
+                    print(f"[Replay] << {data.hex()}")
+            out += encode_packet(channel & CHANNEL_BITS, value)
+            sent += 1
+        if out:
+            conn.sendall(out)
+        print(f"[Replay] Done, {sent} packets in {time.monotonic() - t0:.2f} s")
+    except (BrokenPipeError, ConnectionResetError):
+        print("[Replay] DSKY disconnected")
+    finally:
+        conn.close()
+        srv.close()
+
+
+def main():
+    cli = argparse.ArgumentParser(description="Inspect or replay an AGC channel log.")
+    sub = cli.add_subparsers(dest="command", required=True)
+    p_info = sub.add_parser("info", help="Print record counts and duration.")
+    p_info.add_argument("log")
+    p_replay = sub.add_parser("replay", help="Serve the log to a DSKY client.")
+    p_replay.add_argument("log")
+    p_replay.add_argument("--port", type=int, default=19798, help="Port to serve on (default 19798).")
+    p_replay.add_argument("--speed", type=float, default=1.0, help="Replay speed, 1 to 100 (default 1).")
+    p_replay.add_argument("--start", type=float, default=0.0, help="Seconds into the log to start at.")
+    args = cli.parse_args()
+
+    reader = LogReader(args.log)
+    if args.command == "info":
+        info(reader)
+    else:
+        if not 1 <= args.speed <= 100:
+            sys.exit("--speed must be between 1 and 100")
+        replay(reader, args.port, args.speed, args.start)
+    reader.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# aio.py
+# asyncio adapters for the DSKY driver.
+#
+# The synchronous AgcClient and DskyHardware stay as they are; these wrappers
+# let main.py run them on an event loop instead of a fixed sleep() poll:
+#   * socket reads wake up on readiness (loop.add_reader),
+#   * the keypad is scanned by a fixed-rate task,
+#   * display writes are queued and pushed out by their own flush task.
+import asyncio
+
+class AsyncAgcClient:
+    """Event-driven wrapper around a connected AgcClient."""
+
+    def __init__(self, agc):
+        self.agc = agc
+        self.loop = asyncio.get_running_loop()
+        self.closed = self.loop.create_future() # Resolves on disconnect
+        self.on_packet = None
+        self._flush_scheduled = False
+
+    def start(self, on_packet):
+        """Calls on_packet(channel, value) whenever yaAGC sends data."""
+        self.on_packet = on_packet
+        self.loop.add_reader(self.agc.sock, self._on_readable)
+
+    def stop(self):
+        self.loop.remove_reader(self.agc.sock)
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+    def _on_readable(self):
+        for channel, value in self.agc.read():
+            self.on_packet(channel, value)
+        if not self.agc.connected:
+            self.stop()
+
+    def send_key(self, key_char):
+        """Queues a key; all keys queued in one loop pass share one write."""
+        self.agc.send_key(key_char, flush=False)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.loop.call_soon(self._flush)
+
+    def _flush(self):
+        self._flush_scheduled = False
+        self.agc.flush()
+        if not self.agc.connected:
+            self.stop()
+
+
+class AsyncDskyHardware:
+    """Wraps DskyHardware: buffered segment writes plus a keypad task."""
+
+    def __init__(self, dsky):
+        self.dsky = dsky
+        self.pending = {}           # segment index -> font byte
+        self.dirty = asyncio.Event()
+
+    def write_segment(self, index, font_byte):
+        """Queues a segment write; a burst of packets is flushed once."""
+        self.pending[index] = font_byte
+        self.dirty.set()
+
+    async def flush_task(self):
+        while True:
+            await self.dirty.wait()
+            self.dirty.clear()
+            pending, self.pending = self.pending, {}
+            for index, font_byte in pending.items():
+                self.dsky.write_segment(index, font_byte)
+
+    async def keypad_task(self, send_key, period, wheel):
+        """
+        Scans the keypad every period seconds. The same tick runs the timer
+        wheel (flash phase, PRO release), so every timer fires on this task.
+        """
+        self.dsky.send_key = send_key  # PRO release, from its wheel timer
+        loop = asyncio.get_running_loop()
+        next_scan = loop.time()
+        while True:
+            key = self.dsky.get_key_event()
+            if key:
+                send_key(key)
+            wheel.run_due()
+
+            # Fixed rate: schedule from the previous deadline, not from now,
+            # but don't try to catch up if a scan overran.
+            next_scan += period
+            delay = next_scan - loop.time()
+            if delay < 0:
+                next_scan = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
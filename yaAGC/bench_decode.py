@@ -0,0 +1,69 @@
+# bench_decode.py
+# Packets-per-second benchmark for the yaAGC packet decoders.
+#
+# Usage: python3 bench_decode.py [packets]
+import random
+import sys
+import time
+
+import protocol
+from protocol import PacketFramer, DSKY_CHANNELS, encode_packet
+
+def make_stream(count):
+    """A realistic mix: DSKY channels plus the busy non-DSKY ones."""
+    channels = [0o10, 0o11, 0o13, 0o163, 0o12, 0o14, 0o30, 0o31, 0o32, 0o33, 0o34, 0o35]
+    rng = random.Random(1)
+    return b''.join(encode_packet(rng.choice(channels), rng.getrandbits(15)) for _ in range(count))
+
+def decode_legacy(data):
+    """The old per-packet loop from AgcClient.read, for comparison."""
+    results = []
+    for i in range(0, len(data), 4):
+        pkt = data[i:i+4]
+        if len(pkt) < 4: break
+        if (pkt[0] & 0xF0) == 0x00 and (pkt[3] & 0xC0) == 0xC0:
+            channel = (pkt[0] & 0x0F) << 3
+            channel |= (pkt[1] & 0x38) >> 3
+            value = (pkt[1] & 0x07) << 12
+            value |= (pkt[2] & 0x3F) << 6
+            value |= (pkt[3] & 0x3F)
+            results.append((channel, value))
+    return results
+
+def decode_framer(data, bitmap, chunk=1024):
+    """Feeds the stream through a PacketFramer in socket-sized chunks."""
+    framer = PacketFramer()
+    n = 0
+    for i in range(0, len(data), chunk):
+        framer.feed(data[i:i+chunk])
+        for _ in framer.packets(bitmap):
+            n += 1
+    return n
+
+def run(label, func, count):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {count / elapsed:>12,.0f} packets/s")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    data = make_stream(count)
+    print(f"--- yaAGC decode benchmark ({count} packets) ---")
+
+    run("legacy per-packet loop", lambda: decode_legacy(data), count)
+
+    numpy = protocol.np
+    protocol.np = None
+    run("framer, struct, all channels", lambda: decode_framer(data, protocol.ALL_CHANNELS), count)
+    run("framer, struct, DSKY bitmap", lambda: decode_framer(data, DSKY_CHANNELS), count)
+    protocol.np = numpy
+
+    if numpy is None:
+        print("numpy not installed, skipping vectorised decoder")
+    else:
+        run("framer, numpy, all channels", lambda: decode_framer(data, protocol.ALL_CHANNELS, 4096), count)
+        run("framer, numpy, DSKY bitmap", lambda: decode_framer(data, DSKY_CHANNELS, 4096), count)
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,21 @@
 AGC_HOST = 'localhost'
 AGC_PORT = 19798
 READ_TIMEOUT = 0.05
+KEYPAD_SCAN_PERIOD = 0.02  # asyncio runtime: keypad scan every 20 ms
+
+# --- DSKY Hub (hub.py) ---
+# The hub holds the one connection to AGC_HOST:AGC_PORT and serves DSKY
+# clients on HUB_PORT (outside yaAGC's own 19797-19806 range).
+HUB_HOST = 'localhost'
+HUB_PORT = 19898
+HUB_KEY_RATE = 10.0        # Key packets per second allowed per client
+HUB_KEY_BURST = 20         # ... with bursts up to this many
+HUB_MAX_BACKLOG = 65536    # Bytes queued to a client before it is dropped
+
+# --- DSKY Timing (seconds, run from timerwheel.TimerWheel) ---
+POLL_PERIOD = 0.05         # Poll loop: keypad scan / socket poll
+FLASH_PERIOD = 0.75        # Half period of the V/N and OPR ERR flash
+PRO_RELEASE_DELAY = 0.75   # PRO has no release event; fake one after this
 
 # --- GPIO Configuration (BCM Numbering) ---
 # Matching piDSKY4.py
@@ -27,6 +42,22 @@ KEY_MAP = {
     15: '+', 16: '-', 17: '0', 18: 'V', 19: 'N'
 }
 
+# --- DSKY Keys (Char -> (Channel, Value, Mask)) ---
+# Derived from 'parseDskyKey' in piDSKY4.py. PRO is a separate bit on
+# channel 032 that is pressed with 'P' and released with 'PR'.
+DSKY_KEYS = {
+    '0': (0o15, 0o20, 0o37), '1': (0o15, 0o1, 0o37), '2': (0o15, 0o2, 0o37),
+    '3': (0o15, 0o3, 0o37),  '4': (0o15, 0o4, 0o37), '5': (0o15, 0o5, 0o37),
+    '6': (0o15, 0o6, 0o37),  '7': (0o15, 0o7, 0o37), '8': (0o15, 0o10, 0o37),
+    '9': (0o15, 0o11, 0o37),
+    '+': (0o15, 0o32, 0o37), '-': (0o15, 0o33, 0o37),
+    'V': (0o15, 0o21, 0o37), 'N': (0o15, 0o37, 0o37),
+    'R': (0o15, 0o22, 0o37), 'C': (0o15, 0o36, 0o37),
+    'K': (0o15, 0o31, 0o37), '\n': (0o15, 0o34, 0o37),
+    'P': (0o32, 0o00000, 0o20000),
+    'PR': (0o32, 0o20000, 0o20000), 'p': (0o32, 0o20000, 0o20000),
+}
+
 # --- TM1638 Raw Key Codes (for lookup) ---
 # Maps the raw byte array [x,0,0,0] or [0,x,0,0] etc to an ID 1-19
 KEY_BYTES = {
@@ -43,6 +74,22 @@ DIGIT_CODE = {
     30: "5", 28: "6", 19: "7", 29: "8", 31: "9"
 }
 
+# --- Display Layout (DSKY digit -> TM1638 segment index) ---
+# Derived from piDSKY4.py outputFromAGC
+DIGIT_INDEX = {
+    'V1': 14, 'V2': 15,
+    'N1': 6,  'N2': 7,
+    'M1': 22, 'M2': 23,
+    '11': 17, # Row 1
+    '12': 18, '13': 19, 'S1': 16, # Row 1 (S1 is Sign 1)
+    '14': 20, '15': 21,
+    '21': 9,  '22': 10, 'S2': 8,  # Row 2
+    '23': 11, '24': 12,
+    '25': 13, '31': 1,          # Note the jump to index 1!
+    '32': 2,  '33': 3,  'S3': 0,  # Row 3
+    '34': 4,  '35': 5
+}
+
 # --- GPIO Pin Definitions (BCM Numbers) ---
 # Lamps: Pins 11(17), 13(27), 15(22)
 # Switches: Pins 36(16), 38(20), 40(21)
@@ -0,0 +1,194 @@
+# display.py
+# Channel 010 display decoding for our board layout.
+#
+# A channel 010 word is AAAA B CCCCC DDDDD: AAAA selects the row (which pair
+# of digits), B is that row's sign bit, CCCCC/DDDDD are the left/right digit
+# codes. There are only 2**15 possible words, so instead of decoding each
+# word as it arrives we build a table once at startup that maps every word
+# straight to the segment writes and sign change it causes.
+from array import array
+
+import config
+from hardware.Font import FONT
+
+ROW_LAMPS = 12  # Row 12 carries lamp bits, not digits
+
+# Row -> (left digit, right digit, sign register, sign bit)
+# Sign registers are R1, R2, R3 (0-2); bit 1 = "+" row, bit 2 = "-" row.
+ROW_FIELDS = {
+    11: ('M1', 'M2', None, 0),
+    10: ('V1', 'V2', None, 0),
+    9:  ('N1', 'N2', None, 0),
+    8:  (None, '11', None, 0),
+    7:  ('12', '13', 0, 1),
+    6:  ('14', '15', 0, 2),
+    5:  ('21', '22', 1, 1),
+    4:  ('23', '24', 1, 2),
+    3:  ('25', '31', None, 0),
+    2:  ('32', '33', 2, 1),
+    1:  ('34', '35', 2, 2),
+}
+
+# Segment index of the sign digit for R1, R2, R3.
+SIGN_INDEX = (config.DIGIT_INDEX['S1'], config.DIGIT_INDEX['S2'], config.DIGIT_INDEX['S3'])
+
+# Sign state (bit 1 = plus, bit 2 = minus) -> font byte.
+# "+" cannot be shown on a 7-segment display, so it is blank.
+SIGN_FONT = (FONT[' '], FONT[' '], FONT['-'], FONT['-'])
+
+NO_CHANGE = ((), None)
+
+
+def build_display_table(digit_index=config.DIGIT_INDEX, font=FONT):
+    """
+    Returns a list indexed by channel 010 value. Each entry is
+    (writes, sign) where writes is a tuple of (segment_index, font_byte)
+    and sign is None or (register, set_bits, clear_bits).
+    """
+    code_font = [font[config.DIGIT_CODE.get(code, ' ')] for code in range(32)]
+    pairs = {}  # Share identical (index, byte) tuples between entries
+    table = [NO_CHANGE] * (1 << 15)
+
+    for value in range(1 << 15):
+        fields = ROW_FIELDS.get(value >> 11)
+        if fields is None:
+            continue
+        left, right, register, bit = fields
+
+        writes = []
+        if left:
+            write = (digit_index[left], code_font[(value >> 5) & 0x1F])
+            writes.append(pairs.setdefault(write, write))
+        write = (digit_index[right], code_font[value & 0x1F])
+        writes.append(pairs.setdefault(write, write))
+
+        sign = None
+        if register is not None:
+            if value & 0x400:
+                sign = (register, bit, 0)
+            else:
+                sign = (register, 0, bit)
+        table[value] = (tuple(writes), sign)
+
+    return table
+
+
+def describe(value):
+    """Human readable form of a channel 010 word, for logging."""
+    row = (value >> 11) & 0x0F
+    fields = ROW_FIELDS.get(row)
+    if fields is None:
+        return f"Row {row}: {oct(value)}"
+    left, right, register, bit = fields
+    sc = config.DIGIT_CODE.get((value >> 5) & 0x1F, "?")
+    sd = config.DIGIT_CODE.get(value & 0x1F, "?")
+    text = f"{sd} -> {right}" if left is None else f"{sc} -> {left}   {sd} -> {right}"
+    if register is not None and value & 0x400:
+        text += f"   {register + 1}{'+' if bit == 1 else '-'}"
+    return text
+
+
+class ChannelCache:
+    """
+    Small register file holding the last value seen for each channel 010
+    row and for channels 011, 013 and 163. yaAGC cycles through the display
+    rows, so comparing against a single "last channel 010 value" almost never
+    matches; comparing per row does.
+    """
+
+    ALL_BITS = 0x7FFF
+    # Slots 0-15 are channel 010 rows; the lamp channels follow.
+    CHANNEL_SLOTS = {config.CHAN_LAMPS: 16, config.CHAN_TEST: 17, config.CHAN_FLAGS: 18}
+    SLOT_CHANNELS = {slot: channel for channel, slot in CHANNEL_SLOTS.items()}
+
+    def __init__(self):
+        self.values = array('l', [-1] * 19)  # -1 = never seen
+        self.hits = 0
+        self.misses = 0
+
+    def update(self, channel, value):
+        """
+        Stores value and returns the bits that changed since the last
+        packet for the same row/channel: 0 means nothing to do. The first
+        packet for a slot (and any unknown channel) reports all bits changed.
+        """
+        if channel == config.CHAN_DISPLAY:
+            slot = value >> 11
+        else:
+            slot = self.CHANNEL_SLOTS.get(channel)
+            if slot is None:
+                return self.ALL_BITS
+        old = self.values[slot]
+        if old == value:
+            self.hits += 1
+            return 0
+        self.misses += 1
+        self.values[slot] = value
+        return self.ALL_BITS if old < 0 else old ^ value
+
+    def items(self):
+        """Yields (channel, value) for every slot seen so far."""
+        for slot, value in enumerate(self.values):
+            if value >= 0:
+                yield (config.CHAN_DISPLAY if slot < 16 else self.SLOT_CHANNELS[slot]), value
+
+    def reset(self):
+        """Forgets every value (e.g. after the display was cleared)."""
+        for i in range(len(self.values)):
+            self.values[i] = -1
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+# Segment indices of the Verb and Noun digits, which flash together.
+VN_INDEX = tuple(config.DIGIT_INDEX[d] for d in ('V1', 'V2', 'N1', 'N2'))
+
+
+class Flasher:
+    """
+    Composites the DSKY flash phase into segment writes. It sits between
+    the display decoder and the hardware: it remembers the logical font
+    byte of every flashing digit, and while flashing is on it writes
+    blanks in the dark half of each phase. The owner calls toggle() from
+    one periodic timer, so V/N and any flashing lamps stay in step.
+    """
+
+    def __init__(self, write_segment, indices=VN_INDEX, blank=FONT[' ']):
+        self._write = write_segment
+        self.values = dict.fromkeys(indices, blank)  # index -> logical font byte
+        self.blank = blank
+        self.flashing = False
+        self.lit = True  # Current flash phase
+
+    def write_segment(self, index, font_byte):
+        """Same signature as the hardware write, so it can stand in for it."""
+        if index in self.values:
+            self.values[index] = font_byte
+            if self.flashing and not self.lit:
+                return
+        self._write(index, font_byte)
+
+    def set_flashing(self, flashing):
+        if flashing != self.flashing:
+            self.flashing = flashing
+            self._refresh()
+
+    def reset(self):
+        """Forgets every digit and stops flashing, e.g. after the display was cleared."""
+        self.values = dict.fromkeys(self.values, self.blank)
+        self.flashing = False
+        self.lit = True
+
+    def toggle(self):
+        """Advances the flash phase."""
+        self.lit = not self.lit
+        if self.flashing:
+            self._refresh()
+
+    def _refresh(self):
+        dark = self.flashing and not self.lit
+        for index, font_byte in self.values.items():
+            self._write(index, self.blank if dark else font_byte)
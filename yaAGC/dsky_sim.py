@@ -0,0 +1,212 @@
+# dsky_sim.py
+# Headless DSKY client simulator.
+#
+# Opens many concurrent DSKY connections to the echo mock (or hub.py in
+# front of it), types a scripted key sequence on each at a fixed rate, and
+# measures echo latency: the time from a keypad key going out to the channel
+# 010 word the echo server answers that very key with (see echo_word), so
+# other clients' echoes and load traffic are never counted. Keys are
+# encoded with the same Uplink/DSKY_KEYS frames AgcClient uses.
+#
+# Usage (against mock_agc_server.py --echo, with or without --rate/--noise):
+#   python3 dsky_sim.py --clients 20 --rate 5 --keys V16N36E --duration 30
+#   python3 dsky_sim.py --clients 50 --churn 2     (reconnect every 2 s)
+# The echo server counts keys per connection, so through hub.py (one
+# upstream connection for everybody) use --clients 1.
+# Against yaAGC itself: --any-change times each key to the next change of
+# any display row, which only means something for a single client on an
+# otherwise quiet display, so it requires --clients 1.
+import argparse
+import asyncio
+import time
+
+import config
+from display import ChannelCache
+from protocol import PacketFramer, Uplink, DSKY_CHANNELS
+
+# Script characters that are not DSKY_KEYS names.
+SCRIPT_ALIASES = {'E': '\n'}
+
+DIGIT_CODES = {digit: code for code, digit in config.DIGIT_CODE.items()}
+
+
+def echo_word(n):
+    """
+    The channel 010 word mock_agc_server.py --echo answers the n-th keypad
+    (channel 015) packet of a connection with: row 9, digits n and n // 10.
+    """
+    return (9 << 11) | (DIGIT_CODES[str(n % 10)] << 5) | DIGIT_CODES[str(n // 10 % 10)]
+
+
+def parse_keys(script):
+    """'V16N36E' -> ['V', '1', '6', 'N', '3', '6', '\n']"""
+    keys = []
+    for ch in script.upper():
+        key = SCRIPT_ALIASES.get(ch, ch)
+        if key not in config.DSKY_KEYS:
+            raise ValueError(f"unknown DSKY key {ch!r} in {script!r}")
+        keys.append(key)
+    return keys
+
+
+class Stats:
+    def __init__(self):
+        self.connects = 0
+        self.failures = 0   # Connection attempts refused or reset
+        self.sent = 0
+        self.lost = 0       # Timed keys with no echo within the timeout
+        self.latencies = []
+
+    def percentile(self, p):
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def report(self, elapsed):
+        print(f"[Sim] {elapsed:.1f} s: {self.connects} connects ({self.failures} failed), "
+              f"{self.sent} keys ({self.sent / elapsed:,.0f}/s), "
+              f"{len(self.latencies)} echoed, {self.lost} lost")
+        if self.latencies:
+            ms = [self.percentile(p) * 1000 for p in (50, 90, 99)]
+            print(f"[Sim] echo latency ms: p50 {ms[0]:.2f}  p90 {ms[1]:.2f}  "
+                  f"p99 {ms[2]:.2f}  max {max(self.latencies) * 1000:.2f}")
+
+
+class SimClient:
+    """One simulated DSKY: types keys and times the display's response."""
+
+    def __init__(self, host, port, keys, rate, timeout, stats, any_change=False):
+        self.host = host
+        self.port = port
+        self.keys = keys
+        self.period = 1.0 / rate
+        self.timeout = timeout
+        self.stats = stats
+        self.any_change = any_change
+        # Keys not yet echoed, oldest first: (expected channel 010 word, send
+        # time); the word is None with any_change
+        self.outstanding = []
+
+    async def session(self, lifetime):
+        """One connection: type keys until lifetime runs out (None = forever)."""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        self.stats.connects += 1
+        self.outstanding.clear()
+        listener = asyncio.create_task(self.listen(reader))
+        uplink = Uplink(config.DSKY_KEYS.values())
+        loop = asyncio.get_running_loop()
+        end = None if lifetime is None else loop.time() + lifetime
+        next_key = loop.time()
+        i = 0
+        keypad = 0  # Channel 015 keys sent on this connection
+        try:
+            while end is None or loop.time() < end:
+                if listener.done():
+                    break   # Server closed the connection
+                channel, value, mask = config.DSKY_KEYS[self.keys[i % len(self.keys)]]
+                uplink.queue(channel, value, mask)
+                i += 1
+                writer.write(bytes(uplink.pending))
+                uplink.pending.clear()
+                if self.any_change:
+                    self.outstanding.append((None, time.perf_counter()))
+                elif channel == 0o15:
+                    # Other keys (PRO) are not echoed, so they are not timed
+                    self.outstanding.append((echo_word(keypad), time.perf_counter()))
+                    keypad += 1
+                self.stats.sent += 1
+                self.expire()
+                next_key += self.period
+                await asyncio.sleep(max(0.0, next_key - loop.time()))
+                await writer.drain()
+        finally:
+            listener.cancel()
+            writer.close()
+            self.stats.lost += len(self.outstanding)
+            self.outstanding.clear()
+
+    def expire(self):
+        cutoff = time.perf_counter() - self.timeout
+        while self.outstanding and self.outstanding[0][1] < cutoff:
+            self.outstanding.pop(0)
+            self.stats.lost += 1
+
+    async def listen(self, reader):
+        framer = PacketFramer()
+        cache = ChannelCache()
+        while True:
+            data = await reader.read(len(framer.free_view()))
+            if not data:
+                return
+            framer.feed(data)
+            for channel, value in framer.packets(DSKY_CHANNELS):
+                if channel != config.CHAN_DISPLAY or not self.outstanding:
+                    continue
+                if self.any_change:
+                    if cache.update(channel, value):
+                        self.stats.latencies.append(time.perf_counter() - self.outstanding.pop(0)[1])
+                    continue
+                for i, (expected, sent) in enumerate(self.outstanding):
+                    if value == expected:
+                        # Keys before it were never echoed: the echo server answers in order
+                        self.stats.lost += i
+                        del self.outstanding[:i + 1]
+                        self.stats.latencies.append(time.perf_counter() - sent)
+                        break
+
+    async def run(self, churn):
+        while True:
+            try:
+                await self.session(churn)
+            except OSError:
+                self.stats.failures += 1
+                await asyncio.sleep(0.5)
+
+
+async def simulate(args):
+    stats = Stats()
+    keys = parse_keys(args.keys)
+    clients = [SimClient(args.host, args.port, keys, args.rate, args.timeout, stats, args.any_change)
+               for _ in range(args.clients)]
+    print(f"[Sim] {args.clients} clients -> {args.host}:{args.port}, "
+          f"{args.rate} keys/s each, script {args.keys!r}")
+    tasks = [asyncio.create_task(c.run(args.churn)) for c in clients]
+    start = time.monotonic()
+    try:
+        while time.monotonic() - start < args.duration:
+            await asyncio.sleep(min(1.0, args.duration))
+            stats.report(time.monotonic() - start)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    print("[Sim] Final:")
+    stats.report(time.monotonic() - start)
+
+
+def main():
+    cli = argparse.ArgumentParser(description="Headless DSKY client simulator.")
+    cli.add_argument("--host", default=config.AGC_HOST, help="yaAGC / hub host.")
+    cli.add_argument("--port", type=int, default=config.AGC_PORT, help="yaAGC / hub port.")
+    cli.add_argument("--clients", type=int, default=10, help="Concurrent connections.")
+    cli.add_argument("--rate", type=float, default=2.0, help="Keys per second per client.")
+    cli.add_argument("--keys", default="V16N36E", help="Key script, repeated (E = ENTR).")
+    cli.add_argument("--duration", type=float, default=10.0, help="Seconds to run.")
+    cli.add_argument("--churn", type=float, help="Reconnect each client after this many seconds.")
+    cli.add_argument("--timeout", type=float, default=1.0,
+                     help="Seconds to wait for a key's echo before it counts as lost.")
+    cli.add_argument("--any-change", action="store_true",
+                     help="Time keys to any display change (e.g. real yaAGC); needs --clients 1.")
+    args = cli.parse_args()
+    if args.any_change and args.clients != 1:
+        cli.error("--any-change only measures anything with --clients 1")
+    try:
+        parse_keys(args.keys)
+    except ValueError as e:
+        cli.error(str(e))
+    try:
+        asyncio.run(simulate(args))
+    except KeyboardInterrupt:
+        print("\n[Sim] Exiting...")
+
+if __name__ == "__main__":
+    main()
@@ -42,6 +42,12 @@ class TMBoards(TM1638s):
         self._switches = Switches(self)
 
 
+    def clearDisplay(self, TMindex=None):
+        """Turn off every led, and forget the cached 7-segment values"""
+        super().clearDisplay(TMindex)
+        if hasattr(self, "_segments"):
+            self._segments.forget(TMindex)
+
     @property
     def nbBoards(self):
         """Returns the number of TM1638 boards chained"""
@@ -171,6 +177,21 @@ class Segments:
             # send the data to the TM
             self._TM.sendData((i % 8) * 2, self._intern[i], i // 8)
 
+    def forget(self, TMindex=None):
+        """Reset the cached values (after the TM RAM was cleared behind our back)"""
+        first, last = (0, len(self._intern)) if TMindex is None else (TMindex * 8, TMindex * 8 + 8)
+        for i in range(first, last):
+            self._intern[i] = 0
+
+    def write_raw(self, index, val):
+        """
+        Set the i-th 7-segment display to a raw 8-bit font value
+        (as found in FONT), without parsing a string first
+        """
+        if self._intern[index] != val:
+            self._intern[index] = val
+            self._TM.sendData((index % 8) * 2, val, index // 8)
+
 
 class Switches:
     """Class to manipulate the switches on the chained TM Boards"""
@@ -1,35 +1,24 @@
 # hardware/interface.py
-import time
 import config
 # Import the raw driver you placed in the hardware folder
 from .TMBoards import TMBoards 
 
 class DskyHardware:
-    def __init__(self):
+    def __init__(self, wheel):
         # Initialize with pins from config
         self.tm = TMBoards(config.DIO, config.CLK, config.STB_LIST, 3)
         self.tm.clearDisplay()
         
         # State tracking for edge detection (Key press vs Hold)
         self.last_key_state = [0, 0, 0, 0]
-        self.pressed_pro = False
-        self.time_pro = 0
+        # PRO auto-release is a one-shot timer on the caller's wheel; when it
+        # fires, 'PR' goes straight out through send_key (set by the owner).
+        self.wheel = wheel
+        self.pro_timer = None
+        self.send_key = None
 
         # Mapping DSKY logical names to TM1638 Segment Indices
-        # Derived from piDSKY4.py outputFromAGC
-        self.digit_map = {
-            'V1': 14, 'V2': 15,
-            'N1': 6,  'N2': 7,
-            'M1': 22, 'M2': 23,
-            '11': 17, # Row 1
-            '12': 18, '13': 19, 'S1': 16, # Row 1 (S1 is Sign 1)
-            '14': 20, '15': 21,
-            '21': 9,  '22': 10, 'S2': 8,  # Row 2
-            '23': 11, '24': 12,
-            '25': 13, '31': 1,          # Note the jump to index 1!
-            '32': 2,  '33': 3,  'S3': 0,  # Row 3
-            '34': 4,  '35': 5
-        }
+        self.digit_map = config.DIGIT_INDEX
 
     def clear_all(self):
         self.tm.clearDisplay()
@@ -50,10 +39,11 @@ class DskyHardware:
             return None # No change
             
         if current_keys == [0, 0, 0, 0]:
-            # Key Release Detected
+            # Key Release Detected. DSKY keys are edge triggered, so
+            # there is nothing to send ('K' is the KEY REL key itself).
             self.last_key_state = [0, 0, 0, 0]
             print("[HW] Key Released")
-            return 'K' # Special code for Key Release
+            return None
         
         # If we are here, a NEW key was pressed
         self.last_key_state = current_keys
@@ -68,17 +58,20 @@ class DskyHardware:
 
             # PRO Special Handling (fake press/release logic from original)
             if char_to_send in ['P', 'p']:
-                self.pressed_pro = True
-                self.time_pro = time.time()
+                if self.pro_timer:
+                    self.pro_timer.cancel()
+                self.pro_timer = self.wheel.call_later(config.PRO_RELEASE_DELAY, self._release_pro)
         
         return char_to_send
 
-    def check_pro_release(self):
-        """Handles the automatic release of the PRO key after 0.75s"""
-        if self.pressed_pro and (time.time() > self.time_pro + 0.75):
-            self.pressed_pro = False
-            return 'PR' # The code for PRO Release
-        return None
+    def _release_pro(self):
+        self.pro_timer = None
+        if self.send_key:
+            self.send_key('PR') # The code for PRO Release
+
+    def write_segment(self, index, font_byte):
+        """Writes a raw font byte to a segment index (unchanged bytes are skipped)."""
+        self.tm.segments.write_raw(index, font_byte)
 
     def set_digit(self, position, value_code):
         """
@@ -0,0 +1,214 @@
+# hardware/tm1638_sim.py
+# Software TM1638 boards behind a stand-in for the gpiod v2 API.
+#
+# install() puts a fake `gpiod` / `gpiod.line` into sys.modules, so the
+# unmodified TM1638s/TMBoards driver bit-bangs into a TM1638Bus instead of
+# real GPIO lines. The bus decodes the serial protocol the way the chip
+# does: while a board's STB is low, bytes are clocked in LSB first on the
+# rising edge of CLK; bytes are commands until an address command, and
+# data bytes after an address command land in that board's 16-byte display
+# RAM. After the 0x42 read command the board shifts its four key bytes out
+# on DIO, one bit per falling edge of CLK.
+#
+# Used by latency.py; nothing here touches real hardware.
+import collections
+import enum
+import sys
+import time
+import types
+
+
+# --- gpiod v2 stand-in (only what TM1638s uses) ---
+class Direction(enum.Enum):
+    AS_IS = 1
+    INPUT = 2
+    OUTPUT = 3
+
+class Value(enum.Enum):
+    INACTIVE = 0
+    ACTIVE = 1
+
+class Bias(enum.Enum):
+    AS_IS = 1
+    UNKNOWN = 2
+    DISABLED = 3
+    PULL_UP = 4
+    PULL_DOWN = 5
+
+class Edge(enum.Enum):
+    NONE = 1
+    RISING = 2
+    FALLING = 3
+    BOTH = 4
+
+
+class LineSettings:
+    def __init__(self, direction=Direction.AS_IS, output_value=Value.INACTIVE,
+                 bias=Bias.AS_IS, **kwargs):
+        self.direction = direction
+        self.output_value = output_value
+        self.bias = bias
+
+
+class LineRequest:
+    """What gpiod.request_lines() returns: drives the bus instead of a chip."""
+
+    def __init__(self, bus, config):
+        self.bus = bus
+        self.reconfigure_lines(config)
+
+    def reconfigure_lines(self, config):
+        for pin, settings in config.items():
+            if settings.direction == Direction.OUTPUT:
+                self.bus.set_line(pin, settings.output_value == Value.ACTIVE)
+            if pin == self.bus.dio:
+                self.bus.dio_driven = settings.direction != Direction.INPUT
+
+    def set_value(self, pin, value):
+        self.bus.set_line(pin, value == Value.ACTIVE)
+
+    def get_value(self, pin):
+        return Value.ACTIVE if self.bus.get_line(pin) else Value.INACTIVE
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+# --- The chips ---
+class Board:
+    """One TM1638: display RAM, key matrix and the serial state machine."""
+
+    def __init__(self):
+        self.ram = bytearray(16)
+        self.addr = 0
+        self.fixed = False    # Address mode of the last data command
+        self.keys = (0, 0, 0, 0)  # What a key scan reads back
+        self.display_on = False
+        self.brightness = 0
+        self.selected = False
+        self._reset()
+
+    def _reset(self):
+        self.shift = 0
+        self.nbits = 0
+        self.data = False     # Bytes after an address command are data; others are commands
+        self.read_mode = False
+        self.reading = []     # Key bits still to shift out
+        self.out = 1          # Bit the board is driving onto DIO
+
+    def select(self, selected):
+        if selected and not self.selected:
+            self._reset()
+        self.selected = selected
+
+
+class TM1638Bus:
+    """
+    The boards chained on one DIO/CLK pair, one STB line each. on_write is
+    called as on_write(board, addr, byte) the moment a display RAM byte is
+    written; the write also goes into the `writes` deque with a timestamp.
+    """
+
+    def __init__(self, dio, clk, stb, clock=time.perf_counter, on_write=None):
+        self.dio = dio
+        self.clk = clk
+        self.stb = tuple(stb)
+        self.boards = [Board() for _ in self.stb]
+        self.levels = collections.defaultdict(int)
+        self.dio_driven = True
+        self.clock = clock
+        self.on_write = on_write
+        self.writes = collections.deque()  # (time, board, addr, byte)
+
+    def request_lines(self, path, consumer=None, config=None):
+        return LineRequest(self, config or {})
+
+    # --- Keypad ---
+    def press(self, board, keys):
+        """Holds keys (the 4 raw key bytes) down on a board."""
+        self.boards[board].keys = tuple(keys)
+
+    def release(self, board):
+        self.boards[board].keys = (0, 0, 0, 0)
+
+    # --- Line levels ---
+    def get_line(self, pin):
+        if pin == self.dio and not self.dio_driven:
+            for board in self.boards:
+                if board.selected and board.read_mode:
+                    return board.out
+            return 1  # Pull-up
+        return self.levels[pin]
+
+    def set_line(self, pin, level):
+        level = int(level)
+        previous = self.levels[pin]
+        self.levels[pin] = level
+        if pin in self.stb:
+            self.boards[self.stb.index(pin)].select(not level)
+        elif pin == self.clk and level != previous:
+            for i, board in enumerate(self.boards):
+                if not board.selected:
+                    continue
+                if level:
+                    self._clock_in(i, board)
+                elif board.reading:
+                    board.out = board.reading.pop(0)  # Falling edge: next key bit
+
+    def _clock_in(self, index, board):
+        if board.read_mode or not self.dio_driven:
+            return
+        board.shift |= self.levels[self.dio] << board.nbits
+        board.nbits += 1
+        if board.nbits == 8:
+            byte = board.shift
+            board.shift = 0
+            board.nbits = 0
+            self._byte(index, board, byte)
+
+    def _byte(self, index, board, byte):
+        if not board.data:
+            kind = byte & 0xC0
+            if kind == 0x40:      # Data command
+                board.fixed = bool(byte & 0x04)
+                if byte & 0x02:   # Read keys: LSB of each byte first
+                    board.read_mode = True
+                    board.reading = [(b >> n) & 1 for b in board.keys for n in range(8)]
+            elif kind == 0x80:    # Display control
+                board.display_on = bool(byte & 0x08)
+                board.brightness = byte & 0x07
+            elif kind == 0xC0:    # Address, then data
+                board.addr = byte & 0x0F
+                board.data = True
+            return
+        board.ram[board.addr] = byte
+        self.writes.append((self.clock(), index, board.addr, byte))
+        if self.on_write:
+            self.on_write(index, board.addr, byte)
+        if not board.fixed:
+            board.addr = (board.addr + 1) & 0x0F
+
+    def digits(self, board):
+        """Segment bytes of a board's 8 digits (even RAM addresses)."""
+        return bytes(self.boards[board].ram[0::2])
+
+
+def install(bus):
+    """Makes `import gpiod` / `from gpiod.line import ...` resolve to bus."""
+    line = types.ModuleType("gpiod.line")
+    line.Direction = Direction
+    line.Value = Value
+    line.Bias = Bias
+    line.Edge = Edge
+    gpiod = types.ModuleType("gpiod")
+    gpiod.line = line
+    gpiod.LineSettings = LineSettings
+    gpiod.request_lines = bus.request_lines
+    sys.modules["gpiod"] = gpiod
+    sys.modules["gpiod.line"] = line
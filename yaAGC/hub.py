@@ -0,0 +1,214 @@
+# hub.py
+# DSKY multiplexing hub.
+#
+# Several consoles (the piDSKY4 panel, main.py, a terminal mirror, test
+# harnesses) can share one yaAGC. The hub holds the single upstream
+# connection to yaAGC and speaks the same socket protocol to any number of
+# downstream DSKY clients:
+#   * channel 010/011/013/163 packets are fanned out to every client (only
+#     words that change what a row/channel shows are forwarded),
+#   * key input from all clients is merged into one uplink, with a
+#     per-client token bucket so one stuck key can't flood the AGC,
+#   * a client that joins late gets the current display replayed from the
+#     hub's channel cache straight away,
+#   * when yaAGC goes away every client's display is blanked and the cache
+#     emptied, so nothing from the old session is replayed or suppressed.
+# Everything runs on one asyncio loop; there are no per-client threads.
+#
+# Usage: python3 hub.py [--port 19898] [--upstream-host localhost] [--upstream-port 19798]
+#        then point the DSKY clients at the hub port, e.g. piDSKY4.py --port 19898
+import argparse
+import asyncio
+import time
+
+import config
+from display import ChannelCache
+from protocol import PacketFramer, Uplink, DSKY_CHANNELS, decode_word, encode_packet
+
+
+class TokenBucket:
+    """Allows rate events per second on average, with bursts up to burst."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class HubClient:
+    """One downstream DSKY connection."""
+
+    def __init__(self, hub, reader, writer):
+        self.hub = hub
+        self.reader = reader
+        self.writer = writer
+        self.name = "%s:%s" % writer.get_extra_info('peername')[:2]
+        self.framer = PacketFramer()
+        self.masks = {}   # channel -> last mask packet from this client
+        self.bucket = TokenBucket(hub.key_rate, hub.key_burst)
+        self.dropped = 0  # Key packets refused by the rate limit
+
+    def send(self, data):
+        """Queues data for the client; drops it if it stopped reading."""
+        if self.writer.is_closing():
+            return
+        if self.writer.transport.get_write_buffer_size() > self.hub.max_backlog:
+            print(f"[Hub] {self.name} is not reading, dropping it")
+            self.writer.close()
+            return
+        self.writer.write(data)
+
+    async def run(self):
+        while True:
+            data = await self.reader.read(len(self.framer.free_view()))
+            if not data:
+                return
+            self.framer.feed(data)
+            for word in self.framer.words():
+                channel, value, is_mask = decode_word(word)
+                if is_mask:
+                    self.masks[channel] = value
+                elif self.bucket.take():
+                    self.hub.uplink_input(channel, value, self.masks.get(channel, 0o77777))
+                else:
+                    self.dropped += 1
+
+
+class DskyHub:
+    def __init__(self, upstream_host, upstream_port, key_rate, key_burst, max_backlog):
+        self.upstream = (upstream_host, upstream_port)
+        self.key_rate = key_rate
+        self.key_burst = key_burst
+        self.max_backlog = max_backlog
+        self.clients = set()
+        self.cache = ChannelCache()
+        self.framer = PacketFramer()
+        self.uplink = Uplink(config.DSKY_KEYS.values())
+        self.writer = None                # Upstream, None while disconnected
+        self._flush_scheduled = False
+
+    # --- Downstream ---
+    async def serve_client(self, reader, writer):
+        client = HubClient(self, reader, writer)
+        self.clients.add(client)
+        print(f"[Hub] {client.name} joined ({len(self.clients)} clients)")
+        # Late joiner: replay the current display at once
+        replay = b''.join(encode_packet(ch, val) for ch, val in self.cache.items())
+        if replay:
+            client.send(replay)
+        try:
+            await client.run()
+        except ConnectionError:
+            pass  # Reset by the client
+        finally:
+            self.clients.discard(client)
+            writer.close()
+            note = f", {client.dropped} keys rate limited" if client.dropped else ""
+            print(f"[Hub] {client.name} left ({len(self.clients)} clients{note})")
+
+    def broadcast(self, data):
+        for client in list(self.clients):
+            client.send(data)
+
+    def blank(self):
+        """Blanks every row/channel clients were shown and forgets the cache."""
+        # A channel 010 word with only its row bits set blanks that row
+        # (row 12: every lamp off); the other channels go to 0.
+        data = b''.join(encode_packet(ch, val & 0o74000 if ch == config.CHAN_DISPLAY else 0)
+                        for ch, val in self.cache.items())
+        self.cache.reset()
+        if data:
+            self.broadcast(data)
+
+    # --- Upstream ---
+    def uplink_input(self, channel, value, mask):
+        """Queues one client input; everything queued in a loop pass shares one write."""
+        if self.writer is None:
+            return
+        self.uplink.queue(channel, value, mask)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+
+    def _flush(self):
+        self._flush_scheduled = False
+        if self.writer is None or self.writer.is_closing():
+            self.uplink.reset()
+            return
+        self.writer.write(bytes(self.uplink.pending))
+        self.uplink.pending.clear()
+
+    async def run_upstream(self):
+        """Holds the yaAGC connection, reconnecting whenever it drops."""
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(*self.upstream)
+            except OSError:
+                print("[Hub] Could not connect to yaAGC %s:%s, retrying..." % self.upstream)
+                await asyncio.sleep(2)
+                continue
+
+            print("[Hub] Connected to yaAGC %s:%s" % self.upstream)
+            self.writer = writer
+            self.framer.reset()
+            self.uplink.reset()
+            try:
+                while True:
+                    data = await reader.read(len(self.framer.free_view()))
+                    if not data:
+                        break
+                    self.framer.feed(data)
+                    # Forward only words that change a row/channel
+                    out = bytearray()
+                    for channel, value in self.framer.packets(DSKY_CHANNELS):
+                        if self.cache.update(channel, value):
+                            out += encode_packet(channel, value)
+                    if out:
+                        self.broadcast(bytes(out))
+            except ConnectionError:
+                pass
+            finally:
+                self.writer = None
+                writer.close()
+                self.blank()
+            print("[Hub] yaAGC disconnected")
+            await asyncio.sleep(2)
+
+    async def run(self, host, port):
+        server = await asyncio.start_server(self.serve_client, host, port)
+        print(f"[Hub] Serving DSKY clients on {host}:{port}")
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.run_upstream())
+
+
+def main():
+    cli = argparse.ArgumentParser(description="DSKY multiplexing hub for yaAGC.")
+    cli.add_argument("--host", default=config.HUB_HOST, help="Address to serve DSKY clients on.")
+    cli.add_argument("--port", type=int, default=config.HUB_PORT, help="Port to serve DSKY clients on.")
+    cli.add_argument("--upstream-host", default=config.AGC_HOST, help="yaAGC host.")
+    cli.add_argument("--upstream-port", type=int, default=config.AGC_PORT, help="yaAGC port.")
+    cli.add_argument("--key-rate", type=float, default=config.HUB_KEY_RATE,
+                     help="Key packets per second allowed per client.")
+    cli.add_argument("--key-burst", type=int, default=config.HUB_KEY_BURST,
+                     help="Burst size for the per-client key limit.")
+    args = cli.parse_args()
+
+    hub = DskyHub(args.upstream_host, args.upstream_port,
+                  args.key_rate, args.key_burst, config.HUB_MAX_BACKLOG)
+    try:
+        asyncio.run(hub.run(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n[Hub] Exiting...")
+
+if __name__ == "__main__":
+    main()
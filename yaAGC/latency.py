@@ -0,0 +1,278 @@
+# latency.py
+# End-to-end latency harness: packet to pixel, and key press to socket.
+#
+# Runs a DSKY driver in this process against software TM1638 boards
+# (hardware/tm1638_sim.py) and plays its yaAGC:
+#   * downlink: channel 010 words are sent at --rate per second, each one
+#     timestamped just before sendall(). Its sample ends when the last
+#     segment byte it changes lands in the simulated display RAM.
+#   * uplink: digit keys are held down on the simulated keypad at
+#     --key-rate per second. A sample ends when the key's channel 015
+#     packet arrives on the socket, and the key is then released.
+# Both directions are reported as latency histograms. The bit-bang delays
+# in TM1638s are real sleeps, so the figures include the serial transfer.
+#
+# Drivers: main (main.py), asyncio (main.py --asyncio) and pidsky4
+# (../piDSKY4.py, with hardware/TMBoards standing in for RPi5_TM1638).
+#
+# Usage:
+#   python3 latency.py [--driver asyncio] [--duration 20] [--rate 20] [--key-rate 4]
+import argparse
+import collections
+import os
+import runpy
+import select
+import socket
+import sys
+import threading
+import time
+
+import config
+from display import build_display_table
+from hardware import tm1638_sim
+from protocol import PacketFramer, decode_word, encode_packet
+
+DRIVERS = ('main', 'asyncio', 'pidsky4')
+PIDSKY4 = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "piDSKY4.py")
+
+WARMUP = 2.0         # piDSKY4 ignores the keypad for its first 1.5 s
+KEY_TIMEOUT = 1.0    # A key not seen on the socket by then is lost
+RELEASE_HOLD = 0.15  # Released long enough for any driver's scan to see it
+BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Channel 010 rows with two digits and no sign bit (PROG, VERB, NOUN, R2/R3).
+ROWS = (11, 10, 9, 3)
+DIGIT_CODES = [code for code, char in sorted(config.DIGIT_CODE.items(), key=lambda kv: kv[1]) if char != ' ']
+KEYS = "0123456789"
+KEY_PRESS = {config.KEY_MAP[key_id]: raw for raw, key_id in config.KEY_BYTES.items()}
+
+
+class Histogram:
+    def __init__(self, name):
+        self.name = name
+        self.samples = []
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, p):
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def report(self, notes=""):
+        print(f"[Latency] {self.name}: {len(self.samples)} samples{notes}")
+        if not self.samples:
+            return
+        ms = [self.percentile(p) * 1000 for p in (50, 90, 99)]
+        print(f"[Latency]   p50 {ms[0]:.2f}  p90 {ms[1]:.2f}  p99 {ms[2]:.2f}  "
+              f"max {max(self.samples) * 1000:.2f} ms")
+        counts = [0] * (len(BUCKETS_MS) + 1)
+        for sample in self.samples:
+            ms = sample * 1000
+            i = 0
+            while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+                i += 1
+            counts[i] += 1
+        scale = 40 / max(counts)
+        lower = 0
+        for i, count in enumerate(counts):
+            label = f"{lower:g}-{BUCKETS_MS[i]:g}" if i < len(BUCKETS_MS) else f">{lower:g}"
+            if count:
+                print(f"[Latency]   {label:>10} ms {count:6d} {'#' * max(1, round(count * scale))}")
+            if i < len(BUCKETS_MS):
+                lower = BUCKETS_MS[i]
+
+
+class DisplayTimer:
+    """Channel 010 words in flight, matched against display RAM writes."""
+
+    def __init__(self):
+        self.table = build_display_table()
+        self.hist = Histogram("packet -> display RAM")
+        self.digit = dict.fromkeys(ROWS, 0)
+        self.count = 0
+        self.pending = collections.defaultdict(collections.deque)  # (board, addr) -> [[sample, byte]]
+        self.superseded = 0
+
+    def next_packet(self):
+        """Next word: rows in turn, each row's digits counting up so every write changes."""
+        row = ROWS[self.count % len(ROWS)]
+        self.count += 1
+        self.digit[row] = (self.digit[row] + 1) % len(DIGIT_CODES)
+        code = DIGIT_CODES[self.digit[row]]
+        return (row << 11) | (code << 5) | code
+
+    def sent(self, value, stamp):
+        writes = self.table[value][0]
+        sample = [stamp, len(writes), False]  # sent, writes left, superseded
+        for index, font_byte in writes:
+            self.pending[(index // 8, (index % 8) * 2)].append((sample, font_byte))
+
+    def landed(self, stamp, board, addr, font_byte):
+        queue = self.pending.get((board, addr))
+        if not queue or all(byte != font_byte for _, byte in queue):
+            return  # Not one of ours (clears, signs, lamps)
+        while True:
+            sample, byte = queue.popleft()
+            if byte == font_byte:
+                break
+            # The driver coalesced this write into a later one: never shown
+            if not sample[2]:
+                sample[2] = True
+                self.superseded += 1
+        sample[1] -= 1
+        if sample[1] == 0 and not sample[2]:
+            self.hist.add(stamp - sample[0])
+
+    def unseen(self):
+        samples = {id(sample): sample for queue in self.pending.values()
+                   for sample, _ in queue if not sample[2]}
+        return len(samples)
+
+
+class KeyTimer:
+    """One simulated key press at a time, timed until it reaches the socket."""
+
+    def __init__(self, bus, rate):
+        self.bus = bus
+        self.period = 1.0 / rate
+        self.hist = Histogram("key press -> socket")
+        self.count = 0
+        self.key = None        # (char, press time) while a key is held
+        self.next_press = 0.0
+        self.lost = 0
+
+    def poll(self, now):
+        if self.key is None:
+            if now >= self.next_press:
+                char = KEYS[self.count % len(KEYS)]
+                self.count += 1
+                self.bus.press(0, KEY_PRESS[char])
+                self.key = (char, time.perf_counter())
+        elif now - self.key[1] > KEY_TIMEOUT:
+            self.lost += 1
+            self.release(now)
+
+    def received(self, stamp, channel, value):
+        if self.key is None or (channel, value) != config.DSKY_KEYS[self.key[0]][:2]:
+            return
+        self.hist.add(stamp - self.key[1])
+        self.release(stamp)
+
+    def release(self, now):
+        self.bus.release(0)
+        self.next_press = max(now + RELEASE_HOLD, self.key[1] + self.period)
+        self.key = None
+
+
+def start_driver(driver, port, verbose):
+    """Runs the chosen driver on a daemon thread, talking to localhost:port."""
+    if driver == 'pidsky4':
+        # piDSKY4 imports the upstream RPi5_TM1638 package; the in-tree
+        # port has the same TMBoards class.
+        import hardware.TMBoards
+        sys.modules['RPi5_TM1638'] = hardware.TMBoards
+        sys.argv = [PIDSKY4, '--port', str(port)] + ([] if verbose else ['--quiet'])
+        sys.stdin = open(os.devnull)  # Keep piDSKY4 off our terminal
+        target = lambda: runpy.run_path(PIDSKY4, run_name='__main__')
+    else:
+        import main
+        config.AGC_PORT = port
+        sys.argv = ['main.py'] + (['--asyncio'] if driver == 'asyncio' else [])
+        target = main.main
+    thread = threading.Thread(target=target, name=driver, daemon=True)
+    thread.start()
+    return thread
+
+
+def measure(args):
+    bus = tm1638_sim.TM1638Bus(config.DIO, config.CLK, config.STB_LIST)
+    tm1638_sim.install(bus)
+
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    srv.bind(('localhost', args.port))
+    srv.listen(1)
+    srv.settimeout(10)
+    print(f"[Latency] {args.driver} driver, {args.rate} words/s and {args.key_rate} keys/s "
+          f"for {args.duration} s")
+    sys.stdout.flush()
+
+    stdout = sys.stdout
+    if not args.verbose:
+        sys.stdout = open(os.devnull, 'w')  # The drivers log every key and packet
+    start_driver(args.driver, args.port, args.verbose)
+    try:
+        conn, _ = srv.accept()
+    except socket.timeout:
+        sys.stdout = stdout
+        sys.exit(f"[Latency] {args.driver} driver did not connect")
+    conn.setblocking(False)
+    framer = PacketFramer()
+    down = DisplayTimer()
+    up = KeyTimer(bus, args.key_rate)
+
+    start = time.perf_counter()
+    measuring = start + WARMUP
+    end = measuring + args.duration
+    next_send = measuring
+    up.next_press = measuring
+    try:
+        while True:
+            now = time.perf_counter()
+            if now >= end:
+                break
+            if now >= measuring:
+                if args.rate and now >= next_send:
+                    value = down.next_packet()
+                    stamp = time.perf_counter()
+                    conn.sendall(encode_packet(config.CHAN_DISPLAY, value))
+                    down.sent(value, stamp)
+                    next_send += 1.0 / args.rate
+                    if next_send < now:
+                        next_send = now  # Don't try to catch up after a stall
+                if args.key_rate:
+                    up.poll(now)
+
+            wait = 0.002 if up.key else 0.01
+            if args.rate and now >= measuring:
+                wait = min(wait, max(0.0, next_send - time.perf_counter()))
+            readable, _, _ = select.select([conn], [], [], wait)
+            if readable:
+                data = conn.recv(len(framer.free_view()))
+                stamp = time.perf_counter()
+                if not data:
+                    break
+                framer.feed(data)
+                for word in framer.words():
+                    channel, value, is_mask = decode_word(word)
+                    if not is_mask:
+                        up.received(stamp, channel, value)
+
+            while bus.writes:
+                down.landed(*bus.writes.popleft())
+    finally:
+        sys.stdout = stdout
+
+    if args.rate:
+        down.hist.report(f" ({down.superseded} coalesced, {down.unseen()} not displayed)")
+    if args.key_rate:
+        up.hist.report(f" ({up.lost} lost)")
+    sys.stdout.flush()
+    conn.close()
+    srv.close()
+
+
+def main():
+    cli = argparse.ArgumentParser(description="Packet-to-pixel and key-to-socket latency of a DSKY driver.")
+    cli.add_argument("--driver", choices=DRIVERS, default='main', help="Driver to measure (default main).")
+    cli.add_argument("--duration", type=float, default=20.0, help="Seconds to measure, after a warm-up.")
+    cli.add_argument("--rate", type=float, default=20.0, help="Channel 010 words per second (0 = none).")
+    cli.add_argument("--key-rate", type=float, default=4.0, help="Key presses per second (0 = none).")
+    cli.add_argument("--port", type=int, default=19799, help="Port for the harness's mock yaAGC.")
+    cli.add_argument("--verbose", action="store_true", help="Show the driver's own logging.")
+    args = cli.parse_args()
+    measure(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,34 @@
 # dsky_main.py
+import argparse
+import asyncio
+import atexit
 import time
 import sys
 import config
 from agc import AgcClient
 from hardware.interface import DskyHardware
+from aio import AsyncAgcClient, AsyncDskyHardware
+from display import build_display_table, ChannelCache, Flasher, SIGN_INDEX, SIGN_FONT
+from timerwheel import TimerWheel
+from agclog import LogWriter
 
 def main():
+    cli = argparse.ArgumentParser()
+    cli.add_argument("--asyncio", action="store_true",
+                     help="Use the asyncio runtime instead of the 50 ms poll loop.")
+    cli.add_argument("--record", metavar="FILE",
+                     help="Append all channel traffic and key presses to an AGC log (see agclog.py).")
+    args = cli.parse_args()
+
     print("--- PiDSKY Phase 3 Driver ---")
     
+    # Every timed behaviour (keypad scan, flash phase, PRO release) runs
+    # from this one wheel on the main thread.
+    wheel = TimerWheel()
+
     # 1. Initialize Hardware
     try:
-        dsky = DskyHardware()
+        dsky = DskyHardware(wheel)
         print("[Main] Hardware Initialized")
     except Exception as e:
         print(f"[Error] Hardware init failed: {e}")
@@ -18,6 +36,12 @@ def main():
 
     # 2. Initialize Network
     agc = AgcClient()
+    dsky.send_key = lambda key: agc.send_key(key, flush=False) # PRO release
+    if args.record:
+        recorder = LogWriter(args.record)
+        agc.record_to(recorder)
+        atexit.register(recorder.close)
+        print(f"[Main] Recording to {args.record}")
     
     # 3. Connect Loop
     while not agc.connected:
@@ -27,92 +51,111 @@ def main():
         time.sleep(2)
 
     dsky.clear_all()
+    cache = ChannelCache() # Per-row/per-channel last values
     print("[Main] System Ready. Starting Event Loop.")
 
+    if args.asyncio:
+        try:
+            asyncio.run(run_async(dsky, agc, cache, wheel))
+            print("[Main] yaAGC disconnected.")
+        except KeyboardInterrupt:
+            print("\n[Main] Exiting...")
+        print(f"[Main] Channel cache hit rate: {cache.hit_rate:.1%} ({cache.hits} hits, {cache.misses} misses)")
+        dsky.clear_all()
+        sys.exit(0)
+
+    # Display writes go through the flasher so V/N flash is composited in.
+    flasher = Flasher(dsky.write_segment)
+    wheel.call_every(config.FLASH_PERIOD, flasher.toggle)
+
+    # Check for physical key press
+    def scan_keypad():
+        key = dsky.get_key_event()
+        if key:
+            agc.send_key(key, flush=False)
+    wheel.call_every(config.POLL_PERIOD, scan_keypad)
+
     # 4. Event Loop
     try:
         while True:
             # --- A. Handle Network Input (Downlink) ---
-            packets = agc.read() # Returns list of (channel, value)
+            packets = agc.read() # Yields (channel, value) pairs
             
             for channel, val in packets:
-                # Channel 010: Digits
-                if channel == config.CHAN_DISPLAY:
-                    handle_display(dsky, val)
-                
-                # Channel 011: Lamps (DSKY Status)
-                elif channel == config.CHAN_LAMPS:
-                    # handle_lamps(dsky, val) # To be implemented with Blinkin Lights
-                    pass
-                
-                # Channel 163: Flags (PROG, OPR ERR)
-                elif channel == config.CHAN_FLAGS:
-                    pass 
-
-            # --- B. Handle Keypad Input (Uplink) ---
-            # Check for physical key press
-            key = dsky.get_key_event()
-            if key:
-                agc.send_key(key)
-            
-            # Check for auto-PRO release
-            pro_release = dsky.check_pro_release()
-            if pro_release:
-                agc.send_key(pro_release)
+                # Skip packets that repeat what this row/channel already shows
+                if cache.update(channel, val):
+                    handle_packet(flasher, channel, val)
+
+            # --- B. Timers: keypad scan, flash phase, PRO release ---
+            wheel.run_due()
 
-            time.sleep(0.05) # Pulse delay
+            # Everything queued this iteration goes out in one write
+            agc.flush()
+
+            time.sleep(wheel.timeout(config.POLL_PERIOD)) # Until the next timer
 
     except KeyboardInterrupt:
         print("\n[Main] Exiting...")
+        print(f"[Main] Channel cache hit rate: {cache.hit_rate:.1%} ({cache.hits} hits, {cache.misses} misses)")
         dsky.clear_all()
         sys.exit(0)
 
+async def run_async(dsky, agc, cache, wheel):
+    """
+    asyncio runtime: packets are handled as soon as the socket is readable,
+    the keypad is scanned (and the timer wheel run) by a fixed-rate task and
+    display writes are flushed by their own task. Returns when yaAGC
+    disconnects.
+    """
+    hw = AsyncDskyHardware(dsky)
+    link = AsyncAgcClient(agc)
+    flasher = Flasher(hw.write_segment)
+    wheel.call_every(config.FLASH_PERIOD, flasher.toggle)
+
+    def on_packet(channel, val):
+        if cache.update(channel, val):
+            handle_packet(flasher, channel, val)
+
+    link.start(on_packet)
+    tasks = [
+        asyncio.create_task(hw.flush_task()),
+        asyncio.create_task(hw.keypad_task(link.send_key, config.KEYPAD_SCAN_PERIOD, wheel)),
+    ]
+    try:
+        await link.closed
+    finally:
+        for task in tasks:
+            task.cancel()
+
+# Built once at startup: channel 010 value -> segment writes + sign change.
+DISPLAY_TABLE = build_display_table()
+sign_state = [0, 0, 0] # R1, R2, R3: bit 1 = plus, bit 2 = minus
+
+def handle_packet(flasher, channel, val):
+    """Applies one changed output channel word to the DSKY."""
+    # Channel 010: Digits
+    if channel == config.CHAN_DISPLAY:
+        handle_display(flasher, val)
+
+    # Channel 011: Lamps (DSKY Status)
+    elif channel == config.CHAN_LAMPS:
+        # Only V/N flash so far; the lamps are to be implemented with Blinkin Lights
+        flasher.set_flashing(bool(val & 0x20))
+
+    # Channel 163: Flags (PROG, OPR ERR)
+    elif channel == config.CHAN_FLAGS:
+        pass
+
 def handle_display(dsky, value):
-    """Parses Channel 10 words into digits."""
-    # Extract fields (Logic from piDSKY4.py)
-    row_id = (value >> 11) & 0x0F
-    sign_bit = (value >> 10) & 0x01
-    char_left = (value >> 5) & 0x1F
-    char_right = value & 0x1F
-
-    if row_id == 11: # M1, M2
-        dsky.set_digit('M1', char_left)
-        dsky.set_digit('M2', char_right)
-    elif row_id == 10: # V1, V2
-        dsky.set_digit('V1', char_left)
-        dsky.set_digit('V2', char_right)
-    elif row_id == 9: # N1, N2
-        dsky.set_digit('N1', char_left)
-        dsky.set_digit('N2', char_right)
-    elif row_id == 8: # Digit 11
-        dsky.set_digit('11', char_right)
-    elif row_id == 7: # R1: 12, 13 + Sign
-        dsky.set_digit('12', char_left)
-        dsky.set_digit('13', char_right)
-        dsky.set_digit('S1', "+" if sign_bit else " ")
-    elif row_id == 6: # R1: 14, 15 - Sign
-        dsky.set_digit('14', char_left)
-        dsky.set_digit('15', char_right)
-        if sign_bit: dsky.set_digit('S1', "-")
-    elif row_id == 5: # R2: 21, 22 + Sign
-        dsky.set_digit('21', char_left)
-        dsky.set_digit('22', char_right)
-        dsky.set_digit('S2', "+" if sign_bit else " ")
-    elif row_id == 4: # R2: 23, 24 - Sign
-        dsky.set_digit('23', char_left)
-        dsky.set_digit('24', char_right)
-        if sign_bit: dsky.set_digit('S2', "-")
-    elif row_id == 3: # R2: 25, R3: 31
-        dsky.set_digit('25', char_left)
-        dsky.set_digit('31', char_right)
-    elif row_id == 2: # R3: 32, 33 + Sign
-        dsky.set_digit('32', char_left)
-        dsky.set_digit('33', char_right)
-        dsky.set_digit('S3', "+" if sign_bit else " ")
-    elif row_id == 1: # R3: 34, 35 - Sign
-        dsky.set_digit('34', char_left)
-        dsky.set_digit('35', char_right)
-        if sign_bit: dsky.set_digit('S3', "-")
+    """Applies a Channel 10 word to the digits via the display table."""
+    writes, sign = DISPLAY_TABLE[value]
+    for index, font_byte in writes:
+        dsky.write_segment(index, font_byte)
+    if sign:
+        register, set_bits, clear_bits = sign
+        state = (sign_state[register] & ~clear_bits) | set_bits
+        sign_state[register] = state
+        dsky.write_segment(SIGN_INDEX[register], SIGN_FONT[state])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
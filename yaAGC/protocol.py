@@ -0,0 +1,250 @@
+# protocol.py
+# yaAGC socket protocol helpers.
+#
+# yaAGC talks to peripherals in 4-byte packets. The top two bits of each
+# byte are a signature (00, 01, 10, 11) so a reader can find packet
+# boundaries again after garbage or a partial read:
+#
+#   byte 0: 00utpppp   u = mask packet, t = reserved, pppp = channel bits 6-3
+#   byte 1: 01pppddd   ppp = channel bits 2-0, ddd = value bits 14-12
+#   byte 2: 10dddddd   value bits 11-6
+#   byte 3: 11dddddd   value bits 5-0
+
+import struct
+
+try:
+    import numpy as np  # Optional: vectorised decoding of large bursts
+except ImportError:
+    np = None
+
+PACKET_SIZE = 4
+
+# A packet read as one big-endian 32-bit word has these signature bits.
+SIGNATURE_MASK = 0xC0C0C0C0
+SIGNATURE = 0x004080C0
+FLAG_BITS = 0x30000000    # u/t bits of byte 0; set on mask packets
+
+# Below this many whole packets NumPy setup costs more than it saves.
+NUMPY_MIN_PACKETS = 64
+
+
+def channel_bitmap(channels):
+    """Builds an int bitmap (bit n set = keep channel n) for packets()."""
+    bitmap = 0
+    for channel in channels:
+        bitmap |= 1 << channel
+    return bitmap
+
+ALL_CHANNELS = (1 << 128) - 1
+DSKY_CHANNELS = channel_bitmap((0o10, 0o11, 0o13, 0o163))
+
+
+def encode_packet(channel, value, mask=False):
+    """Builds one 4-byte packet; mask=True makes it a mask packet."""
+    return bytes([
+        (0x20 if mask else 0x00) | ((channel >> 3) & 0x0F),
+        0x40 | ((channel << 3) & 0x38) | ((value >> 12) & 0x07),
+        0x80 | ((value >> 6) & 0x3F),
+        0xC0 | (value & 0x3F),
+    ])
+
+
+def decode_word(word):
+    """Splits a packet word into (channel, value, is_mask_packet)."""
+    channel = ((word >> 21) & 0x78) | ((word >> 19) & 0x07)
+    value = ((word >> 4) & 0x7000) | ((word >> 2) & 0x0FC0) | (word & 0x3F)
+    return channel, value, bool(word & FLAG_BITS)
+
+
+class Uplink:
+    """
+    Outbound input packets for yaAGC. Every (channel, value, mask) input is
+    sent as a mask packet followed by a data packet; frames for the inputs
+    given at construction (the DSKY keys) are precomputed, others are built
+    on each call so arbitrary traffic cannot grow the table. Queued frames
+    go out in a single sendall(), and the mask packet is left out when that
+    channel's mask has not changed since the last send.
+    """
+
+    def __init__(self, inputs=()):
+        self.pending = bytearray()
+        self.masks = {}   # channel -> mask yaAGC currently holds
+        # (channel, value, mask) -> (mask packet, data packet); fixed after __init__
+        self.frames = {tup: self._build(*tup) for tup in inputs}
+        self.recorder = None  # Optional agclog.LogWriter
+
+    @staticmethod
+    def _build(channel, value, mask):
+        return encode_packet(channel, mask, True), encode_packet(channel, value)
+
+    def _frame(self, channel, value, mask):
+        frame = self.frames.get((channel, value, mask))
+        return frame if frame is not None else self._build(channel, value, mask)
+
+    def queue(self, channel, value, mask):
+        """Queues one input; nothing is sent until flush()."""
+        mask_packet, data_packet = self._frame(channel, value, mask)
+        if self.masks.get(channel) != mask:
+            self.pending += mask_packet
+            self.masks[channel] = mask
+            if self.recorder:
+                self.recorder.record(channel, mask, uplink=True, mask=True)
+        self.pending += data_packet
+        if self.recorder:
+            self.recorder.record(channel, value, uplink=True)
+
+    def flush(self, sock):
+        """Sends everything queued in one write. Returns the bytes sent."""
+        if not self.pending:
+            return 0
+        data = bytes(self.pending)
+        self.pending.clear()
+        sock.sendall(data)
+        return len(data)
+
+    def send(self, sock):
+        """
+        flush() for a non-blocking socket: sends what the socket takes now
+        and keeps the rest queued, in order. Returns True while data is
+        left, i.e. while the caller should wait for the socket to be writable.
+        """
+        if self.pending:
+            try:
+                sent = sock.send(self.pending)
+            except BlockingIOError:
+                sent = 0
+            del self.pending[:sent]
+        return bool(self.pending)
+
+    def reset(self):
+        """Forgets queued data and masks (call on every new connection)."""
+        self.pending.clear()
+        self.masks.clear()
+
+
+class PacketFramer:
+    """
+    Persistent receive buffer that turns a yaAGC byte stream into packets.
+    Partial packets are carried over to the next read, and the framer
+    resynchronises on the signature bits if it ever lands mid-packet.
+    """
+
+    def __init__(self, size=4096):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.head = 0     # First byte not yet parsed
+        self.tail = 0     # One past the last byte received
+        self.resyncs = 0  # Number of times we had to hunt for a packet start
+
+    def free_view(self):
+        """Returns a writable view of the free space, for recv_into()."""
+        if self.head:
+            # Slide the leftover partial packet (at most 3 bytes) to the front.
+            leftover = self.tail - self.head
+            self.buffer[:leftover] = self.buffer[self.head:self.tail]
+            self.head = 0
+            self.tail = leftover
+        return self.view[self.tail:]
+
+    def commit(self, nbytes):
+        """Marks nbytes written into free_view() as received."""
+        self.tail += nbytes
+
+    def feed(self, data):
+        """Copies bytes into the buffer (for callers that use recv())."""
+        view = self.free_view()
+        if len(data) > len(view):
+            raise ValueError("PacketFramer buffer overflow")
+        view[:len(data)] = data
+        self.commit(len(data))
+
+    def reset(self):
+        """Drops any buffered bytes (e.g. after a reconnect)."""
+        self.head = 0
+        self.tail = 0
+
+    def words(self):
+        """
+        Yields every complete packet as a raw 32-bit word, mask packets
+        included (see decode_word). Used for the input direction, where
+        the mask packets matter.
+        """
+        while True:
+            count = (self.tail - self.head) // PACKET_SIZE
+            if count == 0:
+                return
+            i = self.head
+            for (word,) in struct.iter_unpack('>I', self.view[i:i + count * PACKET_SIZE]):
+                if (word & SIGNATURE_MASK) != SIGNATURE:
+                    break
+                i += PACKET_SIZE
+                self.head = i
+                yield word
+            if (self.tail - self.head) >= PACKET_SIZE:
+                self._resync()
+
+    def packets(self, bitmap=ALL_CHANNELS):
+        """
+        Yields (channel, value) for every complete output packet buffered.
+        Channels whose bit is clear in bitmap are skipped without decoding
+        the value.
+        """
+        while True:
+            count = (self.tail - self.head) // PACKET_SIZE
+            if count == 0:
+                return
+            if np is not None and count >= NUMPY_MIN_PACKETS:
+                yield from self._decode_numpy(count, bitmap)
+            else:
+                yield from self._decode_words(count, bitmap)
+            if (self.tail - self.head) >= PACKET_SIZE:
+                self._resync()
+
+    def _decode_words(self, count, bitmap):
+        """Decodes up to count packets with struct, stopping at a bad one."""
+        i = self.head
+        for (word,) in struct.iter_unpack('>I', self.view[i:i + count * PACKET_SIZE]):
+            if (word & SIGNATURE_MASK) != SIGNATURE:
+                break
+            i += PACKET_SIZE
+            self.head = i
+            if word & FLAG_BITS:
+                continue
+            channel = ((word >> 21) & 0x78) | ((word >> 19) & 0x07)
+            if not (bitmap >> channel) & 1:
+                continue
+            yield channel, ((word >> 4) & 0x7000) | ((word >> 2) & 0x0FC0) | (word & 0x3F)
+
+    def _decode_numpy(self, count, bitmap):
+        """Same as _decode_words, but over the whole run at once with NumPy."""
+        words = np.frombuffer(self.buffer, dtype='>u4', count=count, offset=self.head)
+        bad = (words & SIGNATURE_MASK) != SIGNATURE
+        if bad.any():
+            words = words[:int(bad.argmax())]
+        self.head += len(words) * PACKET_SIZE
+
+        channels = ((words >> 21) & 0x78) | ((words >> 19) & 0x07)
+        keep = ((words & FLAG_BITS) == 0) & _bitmap_table(bitmap)[channels]
+        words = words[keep]
+        values = ((words >> 4) & 0x7000) | ((words >> 2) & 0x0FC0) | (words & 0x3F)
+        yield from zip(channels[keep].tolist(), values.tolist())
+
+    def _resync(self):
+        """Lost sync: skip ahead to the next byte that could start a packet."""
+        buf = self.buffer
+        i = self.head + 1
+        while i < self.tail and (buf[i] & 0xC0):
+            i += 1
+        self.head = i
+        self.resyncs += 1
+
+
+_bitmap_tables = {}
+
+def _bitmap_table(bitmap):
+    """NumPy bool lookup table for a channel bitmap (cached)."""
+    table = _bitmap_tables.get(bitmap)
+    if table is None:
+        table = np.array([(bitmap >> c) & 1 for c in range(128)], dtype=bool)
+        _bitmap_tables[bitmap] = table
+    return table
@@ -0,0 +1,144 @@
+# timerwheel.py
+# Single-threaded timer wheel on the monotonic clock.
+#
+# All periodic and one-shot DSKY behaviours (V/N flash, OPR ERR flash, PRO
+# auto-release, keypad scans) are scheduled here and fired from the thread
+# that owns the wheel, instead of each one starting its own threading.Timer.
+# The owner sleeps until next_deadline() (e.g. as a select() timeout) and
+# then calls run_due(). SimPit/orbiter_bridge.py imports this module too.
+import heapq
+import itertools
+import math
+import time
+
+
+class Timer:
+    """Handle returned by TimerWheel.call_later / call_every."""
+    __slots__ = ("deadline", "tick", "period", "callback", "args", "cancelled")
+
+    def __init__(self, deadline, period, callback, args):
+        self.deadline = deadline
+        self.tick = 0   # Absolute wheel tick the timer fires on
+        self.period = period
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: timers are bucketed by the tick their deadline falls
+    in, so run_due() only looks at the buckets for ticks that have passed.
+    A min-heap of (tick, seq, timer) alongside answers next_deadline();
+    entries for timers that fired, were cancelled or were rescheduled are
+    dropped when they reach the top, after every run_due() and on lookup,
+    so (like the buckets) it only holds queued timers plus cancelled ones
+    whose deadline has not passed yet.
+    """
+
+    def __init__(self, tick=0.01, slots=256, clock=time.monotonic):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.clock = clock
+        self.current = int(clock() / tick)  # Last tick processed
+        self.count = 0                      # Live + cancelled timers queued
+        self.heap = []
+        self._seq = itertools.count()       # Heap tie-break, so Timers are never compared
+
+    def call_later(self, delay, callback, *args):
+        """Runs callback(*args) once, delay seconds from now."""
+        return self._add(Timer(self.clock() + delay, None, callback, args))
+
+    def call_every(self, period, callback, *args):
+        """Runs callback(*args) every period seconds, starting one period from now."""
+        return self._add(Timer(self.clock() + period, period, callback, args))
+
+    def _add(self, timer):
+        # Round up, so a timer never fires before its deadline.
+        timer.tick = max(math.ceil(timer.deadline / self.tick), self.current + 1)
+        self.slots[timer.tick % len(self.slots)].append(timer)
+        heapq.heappush(self.heap, (timer.tick, next(self._seq), timer))
+        self.count += 1
+        return timer
+
+    def clear(self):
+        """Drops every timer (e.g. when a connection is torn down)."""
+        for bucket in self.slots:
+            bucket.clear()
+        self.heap.clear()
+        self.count = 0
+
+    def _prune(self):
+        """Pops heap entries that no longer stand for a queued live timer."""
+        heap = self.heap
+        while heap:
+            tick, _, timer = heap[0]
+            # A queued timer's tick is always ahead of self.current, and a
+            # periodic timer that fired was pushed again with its new tick.
+            if tick > self.current and tick == timer.tick and not timer.cancelled:
+                return
+            heapq.heappop(heap)
+
+    def next_deadline(self):
+        """Monotonic time at which run_due() will next have work, or None."""
+        self._prune()
+        return self.heap[0][0] * self.tick if self.heap else None
+
+    def timeout(self, default=None):
+        """Seconds until the next timer is due (never negative), for select()."""
+        deadline = self.next_deadline()
+        if deadline is None:
+            return default
+        delay = max(0.0, deadline - self.clock())
+        return delay if default is None else min(delay, default)
+
+    def run_due(self):
+        """
+        Fires every timer whose deadline has passed. Returns how many ran.
+        A callback that raises does not stop the others: every due timer
+        still runs, then the first exception is raised again.
+        """
+        now = self.clock()
+        target = int(now / self.tick)
+        nslots = len(self.slots)
+        # Never walk more than one lap: after that every bucket has been seen.
+        first = max(self.current + 1, target - nslots + 1)
+        self.current = target
+
+        fired = 0
+        error = None
+        for tick in range(first, target + 1):
+            bucket = self.slots[tick % nslots]
+            if not bucket:
+                continue
+            keep = []
+            due = []
+            for timer in bucket:
+                if timer.cancelled:
+                    self.count -= 1
+                elif timer.tick <= tick:
+                    due.append(timer)
+                else:
+                    keep.append(timer)  # A later lap of the wheel
+            bucket[:] = keep
+            for timer in due:
+                self.count -= 1
+                if timer.period is not None:
+                    # Stay on the original cadence unless we fell a full period behind.
+                    timer.deadline += timer.period
+                    if timer.deadline <= now:
+                        timer.deadline = now + timer.period
+                    self._add(timer)
+                try:
+                    timer.callback(*timer.args)
+                except Exception as e:
+                    if error is None:
+                        error = e
+                fired += 1
+        self._prune()
+        if error is not None:
+            raise error
+        return fired